@@ -5,15 +5,36 @@ from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from .config import config_by_name
 from .utils.db import ensure_database_exists
+import click
 import os
 
 # Inicializa las extensiones
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
-limiter = Limiter(key_func=get_remote_address)
+
+
+def rate_limit_key() -> str:
+    """
+    Clave del rate limiter: el usuario autenticado, o la IP si no hay token.
+
+    Así los estudiantes detrás del NAT de un colegio no comparten el límite.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+
+    if identity is not None:
+        return f"user:{identity}"
+    return get_remote_address()
+
+
+limiter = Limiter(key_func=rate_limit_key)
 
 
 def create_app(config_name=None):
@@ -95,6 +116,16 @@ def create_app(config_name=None):
     with app.app_context():
         from . import models
 
+    # Pool de threads para la cola de parseo de archivos
+    from .utils.parse_queue import init_parse_executor
+
+    init_parse_executor(app)
+
+    # Proveedor de LLM del chatbot (Gemini se configura una vez por proceso)
+    from .utils.llm_provider import init_llm_provider
+
+    init_llm_provider(app)
+
     app.logger.info(f"Aplicación iniciada en modo: {config_name}")
 
     @app.cli.command("seed-db")
@@ -104,4 +135,68 @@ def create_app(config_name=None):
 
         seed_database(app)
 
+    @app.cli.command("reindex-files")
+    def reindex_files_command():
+        """Regenerar los fragmentos de recuperación de todos los archivos parseados."""
+        from .models import CourseFile
+        from .utils.retrieval import index_course_file
+
+        file_ids = [
+            file_id for (file_id,) in db.session.query(CourseFile.id)
+            .filter(CourseFile.parsed_text_id.isnot(None))
+            .order_by(CourseFile.id)
+        ]
+
+        total_chunks = 0
+        for position, file_id in enumerate(file_ids, 1):
+            total_chunks += index_course_file(db.session.get(CourseFile, file_id))
+            if position % 50 == 0:
+                db.session.commit()
+                db.session.expunge_all()
+        db.session.commit()
+
+        print(f"Archivos indexados: {len(file_ids)} ({total_chunks} fragmentos)")
+
+    @app.cli.command("repair-course-counts")
+    def repair_course_counts_command():
+        """Recalcular los contadores de archivos, estudiantes y profesores de los cursos."""
+        from .utils.course_stats import recompute_course_counts
+
+        repaired = recompute_course_counts()
+        db.session.commit()
+        print(f"Cursos corregidos: {repaired}")
+
+    @app.cli.command("parse-worker")
+    @click.option("--once", is_flag=True, help="Procesar los trabajos pendientes y terminar.")
+    @click.option("--poll-interval", default=2.0, show_default=True, help="Segundos de espera con la cola vacía.")
+    @click.option("--concurrency", type=int, default=None, help="Archivos en paralelo (default: PARSE_WORKER_THREADS).")
+    def parse_worker_command(once, poll_interval, concurrency):
+        """Procesar la cola de parseo de archivos (PARSE_QUEUE_MODE=worker)."""
+        from .utils.parse_queue import run_worker
+
+        processed = run_worker(
+            poll_interval=poll_interval,
+            once=once,
+            concurrency=concurrency or app.config["PARSE_WORKER_THREADS"]
+        )
+        print(f"Trabajos de parseo procesados: {processed}")
+
+    @app.cli.command("rollup-token-usage")
+    @click.option("--retention-days", type=int, default=None, help="Días de ledger a conservar (default: TOKEN_LEDGER_RETENTION_DAYS).")
+    def rollup_token_usage_command(retention_days):
+        """Recalcular los totales de uso de tokens y eliminar el ledger antiguo."""
+        from .utils.token_quota import rollup_token_usage
+
+        result = rollup_token_usage(retention_days)
+        print(f"Totales recalculados: {result['rollups']} - registros eliminados del ledger: {result['ledger_deleted']}")
+
+    @app.cli.command("prune-llm-telemetry")
+    @click.option("--retention-days", type=int, default=None, help="Días de telemetría a conservar (default: LLM_TELEMETRY_RETENTION_DAYS).")
+    def prune_llm_telemetry_command(retention_days):
+        """Eliminar la telemetría antigua de las llamadas al LLM."""
+        from .utils.llm_telemetry import prune_llm_telemetry
+
+        deleted = prune_llm_telemetry(retention_days)
+        print(f"Registros de telemetría eliminados: {deleted}")
+
     return app
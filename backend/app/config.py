@@ -63,6 +63,18 @@ class Config:
     JWT_HEADER_NAME = "Authorization"
     JWT_HEADER_TYPE = "Bearer"
 
+    # Caché de autorización del proceso (rol, estado e inscripciones; ver utils/auth_cache.py)
+    AUTH_CACHE_ENABLED = os.environ.get("AUTH_CACHE_ENABLED", "true").lower() == "true"
+    AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "30"))
+    AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get("AUTH_CACHE_VERSION_CHECK_SECONDS", "1"))  # Invalidación entre workers
+
+    # Caché del listado público de instituciones (ver utils/institution_cache.py)
+    INSTITUTIONS_CACHE_ENABLED = os.environ.get("INSTITUTIONS_CACHE_ENABLED", "true").lower() == "true"
+    INSTITUTIONS_CACHE_TTL_SECONDS = float(os.environ.get("INSTITUTIONS_CACHE_TTL_SECONDS", "300"))
+    INSTITUTIONS_CACHE_MAX_ENTRIES = int(os.environ.get("INSTITUTIONS_CACHE_MAX_ENTRIES", "256"))
+    INSTITUTIONS_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get("INSTITUTIONS_CACHE_VERSION_CHECK_SECONDS", "2"))
+
     # CORS
     CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "http://localhost:8100").split(",")
 
@@ -82,9 +94,108 @@ class Config:
     # Gemini AI (Chatbot)
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
     GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
+    GEMINI_FAST_MODEL = os.environ.get("GEMINI_FAST_MODEL", "")  # Modelo para preguntas simples (vacío = siempre GEMINI_MODEL)
     GEMINI_TEMPERATURE = float(os.environ.get("GEMINI_TEMPERATURE", "0.7"))
     GEMINI_MAX_OUTPUT_TOKENS = int(os.environ.get("GEMINI_MAX_OUTPUT_TOKENS", "2048"))
     GEMINI_MAX_CONTEXT_TOKENS = int(os.environ.get("GEMINI_MAX_CONTEXT_TOKENS", "30000"))  # Tokens máx de contexto de archivos
+    GEMINI_MODEL_CACHE_SIZE = int(os.environ.get("GEMINI_MODEL_CACHE_SIZE", "128"))  # Modelos reutilizados por proceso
+
+    # Proveedor de LLM: 'gemini' o 'fake' (local, para pruebas de carga sin red)
+    LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+    LLM_FAKE_MODEL = os.environ.get("LLM_FAKE_MODEL", "fake-llm")
+    LLM_FAKE_FAST_MODEL = os.environ.get("LLM_FAKE_FAST_MODEL", "fake-llm-fast")
+    LLM_FAKE_FAST_SPEEDUP = float(os.environ.get("LLM_FAKE_FAST_SPEEDUP", "3"))  # Latencia y velocidad del modelo rápido
+    LLM_FAKE_LATENCY_MS = float(os.environ.get("LLM_FAKE_LATENCY_MS", "300"))  # Hasta el primer token
+    LLM_FAKE_LATENCY_JITTER_MS = float(os.environ.get("LLM_FAKE_LATENCY_JITTER_MS", "100"))
+    LLM_FAKE_LATENCY_DISTRIBUTION = os.environ.get("LLM_FAKE_LATENCY_DISTRIBUTION", "normal")  # fixed, uniform, normal, exponential
+    LLM_FAKE_TOKENS_PER_SECOND = float(os.environ.get("LLM_FAKE_TOKENS_PER_SECOND", "80"))
+    LLM_FAKE_THROUGHPUT_JITTER = float(os.environ.get("LLM_FAKE_THROUGHPUT_JITTER", "0.2"))  # ± fracción de tokens/s
+    LLM_FAKE_OUTPUT_TOKENS = int(os.environ.get("LLM_FAKE_OUTPUT_TOKENS", "200"))
+    LLM_FAKE_CHUNK_TOKENS = int(os.environ.get("LLM_FAKE_CHUNK_TOKENS", "8"))  # Tokens por fragmento en streaming
+    LLM_FAKE_FAILURE_RATE = float(os.environ.get("LLM_FAKE_FAILURE_RATE", "0"))  # Probabilidad de fallo por llamada
+    LLM_FAKE_SEED = int(os.environ.get("LLM_FAKE_SEED", "0"))
+
+    # Recuperación de fragmentos (BM25) para el contexto del chatbot
+    RETRIEVAL_CHUNK_TOKENS = int(os.environ.get("RETRIEVAL_CHUNK_TOKENS", "400"))  # Tamaño de cada fragmento
+    RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "8"))  # Fragmentos máx por pregunta
+    RETRIEVAL_MAX_CONTEXT_TOKENS = int(os.environ.get("RETRIEVAL_MAX_CONTEXT_TOKENS", "4000"))  # Presupuesto de contexto
+    RETRIEVAL_INDEX_CACHE_SIZE = int(os.environ.get("RETRIEVAL_INDEX_CACHE_SIZE", "64"))  # Cursos con índice en memoria
+
+    # Snapshot del prompt del sistema por curso (caché LRU en memoria, por tamaño)
+    CONTEXT_SNAPSHOT_CACHE_BYTES = int(os.environ.get("CONTEXT_SNAPSHOT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+    # Caché de respuestas a preguntas sin historial (por curso y content_version)
+    ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "600"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+    # Coalescencia de peticiones idénticas simultáneas (una sola llamada al LLM)
+    SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    SINGLE_FLIGHT_WAIT_SECONDS = float(os.environ.get("SINGLE_FLIGHT_WAIT_SECONDS", "120"))  # Espera máx de las seguidoras
+
+    # Control de admisión de llamadas al LLM (por proceso)
+    LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "16"))  # Llamadas simultáneas
+    LLM_QUEUE_MAX_DEPTH = int(os.environ.get("LLM_QUEUE_MAX_DEPTH", "64"))  # Peticiones esperando cupo
+    LLM_QUEUE_MAX_WAIT_SECONDS = float(os.environ.get("LLM_QUEUE_MAX_WAIT_SECONDS", "10"))
+    LLM_RETRY_AFTER_SECONDS = int(os.environ.get("LLM_RETRY_AFTER_SECONDS", "5"))  # Retry-After de los 503
+
+    # Resiliencia de las llamadas al LLM: plazos, reintentos, hedging y circuit breaker
+    LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get("LLM_CALL_TIMEOUT_SECONDS", "60"))  # Por intento
+    LLM_CALL_DEADLINE_SECONDS = float(os.environ.get("LLM_CALL_DEADLINE_SECONDS", "90"))  # Total, con reintentos
+    LLM_RETRY_MAX_ATTEMPTS = int(os.environ.get("LLM_RETRY_MAX_ATTEMPTS", "3"))
+    LLM_RETRY_BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_RETRY_BACKOFF_BASE_SECONDS", "0.5"))
+    LLM_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_RETRY_BACKOFF_MAX_SECONDS", "8"))
+    LLM_RETRY_STATUS_CODES = [
+        int(code) for code in os.environ.get("LLM_RETRY_STATUS_CODES", "408,429,500,502,503,504").split(",") if code.strip()
+    ]
+    LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))  # Respaldo si se supera este percentil
+    LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))  # 0 = desactivado
+    LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+    # Cuotas de tokens del chatbot por usuario, curso e institución (0 = sin límite)
+    TOKEN_QUOTA_USER_DAILY = int(os.environ.get("TOKEN_QUOTA_USER_DAILY", "200000"))
+    TOKEN_QUOTA_USER_MONTHLY = int(os.environ.get("TOKEN_QUOTA_USER_MONTHLY", "2000000"))
+    TOKEN_QUOTA_COURSE_DAILY = int(os.environ.get("TOKEN_QUOTA_COURSE_DAILY", "0"))
+    TOKEN_QUOTA_COURSE_MONTHLY = int(os.environ.get("TOKEN_QUOTA_COURSE_MONTHLY", "0"))
+    TOKEN_QUOTA_INSTITUTION_DAILY = int(os.environ.get("TOKEN_QUOTA_INSTITUTION_DAILY", "0"))
+    TOKEN_QUOTA_INSTITUTION_MONTHLY = int(os.environ.get("TOKEN_QUOTA_INSTITUTION_MONTHLY", "0"))
+    TOKEN_USAGE_FLUSH_SECONDS = float(os.environ.get("TOKEN_USAGE_FLUSH_SECONDS", "1"))  # Escritura en lote (0 = inmediata)
+    TOKEN_USAGE_BUFFER_MAX = int(os.environ.get("TOKEN_USAGE_BUFFER_MAX", "10000"))
+    TOKEN_LEDGER_RETENTION_DAYS = int(os.environ.get("TOKEN_LEDGER_RETENTION_DAYS", "90"))  # flask rollup-token-usage
+
+    # Enrutamiento entre el modelo rápido y el grande (umbrales por defecto; cada curso puede cambiarlos)
+    LLM_ROUTING_ENABLED = os.environ.get("LLM_ROUTING_ENABLED", "true").lower() == "true"
+    LLM_ROUTING_FAST_MAX_CONTEXT_TOKENS = int(os.environ.get("LLM_ROUTING_FAST_MAX_CONTEXT_TOKENS", "2500"))  # Prompt del sistema
+    LLM_ROUTING_FAST_MAX_HISTORY_MESSAGES = int(os.environ.get("LLM_ROUTING_FAST_MAX_HISTORY_MESSAGES", "4"))
+    LLM_ROUTING_FAST_MAX_QUESTION_TOKENS = int(os.environ.get("LLM_ROUTING_FAST_MAX_QUESTION_TOKENS", "60"))
+
+    # Telemetría de las llamadas al LLM (tokens y latencias, GET /api/chat/telemetry)
+    LLM_TELEMETRY_ENABLED = os.environ.get("LLM_TELEMETRY_ENABLED", "true").lower() == "true"
+    LLM_TELEMETRY_FLUSH_SECONDS = float(os.environ.get("LLM_TELEMETRY_FLUSH_SECONDS", "2"))  # Escritura en lote (0 = inmediata)
+    LLM_TELEMETRY_BUFFER_MAX = int(os.environ.get("LLM_TELEMETRY_BUFFER_MAX", "10000"))
+    LLM_TELEMETRY_RETENTION_DAYS = int(os.environ.get("LLM_TELEMETRY_RETENTION_DAYS", "30"))  # flask prune-llm-telemetry
+    LLM_TELEMETRY_PERCENTILE_SAMPLE = int(os.environ.get("LLM_TELEMETRY_PERCENTILE_SAMPLE", "5000"))  # Llamadas recientes por grupo
+
+    # Conversaciones guardadas: presupuesto del historial enviado al modelo
+    CONVERSATION_HISTORY_MAX_TOKENS = int(os.environ.get("CONVERSATION_HISTORY_MAX_TOKENS", "4000"))  # Resumen + turnos recientes
+    CONVERSATION_SUMMARY_MAX_TOKENS = int(os.environ.get("CONVERSATION_SUMMARY_MAX_TOKENS", "600"))
+    CONVERSATION_KEEP_RECENT_TURNS = int(os.environ.get("CONVERSATION_KEEP_RECENT_TURNS", "4"))  # Turnos que no se resumen
+
+    # Pool de procesos de parseo (0 = parsear en el mismo proceso, sin límites de tiempo/memoria)
+    PARSER_POOL_SIZE = int(os.environ.get("PARSER_POOL_SIZE", str(os.cpu_count() or 2)))
+    PARSER_TIMEOUT_SECONDS = float(os.environ.get("PARSER_TIMEOUT_SECONDS", "60"))  # Por archivo
+    PARSER_MEMORY_LIMIT_MB = int(os.environ.get("PARSER_MEMORY_LIMIT_MB", "1024"))  # RLIMIT_AS por proceso
+    PARSER_MAX_PDF_PAGES = int(os.environ.get("PARSER_MAX_PDF_PAGES", "500"))
+    PARSER_MAX_SHEET_ROWS = int(os.environ.get("PARSER_MAX_SHEET_ROWS", "50000"))
+    PARSER_WORKER_MAX_TASKS = int(os.environ.get("PARSER_WORKER_MAX_TASKS", "100"))  # Tareas antes de reciclar el proceso
+
+    # Cola de parseo de archivos en segundo plano
+    PARSE_QUEUE_MODE = os.environ.get("PARSE_QUEUE_MODE", "thread")  # 'thread' (en el proceso web) o 'worker' (flask parse-worker)
+    PARSE_WORKER_THREADS = int(os.environ.get("PARSE_WORKER_THREADS", str(PARSER_POOL_SIZE or 2)))
+    PARSE_JOB_MAX_ATTEMPTS = int(os.environ.get("PARSE_JOB_MAX_ATTEMPTS", "2"))
+    PARSE_JOB_STALE_SECONDS = int(os.environ.get("PARSE_JOB_STALE_SECONDS", "600"))  # 'parsing' más antiguo se reencola
 
     # Auto-asignación de grado
     AUTO_ASSIGN_GRADE = os.environ.get("AUTO_ASSIGN_GRADE", "true").lower() == "true"
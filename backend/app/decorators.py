@@ -1,9 +1,21 @@
-"""Decoradores para autorización basada en roles."""
+"""
+Decoradores para autorización basada en roles.
+
+El usuario del JWT y sus inscripciones se resuelven una sola vez por request
+y se guardan en flask.g (get_current_identity, get_current_user,
+get_course_roles), de modo que los decoradores y la ruta comparten el mismo
+resultado en lugar de repetir las consultas.
+
+Los decoradores solo necesitan el estado de autorización (rol, activo,
+inscripciones), que sale de la caché del proceso (ver utils/auth_cache.py):
+en régimen, autorizar un request no consulta la base de datos.
+"""
 from functools import wraps
-from flask import jsonify
+from flask import g, jsonify
 from flask_jwt_extended import get_jwt_identity
-from .models import User, UserCourse
+from .models import User
 from .exceptions import AuthorizationError
+from .utils.auth_cache import AuthIdentity, get_auth_identity, get_membership_roles, remember_user
 
 
 def role_required(*allowed_roles):
@@ -23,11 +35,7 @@ def role_required(*allowed_roles):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            user = User.query.get(int(current_user_id))
-
-            if not user or not user.is_active:
-                raise AuthorizationError("Usuario no encontrado o inactivo")
+            user = get_current_identity()
 
             if user.role not in allowed_roles:
                 raise AuthorizationError(
@@ -51,11 +59,7 @@ def admin_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-
-        if not user or not user.is_active:
-            raise AuthorizationError("Usuario no encontrado o inactivo")
+        user = get_current_identity()
 
         if not user.is_admin():
             raise AuthorizationError("Se requiere rol de administrador")
@@ -76,11 +80,7 @@ def teacher_or_admin_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-
-        if not user or not user.is_active:
-            raise AuthorizationError("Usuario no encontrado o inactivo")
+        user = get_current_identity()
 
         if not (user.is_teacher() or user.is_admin()):
             raise AuthorizationError("Se requiere rol de profesor o administrador")
@@ -108,11 +108,7 @@ def course_access_required(course_id_param='course_id'):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            user = User.query.get(int(current_user_id))
-
-            if not user or not user.is_active:
-                raise AuthorizationError("Usuario no encontrado o inactivo")
+            user = get_current_identity()
 
             # Admins tienen acceso a todos los cursos
             if user.is_admin():
@@ -125,12 +121,7 @@ def course_access_required(course_id_param='course_id'):
                 raise AuthorizationError("No se proporcionó ID de curso")
 
             # Verificar si el usuario está inscrito en el curso
-            enrollment = UserCourse.query.filter_by(
-                user_id=int(current_user_id),
-                course_id=course_id
-            ).first()
-
-            if not enrollment:
+            if not get_course_roles(course_id):
                 raise AuthorizationError("No tienes acceso a este curso")
 
             return f(*args, **kwargs)
@@ -155,11 +146,7 @@ def course_teacher_or_admin_required(course_id_param='course_id'):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            user = User.query.get(int(current_user_id))
-
-            if not user or not user.is_active:
-                raise AuthorizationError("Usuario no encontrado o inactivo")
+            user = get_current_identity()
 
             # Admins tienen acceso total
             if user.is_admin():
@@ -172,13 +159,7 @@ def course_teacher_or_admin_required(course_id_param='course_id'):
                 raise AuthorizationError("No se proporcionó ID de curso")
 
             # Verificar si es profesor del curso
-            enrollment = UserCourse.query.filter_by(
-                user_id=int(current_user_id),
-                course_id=course_id,
-                role_in_course='teacher'
-            ).first()
-
-            if not enrollment:
+            if 'teacher' not in get_course_roles(course_id):
                 raise AuthorizationError("No tienes permisos para modificar este curso")
 
             return f(*args, **kwargs)
@@ -186,20 +167,83 @@ def course_teacher_or_admin_required(course_id_param='course_id'):
     return decorator
 
 
+def get_current_identity() -> AuthIdentity:
+    """
+    Obtiene el estado de autorización del usuario actual (id, rol, activo, institución).
+
+    Sale de la caché de autorización del proceso y se guarda en flask.g.
+    Las rutas que solo necesitan el id o el rol deben preferirlo a
+    get_current_user(), que carga el usuario completo.
+
+    Returns:
+        AuthIdentity: Estado del usuario autenticado
+
+    Raises:
+        AuthorizationError: Si no hay usuario autenticado o está inactivo
+    """
+    current_user_id = get_jwt_identity()
+    resolved = g.get('_current_identity')
+
+    if resolved is not None and resolved[0] == current_user_id:
+        identity = resolved[1]
+    else:
+        identity = get_auth_identity(int(current_user_id)) if current_user_id is not None else None
+        g._current_identity = (current_user_id, identity)
+        g.pop('_current_user', None)
+        g.pop('_current_memberships', None)
+
+    if not identity or not identity.is_active:
+        raise AuthorizationError("Usuario no encontrado o inactivo")
+
+    return identity
+
+
 def get_current_user() -> User:
     """
     Obtiene el usuario actual desde el JWT token.
 
+    Se consulta una sola vez por request; las llamadas siguientes reutilizan
+    el usuario guardado en flask.g.
+
     Returns:
         Usuario autenticado
 
     Raises:
         AuthorizationError: Si no hay usuario autenticado
     """
-    current_user_id = get_jwt_identity()
-    user = User.query.get(int(current_user_id))
+    identity = get_current_identity()
+    user = g.get('_current_user')
 
-    if not user or not user.is_active:
-        raise AuthorizationError("Usuario no encontrado o inactivo")
+    if user is None:
+        user = User.query.get(identity.id)
+        if not user or not user.is_active:
+            raise AuthorizationError("Usuario no encontrado o inactivo")
+        remember_user(user)
+        g._current_user = user
 
     return user
+
+
+def get_course_roles(course_id: int) -> frozenset:
+    """
+    Roles del usuario actual en un curso ('student', 'teacher').
+
+    Salen de la caché de autorización del proceso y se guardan en flask.g.
+
+    Args:
+        course_id: ID del curso
+
+    Returns:
+        frozenset: Roles del usuario en el curso (vacío si no está inscrito)
+
+    Raises:
+        AuthorizationError: Si no hay usuario autenticado
+    """
+    identity = get_current_identity()
+    memberships = g.setdefault('_current_memberships', {})
+    course_id = int(course_id)
+
+    if course_id not in memberships:
+        memberships[course_id] = get_membership_roles(identity.id, course_id)
+
+    return memberships[course_id]
@@ -50,3 +50,21 @@ class DatabaseError(AppException):
 
     def __init__(self, message: str = "Error en la base de datos"):
         super().__init__(message, status_code=500)
+
+
+class QuotaExceededError(AppException):
+    """Cuota de uso agotada hasta que se reinicie su período."""
+
+    def __init__(self, message: str, reset_at=None, retry_after: int = None, details: dict = None):
+        super().__init__(message, status_code=429)
+        self.reset_at = reset_at
+        self.retry_after = retry_after
+        self.details = details or {}
+
+
+class ServiceUnavailableError(AppException):
+    """Servicio saturado o no disponible temporalmente."""
+
+    def __init__(self, message: str = "Servicio no disponible temporalmente", retry_after: int = None):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
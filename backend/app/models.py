@@ -1,6 +1,7 @@
 from . import db
 from datetime import datetime
 import bcrypt
+import zlib
 
 
 class Grade(db.Model):
@@ -77,6 +78,7 @@ class User(db.Model):
     institution = db.relationship('Institution', back_populates='users')
     grade = db.relationship('Grade', back_populates='users')
     enrollments = db.relationship('UserCourse', back_populates='user', cascade='all, delete-orphan')
+    conversations = db.relationship('Conversation', back_populates='user', cascade='all, delete-orphan', lazy='dynamic')
     uploaded_files = db.relationship('CourseFile', back_populates='uploader', foreign_keys='CourseFile.uploaded_by')
 
     def set_password(self, password: str) -> None:
@@ -172,8 +174,19 @@ class Institution(db.Model):
     users = db.relationship('User', back_populates='institution')
     courses = db.relationship('Course', back_populates='institution', cascade='all, delete-orphan')
 
-    def to_dict(self) -> dict:
-        """Serializa la institución a un diccionario."""
+    def to_dict(self, courses_count: int = None) -> dict:
+        """
+        Serializa la institución a un diccionario.
+
+        Args:
+            courses_count: Cantidad de cursos ya calculada (ej: en el listado). Si no se
+                entrega, se cuenta con una consulta sin cargar los cursos.
+        """
+        if courses_count is None:
+            courses_count = db.session.query(db.func.count(Course.id)).filter(
+                Course.institution_id == self.id
+            ).scalar()
+
         return {
             "id": self.id,
             "nombre": self.nombre,
@@ -184,7 +197,7 @@ class Institution(db.Model):
             "colorinstitucional": self.colorinstitucional,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "courses_count": len(self.courses) if self.courses else 0
+            "courses_count": courses_count
         }
 
     def __repr__(self) -> str:
@@ -203,6 +216,26 @@ class Course(db.Model):
     institution_id = db.Column(db.Integer, db.ForeignKey('institutions.id'), nullable=False)
     grade_id = db.Column(db.Integer, db.ForeignKey('grades.id'), nullable=False, index=True)
     emoji = db.Column(db.String(16), nullable=True, default='📘')
+    content_version = db.Column(db.Integer, nullable=False, default=1)
+    # Se incrementa con cada cambio que afecta el contexto del chatbot (archivos, prompt, profesores)
+    answers_version = db.Column(db.Integer, nullable=False, default=1)
+    # Se incrementa al vaciar la caché de respuestas del curso (ver utils/answer_cache.py)
+
+    # Totales del contenido parseado de los archivos (ver utils/course_stats.py)
+    parsed_files_count = db.Column(db.Integer, nullable=False, default=0)
+    parsed_char_count = db.Column(db.BigInteger, nullable=False, default=0)
+    parsed_token_estimate = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # Contadores de archivos e inscripciones (ver utils/course_stats.py)
+    files_count = db.Column(db.Integer, nullable=False, default=0)
+    students_count = db.Column(db.Integer, nullable=False, default=0)
+    teachers_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Enrutamiento entre el modelo rápido y el grande (ver utils/model_router.py)
+    model_routing = db.Column(db.String(10), nullable=True)  # auto, fast o large (None = auto)
+    routing_max_context_tokens = db.Column(db.Integer, nullable=True)  # None = valor global
+    routing_max_history_messages = db.Column(db.Integer, nullable=True)
+    routing_max_question_tokens = db.Column(db.Integer, nullable=True)
 
     # Campos de auditoría
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -216,6 +249,7 @@ class Course(db.Model):
     grade = db.relationship('Grade', back_populates='courses')
     files = db.relationship('CourseFile', back_populates='course', cascade='all, delete-orphan')
     enrollments = db.relationship('UserCourse', back_populates='course', cascade='all, delete-orphan')
+    conversations = db.relationship('Conversation', back_populates='course', cascade='all, delete-orphan', lazy='dynamic')
 
     def get_teachers(self):
         """Obtiene todos los profesores del curso."""
@@ -243,7 +277,13 @@ class Course(db.Model):
             "grade": self.grade.to_dict() if self.grade else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "is_active": self.is_active
+            "is_active": self.is_active,
+            "model_routing": {
+                "mode": self.model_routing or 'auto',
+                "max_context_tokens": self.routing_max_context_tokens,
+                "max_history_messages": self.routing_max_history_messages,
+                "max_question_tokens": self.routing_max_question_tokens
+            }
         }
 
         if include_institution and self.institution:
@@ -254,9 +294,9 @@ class Course(db.Model):
             }
 
         if include_stats:
-            data["files_count"] = len(self.files) if self.files else 0
-            data["students_count"] = len(self.get_students())
-            data["teachers_count"] = len(self.get_teachers())
+            data["files_count"] = self.files_count or 0
+            data["students_count"] = self.students_count or 0
+            data["teachers_count"] = self.teachers_count or 0
 
         return data
 
@@ -274,6 +314,7 @@ class CourseFile(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     filename = db.Column(db.String(255), nullable=False)  # Nombre original
     filepath = db.Column(db.String(500), nullable=False)  # Path en storage
+    blob_id = db.Column(db.Integer, db.ForeignKey('file_blobs.id'), nullable=True, index=True)  # Contenido deduplicado
     filesize = db.Column(db.Integer, nullable=False)  # Tamaño en bytes
     mimetype = db.Column(db.String(100), nullable=False)  # Tipo MIME
 
@@ -281,13 +322,52 @@ class CourseFile(db.Model):
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    # Contenido parseado para chatbot
-    parsed_content = db.Column(db.Text, nullable=True)  # Contenido del archivo en texto/markdown
+    # Contenido parseado para chatbot (el texto vive comprimido en parsed_texts)
+    parsed_text_id = db.Column(db.Integer, db.ForeignKey('parsed_texts.id'), nullable=True, index=True)
     parsed_at = db.Column(db.DateTime, nullable=True)  # Cuándo se parseó el archivo
+    char_count = db.Column(db.Integer, nullable=True)  # Caracteres del contenido parseado
+    token_estimate = db.Column(db.Integer, nullable=True)  # Tokens estimados del contenido parseado
+    # Resultado del último parseo: ok, truncated, empty, error, timeout, memory_limit, crashed
+    parse_outcome = db.Column(db.String(20), nullable=True)
+    parse_error = db.Column(db.Text, nullable=True)
+    parse_duration_ms = db.Column(db.Integer, nullable=True)
+    parser_version = db.Column(db.String(50), nullable=True)  # Versión de parseo del contenido actual
 
     # Relaciones
     course = db.relationship('Course', back_populates='files')
     uploader = db.relationship('User', back_populates='uploaded_files', foreign_keys=[uploaded_by])
+    blob = db.relationship('FileBlob', back_populates='course_files')
+    parsed_text = db.relationship('ParsedText', lazy='select')
+    chunks = db.relationship(
+        'CourseFileChunk',
+        back_populates='course_file',
+        cascade='all, delete-orphan',
+        order_by='CourseFileChunk.position'
+    )
+    parse_job = db.relationship(
+        'ParseJob',
+        back_populates='course_file',
+        cascade='all, delete-orphan',
+        uselist=False
+    )
+
+    @property
+    def parsed_content(self):
+        """Contenido parseado en texto/markdown (se carga y descomprime al accederlo)."""
+        return self.parsed_text.text if self.parsed_text else None
+
+    @parsed_content.setter
+    def parsed_content(self, text):
+        """Guarda el contenido parseado comprimido y actualiza sus contadores."""
+        if text is None:
+            self.parsed_text = None
+            self.char_count = None
+            self.token_estimate = None
+            return
+
+        self.parsed_text = ParsedText.from_text(text)
+        self.char_count = len(text)
+        self.token_estimate = len(text) // 4  # Misma estimación que estimate_token_count
 
     def to_dict(self, include_parsed_content=False) -> dict:
         """Serializa el archivo a un diccionario."""
@@ -304,8 +384,11 @@ class CourseFile(db.Model):
                 "username": self.uploader.username
             } if self.uploader else None,
             "uploaded_at": self.uploaded_at.isoformat() if self.uploaded_at else None,
-            "has_parsed_content": self.parsed_content is not None,
-            "parsed_at": self.parsed_at.isoformat() if self.parsed_at else None
+            "has_parsed_content": self.parsed_text_id is not None,
+            "parsed_at": self.parsed_at.isoformat() if self.parsed_at else None,
+            "parse_outcome": self.parse_outcome,
+            "char_count": self.char_count,
+            "token_estimate": self.token_estimate
         }
 
         # Solo incluir el contenido parseado si se solicita explícitamente
@@ -318,6 +401,372 @@ class CourseFile(db.Model):
         return f"<CourseFile {self.filename}>"
 
 
+class ParsedText(db.Model):
+    """Contenido parseado de un archivo, comprimido con zlib.
+
+    Está fuera de course_files para que listar archivos no arrastre el texto.
+    Archivos con el mismo contenido comparten la misma fila.
+    """
+
+    __tablename__ = "parsed_texts"
+
+    COMPRESSION_ZLIB = 'zlib'
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    compression = db.Column(db.String(10), nullable=False, default=COMPRESSION_ZLIB)
+    content = db.Column(db.LargeBinary(length=4294967295), nullable=False)  # Texto comprimido
+    char_count = db.Column(db.Integer, nullable=False)
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def from_text(cls, text: str) -> "ParsedText":
+        """Crea el registro comprimiendo el texto."""
+        return cls(
+            compression=cls.COMPRESSION_ZLIB,
+            content=zlib.compress(text.encode('utf-8'), 6),
+            char_count=len(text)
+        )
+
+    @property
+    def text(self) -> str:
+        """Texto descomprimido."""
+        return zlib.decompress(self.content).decode('utf-8')
+
+    def __repr__(self) -> str:
+        return f"<ParsedText {self.id} ({self.char_count} caracteres)>"
+
+
+class FileBlob(db.Model):
+    """Contenido de un archivo subido, direccionado por su hash SHA-256.
+
+    Varios CourseFile (ej: el mismo programa subido a cada sección) apuntan al
+    mismo blob; ref_count cuenta cuántos lo usan.
+    """
+
+    __tablename__ = "file_blobs"
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    filepath = db.Column(db.String(500), nullable=False)  # Path en storage (blobs/ab/cd/<sha256>.<ext>)
+    filesize = db.Column(db.Integer, nullable=False)  # Tamaño en bytes
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Relaciones
+    course_files = db.relationship('CourseFile', back_populates='blob', lazy='dynamic')
+
+    def __repr__(self) -> str:
+        return f"<FileBlob {self.sha256[:12]} refs={self.ref_count}>"
+
+
+class CourseFileChunk(db.Model):
+    """Fragmento indexable del contenido parseado de un archivo (para recuperación BM25)."""
+
+    __tablename__ = "course_file_chunks"
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    course_file_id = db.Column(db.Integer, db.ForeignKey('course_files.id'), nullable=False, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # Orden del fragmento dentro del archivo
+    content = db.Column(db.Text, nullable=False)  # Texto del fragmento
+    token_count = db.Column(db.Integer, nullable=False, default=0)  # Tokens estimados
+    terms = db.Column(db.Text, nullable=True)  # Términos normalizados separados por espacio
+
+    # Relaciones
+    course_file = db.relationship('CourseFile', back_populates='chunks')
+
+    def __repr__(self) -> str:
+        return f"<CourseFileChunk file_id={self.course_file_id} position={self.position}>"
+
+
+class ParseJob(db.Model):
+    """Trabajo de parseo en segundo plano de un archivo de curso."""
+
+    __tablename__ = "parse_jobs"
+
+    # Estados posibles
+    STATUS_QUEUED = 'queued'
+    STATUS_PARSING = 'parsing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    course_file_id = db.Column(db.Integer, db.ForeignKey('course_files.id'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)  # Último error de parseo
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relaciones
+    course_file = db.relationship('CourseFile', back_populates='parse_job')
+
+    def to_dict(self) -> dict:
+        """Serializa el trabajo de parseo a un diccionario."""
+        return {
+            "id": self.id,
+            "course_file_id": self.course_file_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self) -> str:
+        return f"<ParseJob file_id={self.course_file_id} ({self.status})>"
+
+
+class CourseContextSnapshot(db.Model):
+    """Plantilla materializada del prompt del sistema de un curso para una versión de contenido."""
+
+    __tablename__ = "course_context_snapshots"
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    content_version = db.Column(db.Integer, nullable=False)
+    prompt_template = db.Column(db.Text(length=16777215), nullable=False)  # MEDIUMTEXT en MySQL
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<CourseContextSnapshot course_id={self.course_id} v{self.content_version}>"
+
+
+class CacheVersion(db.Model):
+    """Contador compartido entre workers para invalidar cachés del proceso (ver utils/cache_versions.py)."""
+
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<CacheVersion {self.name} v{self.version}>"
+
+
+class Conversation(db.Model):
+    """Conversación de un usuario con el chatbot de un curso.
+
+    Los turnos más antiguos se compactan en `summary` cuando el historial
+    supera el presupuesto de tokens (ver utils/conversations.py).
+    """
+
+    __tablename__ = "conversations"
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    title = db.Column(db.String(200), nullable=True)
+
+    # Resumen de los turnos compactados y cuántos turnos cubre
+    summary = db.Column(db.Text, nullable=True)
+    summarized_turns = db.Column(db.Integer, nullable=False, default=0)
+    turn_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Relaciones
+    user = db.relationship('User', back_populates='conversations')
+    course = db.relationship('Course', back_populates='conversations')
+    turns = db.relationship(
+        'ConversationTurn',
+        back_populates='conversation',
+        cascade='all, delete-orphan',
+        order_by='ConversationTurn.position',
+        lazy='dynamic'
+    )
+
+    def to_dict(self, include_turns=False) -> dict:
+        """Serializa la conversación a un diccionario."""
+        data = {
+            "id": self.id,
+            "user_id": self.user_id,
+            "course_id": self.course_id,
+            "title": self.title,
+            "turn_count": self.turn_count,
+            "summarized_turns": self.summarized_turns,
+            "has_summary": self.summary is not None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+        if include_turns:
+            data["turns"] = [turn.to_dict() for turn in self.turns]
+
+        return data
+
+    def __repr__(self) -> str:
+        return f"<Conversation {self.id} user_id={self.user_id} course_id={self.course_id}>"
+
+
+class ConversationTurn(db.Model):
+    """Mensaje (del usuario o del modelo) dentro de una conversación."""
+
+    __tablename__ = "conversation_turns"
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)  # Orden dentro de la conversación (desde 0)
+    role = db.Column(db.String(10), nullable=False)  # user o model
+    content = db.Column(db.Text, nullable=False)
+    token_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Constraint: una sola entrada por posición
+    __table_args__ = (
+        db.UniqueConstraint('conversation_id', 'position', name='unique_conversation_turn_position'),
+    )
+
+    # Relaciones
+    conversation = db.relationship('Conversation', back_populates='turns')
+
+    def to_dict(self) -> dict:
+        """Serializa el turno a un diccionario."""
+        return {
+            "id": self.id,
+            "position": self.position,
+            "role": self.role,
+            "content": self.content,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self) -> str:
+        return f"<ConversationTurn {self.conversation_id}#{self.position} ({self.role})>"
+
+
+class TokenUsage(db.Model):
+    """Registro (ledger) de los tokens consumidos por una llamada al LLM.
+
+    Los totales por usuario, curso e institución se mantienen en
+    TokenUsageRollup (ver utils/token_quota.py); los registros antiguos se
+    eliminan periódicamente con `flask rollup-token-usage`.
+    """
+
+    __tablename__ = "token_usage"
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    # Al eliminar el usuario se eliminan sus registros (los rollups conservan los totales)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.id'), nullable=False, index=True)
+    model = db.Column(db.String(80), nullable=True)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    output_tokens = db.Column(db.Integer, nullable=False, default=0)
+    total_tokens = db.Column(db.Integer, nullable=False, default=0)
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<TokenUsage user_id={self.user_id} course_id={self.course_id} ({self.total_tokens})>"
+
+
+class TokenUsageRollup(db.Model):
+    """Tokens consumidos por un usuario, curso o institución en un día o un mes."""
+
+    __tablename__ = "token_usage_rollups"
+
+    # Ámbitos y períodos posibles
+    SCOPE_USER = 'user'
+    SCOPE_COURSE = 'course'
+    SCOPE_INSTITUTION = 'institution'
+    PERIOD_DAY = 'day'
+    PERIOD_MONTH = 'month'
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # user, course o institution
+    scope_id = db.Column(db.Integer, nullable=False)
+    period = db.Column(db.String(10), nullable=False)  # day o month
+    period_start = db.Column(db.Date, nullable=False)  # Día, o primer día del mes
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    output_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    total_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # Constraint: un solo total por ámbito y período
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'scope_id', 'period', 'period_start', name='unique_token_usage_rollup'),
+    )
+
+    def to_dict(self) -> dict:
+        """Serializa el total a un diccionario."""
+        return {
+            "scope": self.scope,
+            "scope_id": self.scope_id,
+            "period": self.period,
+            "period_start": self.period_start.isoformat() if self.period_start else None,
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens
+        }
+
+    def __repr__(self) -> str:
+        return f"<TokenUsageRollup {self.scope}={self.scope_id} {self.period} {self.period_start}>"
+
+
+class LLMCall(db.Model):
+    """Telemetría de una llamada al LLM: tokens, latencias y resultado (ver utils/llm_telemetry.py)."""
+
+    __tablename__ = "llm_calls"
+
+    # Operaciones y resultados posibles
+    OPERATION_CHAT = 'chat'
+    OPERATION_STREAM = 'stream'
+    OPERATION_SUMMARY = 'summary'
+    STATUS_OK = 'ok'
+    STATUS_ERROR = 'error'
+
+    # Campos principales
+    id = db.Column(db.Integer, primary_key=True)
+    # Al eliminar el usuario la llamada se conserva para las métricas, sin usuario
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.id'), nullable=False, index=True)
+    model = db.Column(db.String(80), nullable=True)
+    operation = db.Column(db.String(20), nullable=False)  # chat, stream o summary
+    route = db.Column(db.String(10), nullable=True)  # fast o large (ver utils/model_router.py)
+    status = db.Column(db.String(10), nullable=False, default=STATUS_OK)  # ok o error
+
+    # Tokens reportados por el proveedor
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    output_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0)
+
+    # Latencias en milisegundos
+    queue_ms = db.Column(db.Integer, nullable=True)  # Espera por un cupo del control de admisión
+    ttft_ms = db.Column(db.Integer, nullable=True)  # Hasta el primer fragmento (o la respuesta completa)
+    latency_ms = db.Column(db.Integer, nullable=False, default=0)  # Hasta la respuesta completa
+
+    # Campos de auditoría
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<LLMCall {self.operation} course_id={self.course_id} ({self.latency_ms} ms)>"
+
+
 class UserCourse(db.Model):
     """Modelo de matrícula (tabla intermedia entre User y Course)."""
 
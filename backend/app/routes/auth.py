@@ -45,6 +45,10 @@ from ..exceptions import (
 )
 from ..utils.validators import normalize_rut
 from ..decorators import admin_required, get_current_user
+from ..utils.context_snapshot import bump_taught_courses_version
+from ..utils.auth_cache import invalidate_user
+from ..utils.course_stats import adjust_enrollment_counts
+from ..utils.query_options import user_options
 
 # Blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -326,6 +330,8 @@ def update_profile():
         raise ConflictError("El nombre de usuario ya está ocupado")
 
     user.username = new_username
+    # El nombre del docente aparece en el prompt del sistema de sus cursos
+    bump_taught_courses_version(user.id)
 
     try:
         db.session.commit()
@@ -371,8 +377,8 @@ def list_users():
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
 
-    # Query base
-    query = User.query
+    # Query base (institución y grado en la misma consulta)
+    query = User.query.options(*user_options())
 
     # Aplicar filtros
     if role_filter and role_filter in ['student', 'teacher', 'admin']:
@@ -464,6 +470,7 @@ def update_user(user_id):
             user.rut = normalize_rut(data['rut'])
         if 'username' in data:
             user.username = data['username']
+            bump_taught_courses_version(user.id)
         if 'email' in data:
             user.email = data['email'].lower()
         if 'region' in data:
@@ -481,6 +488,8 @@ def update_user(user_id):
         if 'password' in data and data['password']:
             user.set_password(data['password'])
 
+        # Rol, estado e institución se cachean para autorizar requests
+        invalidate_user(user.id)
         db.session.commit()
         current_app.logger.info(f"Usuario {user.email} actualizado")
 
@@ -518,6 +527,10 @@ def delete_user(user_id):
         raise ResourceNotFoundError("Usuario no encontrado")
 
     try:
+        bump_taught_courses_version(user.id)
+        invalidate_user(user.id)
+        # Sus inscripciones se eliminan en cascada
+        adjust_enrollment_counts(user.enrollments)
         db.session.delete(user)
         db.session.commit()
         current_app.logger.info(f"Usuario {user.email} eliminado")
@@ -568,6 +581,7 @@ def update_user_role(user_id):
     user.role = data["role"]
 
     try:
+        invalidate_user(user.id)
         db.session.commit()
         current_app.logger.info(
             f"Rol de usuario {user.email} cambiado de {old_role} a {user.role}"
@@ -2,69 +2,144 @@
 MÓDULO: CHATBOT POR CURSO CON GEMINI
 =====================================
 
-Endpoints para interactuar con el chatbot de cada curso usando Gemini AI.
+Endpoints para interactuar con el chatbot de cada curso (Gemini u otro proveedor
+de LLM, ver utils/llm_provider.py).
 El chatbot tiene acceso al prompt del curso y al contenido de todos los archivos
 parseados asociados al curso.
 
 Endpoints:
 - POST   /courses/:id/chat           - Enviar mensaje al chatbot del curso
+- POST   /courses/:id/chat/stream    - Enviar mensaje y recibir la respuesta por SSE
 - GET    /courses/:id/chat/context   - Obtener información del contexto disponible
+- GET    /courses/:id/chat/cache     - Métricas de la caché de respuestas (profesor/admin)
+- DELETE /courses/:id/chat/cache     - Vaciar la caché de respuestas del curso (profesor/admin)
+- GET    /courses/:id/chat/quota     - Consumo de tokens y cuotas del usuario en el curso
+- GET    /chat/metrics               - Métricas de las llamadas al LLM del proceso (admin)
+- GET    /chat/telemetry             - Tokens y latencias de las llamadas al LLM por curso, institución o día (admin)
+- POST   /courses/:id/conversations  - Crear una conversación guardada en el servidor
+- GET    /courses/:id/conversations  - Listar mis conversaciones del curso
+- GET    /conversations/:id          - Obtener una conversación con sus mensajes
+- POST   /conversations/:id/messages - Continuar una conversación
+- POST   /conversations/:id/messages/stream - Continuar una conversación por SSE
 """
 
-from flask import Blueprint, request, jsonify, current_app
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required
-import google.generativeai as genai
 
 from .. import db
-from ..models import Course, CourseFile, UserCourse
-from ..decorators import get_current_user, course_access_required
+from ..models import Conversation, Course, CourseFile, LLMCall, User, UserCourse
+from ..decorators import (
+    admin_required,
+    get_current_identity,
+    get_current_user,
+    get_course_roles,
+    course_access_required,
+    course_teacher_or_admin_required
+)
 from ..exceptions import (
     ValidationError,
     ResourceNotFoundError,
     DatabaseError,
-    AuthorizationError
+    AuthorizationError,
+    QuotaExceededError,
+    ServiceUnavailableError
+)
+from ..utils.file_parser import truncate_text
+from ..utils.answer_cache import (
+    answer_cache_enabled,
+    answer_cache_key,
+    answer_cache_stats,
+    course_answer_cache_stats,
+    get_cached_answer,
+    invalidate_course_answers,
+    store_answer
+)
+from ..utils.gemini_client import model_registry_stats
+from ..utils.llm_gateway import admitted_stream, get_llm_gateway
+from ..utils.llm_provider import LLMResponse, LLMStream, empty_usage, get_llm_provider
+from ..utils.llm_telemetry import (
+    GROUP_BY_DAY,
+    GROUP_BY_OPTIONS,
+    llm_telemetry_report,
+    llm_telemetry_writer_stats,
+    record_llm_call,
+)
+from ..utils.model_router import route_chat, routing_signature, routing_stats
+from ..utils.single_flight import chat_flights
+from ..utils.token_quota import check_token_quota, record_token_usage, token_quota_status
+from ..utils.retrieval import get_course_index, retrieve_relevant_chunks
+from ..utils.context_snapshot import get_prompt_template
+from ..utils.conversations import (
+    SUMMARY_INSTRUCTION,
+    append_exchange,
+    build_history,
+    build_summary_prompt,
+    compact_conversation,
+    start_conversation
 )
-from ..utils.file_parser import estimate_token_count, truncate_text
 
 # Blueprint
 chat_bp = Blueprint('chat', __name__, url_prefix='/api')
 
+# Marcador de la sección de contexto en las plantillas con fragmentos indexados
+RETRIEVED_CONTEXT_PLACEHOLDER = "{{ACACHAT_FRAGMENTOS_RELEVANTES}}"
 
-def initialize_gemini():
-    """Inicializa el cliente de Gemini con la API key."""
-    api_key = current_app.config.get('GEMINI_API_KEY')
-    if not api_key or api_key == "YOUR_GEMINI_API_KEY_HERE":
-        raise ValueError("GEMINI_API_KEY no está configurada correctamente en .env")
-    genai.configure(api_key=api_key)
+# Texto que reemplaza al marcador en el prompt del sistema: los fragmentos van
+# en el mensaje del usuario para que el prompt sea igual en todo el curso
+RETRIEVED_CONTEXT_NOTE = (
+    "Los fragmentos de los materiales relevantes para cada pregunta se incluyen "
+    "en el mensaje del estudiante, en la sección FRAGMENTOS DEL CURSO."
+)
 
 
-def build_course_context(course_id: int, max_tokens: int = None) -> str:
+def build_course_context(course: Course, max_tokens: int = None, query: str = None) -> str:
     """
     Construye el contexto del curso a partir de archivos parseados.
 
+    Si se entrega una pregunta y el curso tiene fragmentos indexados, solo se
+    incluyen los fragmentos más relevantes (BM25) dentro de
+    RETRIEVAL_MAX_CONTEXT_TOKENS. En otro caso se concatenan los archivos
+    completos, del más reciente al más antiguo, hasta max_tokens.
+
     Args:
-        course_id: ID del curso
+        course: Curso
         max_tokens: Límite máximo de tokens para el contexto
+        query: Pregunta del usuario usada para seleccionar fragmentos (opcional)
 
     Returns:
-        str: Contexto formateado con todos los archivos del curso
+        str: Contexto formateado con los materiales del curso
     """
+    if query is not None:
+        chunks = retrieve_relevant_chunks(course, query, max_tokens=max_tokens)
+        if chunks is not None:
+            if not chunks:
+                return "[No se encontraron fragmentos de los materiales relacionados con la pregunta]"
+
+            return "\n\n---\n\n".join(
+                f"## Archivo: {chunk.filename} (fragmento {chunk.position + 1})\n\n{chunk.content}"
+                for chunk in chunks
+            )
+
     if max_tokens is None:
         max_tokens = current_app.config.get('GEMINI_MAX_CONTEXT_TOKENS', 30000)
 
-    files = CourseFile.query.filter_by(course_id=course_id).order_by(
-        CourseFile.uploaded_at.desc()
-    ).all()
+    files = CourseFile.query.filter(
+        CourseFile.course_id == course.id,
+        CourseFile.parsed_text_id.isnot(None)
+    ).order_by(CourseFile.uploaded_at.desc()).all()
 
     context_parts = []
     total_tokens = 0
 
     for file in files:
-        if not file.parsed_content:
-            continue
-
-        # Estimar tokens del contenido del archivo
-        file_tokens = estimate_token_count(file.parsed_content)
+        # Tokens precalculados al parsear (sin cargar el texto)
+        file_tokens = file.token_estimate or 0
 
         # Si agregar este archivo excede el límite, truncarlo o saltar
         if total_tokens + file_tokens > max_tokens:
@@ -88,24 +163,32 @@ def build_course_context(course_id: int, max_tokens: int = None) -> str:
     return "\n\n---\n\n".join(context_parts)
 
 
-def build_system_prompt(course: Course) -> str:
+def build_prompt_template(course: Course) -> str:
     """
-    Construye el prompt del sistema para el chatbot del curso.
+    Construye la plantilla del prompt del sistema para el chatbot del curso.
+
+    Si el curso tiene fragmentos indexados, la sección de contexto queda como
+    RETRIEVED_CONTEXT_PLACEHOLDER y se completa en cada mensaje con los
+    fragmentos relevantes. Si no, se incluyen los archivos completos.
 
     Args:
         course: Objeto Course con el prompt configurado
 
     Returns:
-        str: Prompt del sistema completo
+        str: Plantilla del prompt del sistema
     """
     base_prompt = course.prompt or "Eres un asistente educativo útil que responde preguntas sobre el curso."
 
     # Información del curso que siempre debe incluirse
     institution_name = course.institution.nombre if course.institution else "Institución no registrada"
     grade_name = course.grade.name if course.grade else "Grado no asignado"
-    teachers = course.get_teachers()
+    # Solo los nombres de los docentes, en una consulta (sin cargar todas las inscripciones)
+    teachers = db.session.query(User.username).join(UserCourse, UserCourse.user_id == User.id).filter(
+        UserCourse.course_id == course.id,
+        UserCourse.role_in_course == 'teacher'
+    ).all()
     if teachers:
-        teacher_names = ", ".join(sorted({teacher.username for teacher in teachers if teacher and teacher.username}))
+        teacher_names = ", ".join(sorted({username for (username,) in teachers if username}))
     else:
         teacher_names = "Aún no hay profesores asignados al curso"
 
@@ -116,7 +199,10 @@ def build_system_prompt(course: Course) -> str:
 - Docentes responsables: {teacher_names}
 """
 
-    context = build_course_context(course.id)
+    if len(get_course_index(course)):
+        context = RETRIEVED_CONTEXT_PLACEHOLDER
+    else:
+        context = build_course_context(course)
 
     full_prompt = f"""{course_overview}
 # INSTRUCCIONES PRINCIPALES
@@ -138,6 +224,333 @@ Tienes acceso a los siguientes materiales del curso para responder preguntas:
     return full_prompt
 
 
+def build_chat_prompt(course: Course, query: str = None) -> tuple:
+    """
+    Construye el prompt del sistema y el último mensaje para el chatbot del curso.
+
+    El prompt del sistema es la plantilla del snapshot del curso, igual para
+    todos los mensajes mientras su content_version no cambie (así el proveedor
+    reutiliza el mismo modelo, ver utils/gemini_client.py). Los fragmentos
+    recuperados para la pregunta se agregan al mensaje del usuario.
+
+    Args:
+        course: Objeto Course con el prompt configurado
+        query: Última pregunta del usuario, para recuperar fragmentos relevantes
+
+    Returns:
+        tuple: (system_prompt, message, context), con context vacío si el
+        curso no tiene fragmentos indexados
+    """
+    template = get_prompt_template(course, build_prompt_template)
+    query = query or ""
+
+    if RETRIEVED_CONTEXT_PLACEHOLDER not in template:
+        return template, query, ""
+
+    context = build_course_context(course, query=query)
+    system_prompt = template.replace(RETRIEVED_CONTEXT_PLACEHOLDER, RETRIEVED_CONTEXT_NOTE)
+    message = f"# FRAGMENTOS DEL CURSO\n{context}\n\n# PREGUNTA\n{query}"
+    return system_prompt, message, context
+
+
+def parse_chat_request(data) -> tuple:
+    """
+    Valida el body de una petición de chat y lo convierte al formato de Gemini.
+
+    Args:
+        data: Body JSON de la petición
+
+    Returns:
+        tuple: (gemini_messages, generation_config)
+
+    Raises:
+        ValidationError: Si el body no contiene mensajes válidos
+    """
+    if not data or 'messages' not in data:
+        raise ValidationError("Se requiere el campo 'messages'")
+
+    messages = data.get('messages', [])
+    if not isinstance(messages, list) or len(messages) == 0:
+        raise ValidationError("El campo 'messages' debe ser un array no vacío")
+
+    # Convertir mensajes al formato de Gemini
+    gemini_messages = []
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+
+        role = msg.get('role', 'user')
+        content = msg.get('content', '')
+
+        if not content:
+            continue
+
+        # Gemini usa 'user' y 'model' como roles
+        if role in ['user', 'model']:
+            gemini_messages.append({
+                'role': role,
+                'parts': [content]
+            })
+
+    if not gemini_messages:
+        raise ValidationError("No hay mensajes válidos para procesar")
+
+    return gemini_messages, build_generation_config(data)
+
+
+def build_generation_config(data) -> dict:
+    """
+    Construye la configuración de generación a partir de los parámetros opcionales del body.
+
+    Args:
+        data: Body JSON de la petición (temperature, max_tokens)
+
+    Returns:
+        dict: Configuración de generación (temperature, max_output_tokens)
+    """
+    temperature = data.get('temperature', current_app.config.get('GEMINI_TEMPERATURE', 0.7))
+    max_tokens = data.get('max_tokens', current_app.config.get('GEMINI_MAX_OUTPUT_TOKENS', 2048))
+
+    return {
+        "temperature": temperature,
+        "max_output_tokens": max_tokens,
+    }
+
+
+def send_course_message(course: Course, user, gemini_messages: list, generation_config: dict,
+                        stream: bool = False):
+    """
+    Envía el último mensaje al proveedor de LLM con el prompt del sistema del curso.
+
+    Args:
+        course: Curso con el que se conversa
+        user: Usuario que envía el mensaje (para auditoría)
+        gemini_messages: Mensajes ya convertidos al formato de Gemini
+        generation_config: Configuración de generación
+        stream: Si es True, retorna la respuesta en streaming
+
+    Returns:
+        LLMResponse | LLMStream: Respuesta del proveedor (o de la caché de respuestas)
+
+    Raises:
+        QuotaExceededError: Si el usuario, el curso o la institución agotaron su cuota de tokens
+        ServiceUnavailableError: Si no hay cupo para llamar al LLM (ver utils/llm_gateway.py)
+    """
+    provider = get_llm_provider()
+    question = gemini_messages[-1]['parts'][0]
+
+    # Solo las preguntas sin historial se responden desde la caché
+    cache_key = None
+    if len(gemini_messages) == 1 and answer_cache_enabled():
+        cache_key = answer_cache_key(course, question, generation_config, routing_signature(provider, course))
+        cached = get_cached_answer(cache_key)
+        if cached is not None:
+            cached_text, cached_model = cached
+            current_app.logger.info(f"Respuesta desde caché para curso {course.id} ({cached_model})")
+            if stream:
+                return LLMStream([cached_text], cached_model, empty_usage, cached=True)
+            return LLMResponse(cached_text, cached_model, empty_usage(), cached=True)
+
+    check_token_quota(user, course)
+
+    def build_prompt() -> tuple:
+        # Prompt del sistema del curso y pregunta con los fragmentos relevantes
+        system_prompt, message, context = build_chat_prompt(course, query=question)
+
+        # Log de auditoría del prompt y mensajes
+        current_app.logger.debug(
+            "Prompt Gemini generado para curso %s (%s) por %s:\n%s\n\nMensaje:\n%s",
+            course.id,
+            course.nombre,
+            user.email,
+            system_prompt,
+            message,
+        )
+        return system_prompt, message, context
+
+    history = gemini_messages[:-1]  # El historial va sin el último mensaje
+
+    def route_model(system_prompt: str, context: str):
+        # Modelo rápido para preguntas simples con poco contexto (ver utils/model_router.py)
+        route = route_chat(provider, course, system_prompt + context, history, question)
+        current_app.logger.info(
+            f"Ruta de modelo para curso {course.id}: {route.route} ({route.model}), motivo {route.reason} {route.features}"
+        )
+        return route
+
+    def log_route_latency(route, started_at: float, first_chunk_at: float = None) -> None:
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        ttft = f", primer fragmento {(first_chunk_at - started_at) * 1000:.0f} ms" if first_chunk_at else ""
+        current_app.logger.info(
+            f"Respuesta del LLM para curso {course.id}: ruta {route.route} ({route.model}) en {latency_ms:.0f} ms{ttft}"
+        )
+    gateway = get_llm_gateway()
+    user_id = user.id
+    single_flight = current_app.config.get('SINGLE_FLIGHT_ENABLED', True)
+    wait_seconds = current_app.config.get('SINGLE_FLIGHT_WAIT_SECONDS', 120)
+
+    if not stream:
+        def call() -> LLMResponse:
+            # Solo la llamada real ocupa un cupo (no las peticiones coalescidas)
+            system_prompt, message, context = build_prompt()
+            route = route_model(system_prompt, context)
+            queued_at = time.perf_counter()
+            gateway.acquire(course.institution_id, course.id)
+            started_at = time.perf_counter()
+            try:
+                response = provider.chat(system_prompt, history, message, generation=generation_config,
+                                         model=route.model)
+            except Exception:
+                record_llm_call(LLMCall.OPERATION_CHAT, course, user_id, route.model, started_at=started_at,
+                                queued_at=queued_at, status=LLMCall.STATUS_ERROR, route=route.route)
+                raise
+            finally:
+                gateway.release()
+            record_llm_call(LLMCall.OPERATION_CHAT, course, user_id, response.model, response.usage,
+                            started_at=started_at, queued_at=queued_at, route=route.route)
+            log_route_latency(route, started_at)
+            # Solo se cobra a quien hizo la llamada (no a las peticiones coalescidas)
+            record_token_usage(user_id, course, response.model, response.usage)
+            if cache_key is not None:
+                store_answer(cache_key, response.text, response.model)
+            return response
+
+        if not single_flight:
+            return call()
+
+        # Peticiones idénticas concurrentes comparten una sola llamada al LLM
+        key = flight_key('chat', course, gemini_messages, generation_config, provider.default_model)
+        response, coalesced = chat_flights.do(key, call, timeout=wait_seconds)
+        if coalesced:
+            current_app.logger.info(f"Respuesta compartida con una petición idéntica en curso {course.id}")
+        return response
+
+    def start_stream() -> LLMStream:
+        # El cupo se mantiene hasta que termina el stream
+        system_prompt, message, context = build_prompt()
+        route = route_model(system_prompt, context)
+        queued_at = time.perf_counter()
+        gateway.acquire(course.institution_id, course.id)
+        started_at = time.perf_counter()
+        try:
+            upstream = provider.stream_chat(system_prompt, history, message, generation=generation_config,
+                                            model=route.model)
+        except Exception:
+            gateway.release()
+            record_llm_call(LLMCall.OPERATION_STREAM, course, user_id, route.model, started_at=started_at,
+                            queued_at=queued_at, status=LLMCall.STATUS_ERROR, route=route.route)
+            raise
+
+        def chunks_and_store():
+            # Se cobra y se guarda solo si el stream terminó completo
+            parts = []
+            first_chunk_at = None
+            try:
+                for text in upstream:
+                    if first_chunk_at is None:
+                        first_chunk_at = time.perf_counter()
+                    parts.append(text)
+                    yield text
+            except Exception:
+                record_llm_call(LLMCall.OPERATION_STREAM, course, user_id, upstream.model,
+                                started_at=started_at, first_chunk_at=first_chunk_at, queued_at=queued_at,
+                                status=LLMCall.STATUS_ERROR, route=route.route)
+                raise
+            record_llm_call(LLMCall.OPERATION_STREAM, course, user_id, upstream.model, upstream.usage,
+                            started_at=started_at, first_chunk_at=first_chunk_at, queued_at=queued_at,
+                            route=route.route)
+            log_route_latency(route, started_at, first_chunk_at)
+            record_token_usage(user_id, course, upstream.model, upstream.usage)
+            if cache_key is not None:
+                store_answer(cache_key, "".join(parts), upstream.model)
+
+        return LLMStream(admitted_stream(gateway, chunks_and_store()), upstream.model, lambda: upstream.usage)
+
+    if not single_flight:
+        return start_stream()
+
+    key = flight_key('stream', course, gemini_messages, generation_config, provider.default_model)
+    shared, coalesced = chat_flights.stream(key, start_stream, timeout=wait_seconds)
+    if coalesced:
+        current_app.logger.info(f"Stream compartido con una petición idéntica en curso {course.id}")
+    return LLMStream(shared.reader(wait_seconds), shared.model, lambda: shared.usage or empty_usage())
+
+
+def flight_key(mode: str, course: Course, gemini_messages: list, generation_config: dict, model: str) -> tuple:
+    """
+    Clave de coalescencia de una llamada al LLM.
+
+    Dos peticiones comparten llamada si piden lo mismo al mismo curso en la
+    misma versión de contenido: mismo historial completo, modelo y parámetros.
+    """
+    history_digest = hashlib.sha256(
+        json.dumps(gemini_messages, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+    return (
+        mode,
+        course.id,
+        course.content_version or 1,
+        history_digest,
+        model,
+        json.dumps(generation_config or {}, sort_keys=True)
+    )
+
+
+def summarize_conversation_turns(previous_summary: str, turns: list, conversation: Conversation) -> str:
+    """
+    Resume turnos de una conversación (junto al resumen previo) con el LLM.
+
+    Los tokens del resumen se cobran al dueño de la conversación. La llamada
+    ocupa un cupo del gateway del LLM como cualquier mensaje del curso.
+
+    Args:
+        previous_summary: Resumen acumulado hasta ahora (o None)
+        turns: Turnos a incorporar
+        conversation: Conversación que se compacta
+
+    Returns:
+        str: Resumen actualizado
+
+    Raises:
+        QuotaExceededError: Si el dueño, el curso o la institución agotaron su cuota de tokens
+        ServiceUnavailableError: Si no hay cupo para llamar al LLM (ver utils/llm_gateway.py)
+    """
+    provider = get_llm_provider()
+    gateway = get_llm_gateway()
+    course = conversation.course
+    check_token_quota(conversation.user, course)
+    prompt = build_summary_prompt(previous_summary, turns)
+    queued_at = time.perf_counter()
+    gateway.acquire(course.institution_id, course.id)
+    started_at = time.perf_counter()
+    try:
+        response = provider.generate(
+            SUMMARY_INSTRUCTION,
+            prompt,
+            generation={
+                "temperature": 0.2,
+                "max_output_tokens": current_app.config.get('CONVERSATION_SUMMARY_MAX_TOKENS', 600),
+            }
+        )
+    except Exception:
+        record_llm_call(LLMCall.OPERATION_SUMMARY, course, conversation.user_id, provider.default_model,
+                        started_at=started_at, queued_at=queued_at, status=LLMCall.STATUS_ERROR)
+        raise
+    finally:
+        gateway.release()
+    record_llm_call(LLMCall.OPERATION_SUMMARY, course, conversation.user_id, response.model,
+                    response.usage, started_at=started_at, queued_at=queued_at)
+    record_token_usage(conversation.user_id, conversation.course, response.model, response.usage)
+    return response.text
+
+
+def format_sse_event(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events con payload JSON."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
 @chat_bp.route("/courses/<int:course_id>/chat", methods=["POST"])
 @jwt_required()
 @course_access_required(course_id_param='course_id')
@@ -163,7 +576,9 @@ def chat_with_course(course_id):
         400: Datos inválidos
         403: No tiene acceso al curso
         404: Curso no encontrado
-        500: Error al procesar con Gemini
+        429: Cuota de tokens agotada (con header Retry-After)
+        500: Error al procesar con el LLM
+        503: Chatbot saturado (con header Retry-After)
     """
     user = get_current_user()
     course = Course.query.get(course_id)
@@ -172,100 +587,183 @@ def chat_with_course(course_id):
         raise ResourceNotFoundError("Curso no encontrado")
 
     # Validar body
-    data = request.get_json()
-    if not data or 'messages' not in data:
-        raise ValidationError("Se requiere el campo 'messages'")
-
-    messages = data.get('messages', [])
-    if not isinstance(messages, list) or len(messages) == 0:
-        raise ValidationError("El campo 'messages' debe ser un array no vacío")
-
-    # Parámetros opcionales
-    temperature = data.get('temperature', current_app.config.get('GEMINI_TEMPERATURE', 0.7))
-    max_tokens = data.get('max_tokens', current_app.config.get('GEMINI_MAX_OUTPUT_TOKENS', 2048))
+    gemini_messages, generation_config = parse_chat_request(request.get_json())
 
     try:
-        # Inicializar Gemini
-        initialize_gemini()
-
-        # Construir el prompt del sistema
-        system_prompt = build_system_prompt(course)
-
-        # Log de auditoría del prompt y mensajes
-        current_app.logger.debug(
-            "Prompt Gemini generado para curso %s (%s) por %s:\n%s",
-            course.id,
-            course.nombre,
-            user.email,
-            system_prompt,
-        )
-
-        # Configurar el modelo
-        model_name = current_app.config.get('GEMINI_MODEL', 'gemini-1.5-flash')
-        model = genai.GenerativeModel(
-            model_name=model_name,
-            system_instruction=system_prompt
-        )
-
-        # Convertir mensajes al formato de Gemini
-        gemini_messages = []
-        for msg in messages:
-            role = msg.get('role', 'user')
-            content = msg.get('content', '')
-
-            if not content:
-                continue
-
-            # Gemini usa 'user' y 'model' como roles
-            if role in ['user', 'model']:
-                gemini_messages.append({
-                    'role': role,
-                    'parts': [content]
-                })
-
-        if not gemini_messages:
-            raise ValidationError("No hay mensajes válidos para procesar")
-
-        # Configuración de generación
-        generation_config = genai.GenerationConfig(
-            temperature=temperature,
-            max_output_tokens=max_tokens,
-        )
-
         # Generar respuesta
-        chat = model.start_chat(history=gemini_messages[:-1])  # Historial sin el último mensaje
-        response = chat.send_message(
-            gemini_messages[-1]['parts'][0],
-            generation_config=generation_config
-        )
-
-        # Extraer texto de la respuesta
+        response = send_course_message(course, user, gemini_messages, generation_config)
         response_text = response.text
 
         current_app.logger.info(
-            f"Chat con curso {course.nombre} por {user.email} - {len(messages)} mensajes"
+            f"Chat con curso {course.nombre} por {user.email} - {len(gemini_messages)} mensajes"
         )
 
         return jsonify({
             "response": response_text,
-            "model": model_name,
+            "model": response.model,
+            "cached": response.cached,
             "course": {
                 "id": course.id,
                 "nombre": course.nombre
             }
         }), 200
 
+    except (QuotaExceededError, ServiceUnavailableError):
+        raise
+
     except ValueError as e:
         # Error de configuración (API key, etc)
-        current_app.logger.error(f"Error de configuración Gemini: {str(e)}")
+        current_app.logger.error(f"Error de configuración del proveedor LLM: {str(e)}")
         raise DatabaseError(f"Error de configuración del chatbot: {str(e)}")
 
     except Exception as e:
         # Error al llamar a la API de Gemini
-        current_app.logger.error(f"Error al generar respuesta con Gemini: {str(e)}")
+        current_app.logger.error(f"Error al generar respuesta con el LLM: {str(e)}")
         raise DatabaseError(f"Error al procesar el mensaje: {str(e)}")
 
 
+@chat_bp.route("/courses/<int:course_id>/chat/stream", methods=["POST"])
+@jwt_required()
+@course_access_required(course_id_param='course_id')
+def stream_chat_with_course(course_id):
+    """
+    Enviar un mensaje al chatbot del curso y recibir la respuesta por streaming (SSE).
+
+    La respuesta se envía como eventos Server-Sent Events a medida que el LLM
+    genera el texto, de modo que el primer fragmento llega sin esperar la
+    respuesta completa.
+
+    Eventos:
+        - chunk: {"text": "..."} por cada fragmento generado
+        - done:  {"model": "...", "usage": {...}, "cached": bool, "course": {...}} al terminar
+        - error: {"msg": "..."} si la generación falla a mitad del stream
+
+    Path params:
+        - course_id: ID del curso
+
+    Body (JSON):
+        - messages: array de mensajes [{role: 'user'/'model', content: '...'}]
+        - temperature: float (opcional, default del config)
+        - max_tokens: int (opcional, default del config)
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Stream text/event-stream
+        400: Datos inválidos
+        403: No tiene acceso al curso
+        404: Curso no encontrado
+        429: Cuota de tokens agotada (con header Retry-After)
+        500: Error al iniciar la generación con el LLM
+        503: Chatbot saturado (con header Retry-After)
+    """
+    user = get_current_user()
+    course = Course.query.get(course_id)
+
+    if not course:
+        raise ResourceNotFoundError("Curso no encontrado")
+
+    gemini_messages, generation_config = parse_chat_request(request.get_json())
+
+    started_at = time.perf_counter()
+
+    try:
+        stream = send_course_message(course, user, gemini_messages, generation_config, stream=True)
+
+    except (QuotaExceededError, ServiceUnavailableError):
+        raise
+
+    except ValueError as e:
+        current_app.logger.error(f"Error de configuración del proveedor LLM: {str(e)}")
+        raise DatabaseError(f"Error de configuración del chatbot: {str(e)}")
+
+    except Exception as e:
+        current_app.logger.error(f"Error al iniciar streaming con el LLM: {str(e)}")
+        raise DatabaseError(f"Error al procesar el mensaje: {str(e)}")
+
+    return stream_chat_response(
+        stream,
+        started_at=started_at,
+        course=course,
+        user=user,
+        messages_count=len(gemini_messages)
+    )
+
+
+def stream_chat_response(stream, started_at: float, course: Course, user,
+                         messages_count: int, on_complete=None, after_done=None) -> Response:
+    """
+    Convierte una respuesta del LLM en streaming en una respuesta SSE.
+
+    Args:
+        stream: LLMStream retornado por el proveedor
+        started_at: time.perf_counter() al inicio del request (para medir latencias)
+        course: Curso del chat
+        user: Usuario que envía el mensaje
+        messages_count: Cantidad de mensajes enviados al modelo (para el log)
+        on_complete: Función opcional on_complete(texto_completo) -> dict, llamada
+                     antes del evento 'done'; su resultado se agrega a ese evento
+        after_done: Función opcional sin argumentos llamada después del evento 'done'
+
+    Returns:
+        Response: Stream text/event-stream
+    """
+    course_info = {"id": course.id, "nombre": course.nombre}
+    user_email = user.email
+
+    def generate():
+        first_chunk_ms = None
+        text_parts = []
+
+        try:
+            for text in stream:
+                if first_chunk_ms is None:
+                    first_chunk_ms = (time.perf_counter() - started_at) * 1000
+
+                text_parts.append(text)
+                yield format_sse_event("chunk", {"text": text})
+
+            done_data = {
+                "model": stream.model,
+                "usage": stream.usage,
+                "cached": stream.cached,
+                "course": course_info
+            }
+            if on_complete:
+                done_data.update(on_complete("".join(text_parts)))
+
+            yield format_sse_event("done", done_data)
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error durante streaming con el LLM: {str(e)}")
+            yield format_sse_event("error", {"msg": "Error al procesar el mensaje"})
+            return
+
+        total_ms = (time.perf_counter() - started_at) * 1000
+        current_app.logger.info(
+            "Chat (stream) con curso %s por %s - %s mensajes, primer fragmento %.0f ms, total %.0f ms",
+            course_info["nombre"],
+            user_email,
+            messages_count,
+            first_chunk_ms if first_chunk_ms is not None else total_ms,
+            total_ms,
+        )
+
+        if after_done:
+            after_done()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Evita que proxies (nginx) acumulen la respuesta
+        }
+    )
+
+
 @chat_bp.route("/courses/<int:course_id>/chat/context", methods=["GET"])
 @jwt_required()
 @course_access_required(course_id_param='course_id')
@@ -291,28 +789,29 @@ def get_course_context(course_id):
     if not course:
         raise ResourceNotFoundError("Curso no encontrado")
 
-    # Obtener archivos parseados
-    files = CourseFile.query.filter_by(course_id=course_id).all()
+    # Solo metadatos de los archivos: los totales vienen precalculados en el curso
+    files = db.session.query(
+        CourseFile.id,
+        CourseFile.filename,
+        CourseFile.parsed_text_id,
+        CourseFile.parsed_at,
+        CourseFile.char_count,
+        CourseFile.token_estimate
+    ).filter(CourseFile.course_id == course_id).order_by(CourseFile.id).all()
 
     parsed_files = []
-    total_characters = 0
-    total_tokens = 0
 
     for file in files:
         file_info = {
             "id": file.id,
             "filename": file.filename,
-            "has_parsed_content": file.parsed_content is not None,
+            "has_parsed_content": file.parsed_text_id is not None,
             "parsed_at": file.parsed_at.isoformat() if file.parsed_at else None
         }
 
-        if file.parsed_content:
-            chars = len(file.parsed_content)
-            tokens = estimate_token_count(file.parsed_content)
-            file_info["characters"] = chars
-            file_info["estimated_tokens"] = tokens
-            total_characters += chars
-            total_tokens += tokens
+        if file.parsed_text_id is not None:
+            file_info["characters"] = file.char_count or 0
+            file_info["estimated_tokens"] = file.token_estimate or 0
 
         parsed_files.append(file_info)
 
@@ -324,14 +823,563 @@ def get_course_context(course_id):
         },
         "files": parsed_files,
         "total_files": len(files),
-        "parsed_files_count": sum(1 for f in files if f.parsed_content),
-        "total_characters": total_characters,
-        "estimated_total_tokens": total_tokens,
-        "model": current_app.config.get('GEMINI_MODEL', 'gemini-1.5-flash'),
+        "parsed_files_count": course.parsed_files_count,
+        "total_characters": course.parsed_char_count,
+        "estimated_total_tokens": course.parsed_token_estimate,
+        "model": get_llm_provider().default_model,
         "max_context_tokens": current_app.config.get('GEMINI_MAX_CONTEXT_TOKENS', 30000)
     }), 200
 
 
+@chat_bp.route("/courses/<int:course_id>/chat/cache", methods=["GET"])
+@jwt_required()
+@course_teacher_or_admin_required(course_id_param='course_id')
+def get_answer_cache_stats(course_id):
+    """
+    Obtener las métricas de la caché de respuestas del curso.
+
+    Solo profesores del curso o administradores.
+
+    Path params:
+        - course_id: ID del curso
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Aciertos, fallos y entradas del curso, y métricas del proceso
+        403: No es profesor del curso
+    """
+    return jsonify(course_answer_cache_stats(course_id)), 200
+
+
+@chat_bp.route("/courses/<int:course_id>/chat/cache", methods=["DELETE"])
+@jwt_required()
+@course_teacher_or_admin_required(course_id_param='course_id')
+def clear_answer_cache(course_id):
+    """
+    Vaciar la caché de respuestas del curso.
+
+    Útil cuando cambia información que no está en los archivos (ej: una
+    fecha de prueba). Solo profesores del curso o administradores.
+
+    Path params:
+        - course_id: ID del curso
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Cantidad de respuestas eliminadas en este proceso (las de los
+             demás workers dejan de usarse)
+        403: No es profesor del curso
+    """
+    user_email = get_current_user().email
+    removed = invalidate_course_answers(course_id)
+    db.session.commit()
+
+    current_app.logger.info(
+        f"Caché de respuestas del curso {course_id} vaciada por {user_email} ({removed} respuestas)"
+    )
+
+    return jsonify({
+        "msg": "Caché de respuestas vaciada exitosamente",
+        "removed": removed
+    }), 200
+
+
+@chat_bp.route("/courses/<int:course_id>/chat/quota", methods=["GET"])
+@jwt_required()
+@course_access_required(course_id_param='course_id')
+def get_token_quota(course_id):
+    """
+    Obtener el consumo de tokens y las cuotas del usuario actual en el curso.
+
+    Incluye el consumo del día y del mes del usuario, del curso y de su
+    institución, con el límite configurado y cuándo se reinicia cada período.
+
+    Path params:
+        - course_id: ID del curso
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Consumo y cuotas por ámbito y período
+        403: No tiene acceso al curso
+        404: Curso no encontrado
+    """
+    user = get_current_identity()
+    course = Course.query.get(course_id)
+
+    if not course:
+        raise ResourceNotFoundError("Curso no encontrado")
+
+    return jsonify(token_quota_status(user, course)), 200
+
+
+@chat_bp.route("/chat/metrics", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_chat_metrics():
+    """
+    Obtener las métricas de las llamadas al LLM de este proceso.
+
+    Incluye el control de admisión (cupos en uso, profundidad de la cola,
+    rechazos y tiempos de espera), la resiliencia del proveedor (reintentos,
+    timeouts, hedging y estado del circuit breaker), la coalescencia de
+    peticiones idénticas, la caché de respuestas, el registro de modelos y
+    las decisiones del enrutamiento entre el modelo rápido y el grande.
+    Solo administradores.
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Métricas del proceso
+        403: No es administrador
+    """
+    return jsonify({
+        "admission": get_llm_gateway().stats(),
+        "provider": get_llm_provider().stats(),
+        "single_flight": chat_flights.stats(),
+        "answer_cache": answer_cache_stats(),
+        "models": model_registry_stats(),
+        "routing": routing_stats(),
+        "telemetry_writer": llm_telemetry_writer_stats()
+    }), 200
+
+
+def parse_telemetry_range(args) -> tuple:
+    """
+    Lee el rango de fechas de la telemetría: from/to (YYYY-MM-DD) o los últimos `days` días.
+
+    Returns:
+        tuple: (desde, hasta) como datetime, con `hasta` excluido
+
+    Raises:
+        ValidationError: Si las fechas son inválidas o el rango supera 366 días
+    """
+    try:
+        if args.get('from'):
+            since = datetime.strptime(args['from'], '%Y-%m-%d')
+            until = datetime.strptime(args['to'], '%Y-%m-%d') + timedelta(days=1) if args.get('to') else datetime.utcnow()
+        else:
+            days = int(args.get('days', 7))
+            if days < 1:
+                raise ValueError
+            until = datetime.utcnow()
+            since = datetime.combine(until.date() - timedelta(days=days - 1), datetime.min.time())
+    except ValueError:
+        raise ValidationError("Rango inválido: usa from/to con formato YYYY-MM-DD o days como entero positivo")
+
+    if since >= until:
+        raise ValidationError("La fecha 'from' debe ser anterior a 'to'")
+    if until - since > timedelta(days=366):
+        raise ValidationError("El rango no puede superar 366 días")
+
+    return since, until
+
+
+@chat_bp.route("/chat/telemetry", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_chat_telemetry():
+    """
+    Obtener el consumo de tokens y las latencias de las llamadas al LLM.
+
+    Agrega los registros de telemetría (todas las llamadas de todos los
+    workers) por curso, institución, día o ruta del enrutamiento de modelos:
+    llamadas, errores, tokens de entrada/salida/cacheados y percentiles de
+    latencia total y de tiempo al primer fragmento. Los registros se escriben en lote, por lo que los
+    últimos segundos pueden no estar incluidos. Solo administradores.
+
+    Query params:
+        - group_by: course, institution, day o route (por defecto day)
+        - from, to: Rango de fechas YYYY-MM-DD (ambos incluidos)
+        - days: Últimos N días si no se indica from (por defecto 7)
+        - course_id, institution_id: Filtros opcionales
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: {"group_by", "from", "to", "groups": [...], "totals": {...}}
+        400: Parámetros inválidos
+        403: No es administrador
+    """
+    group_by = request.args.get('group_by', GROUP_BY_DAY)
+    if group_by not in GROUP_BY_OPTIONS:
+        raise ValidationError(f"group_by debe ser uno de: {', '.join(GROUP_BY_OPTIONS)}")
+
+    since, until = parse_telemetry_range(request.args)
+    report = llm_telemetry_report(
+        group_by,
+        since,
+        until,
+        course_id=request.args.get('course_id', type=int),
+        institution_id=request.args.get('institution_id', type=int)
+    )
+
+    return jsonify({
+        "group_by": group_by,
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        **report
+    }), 200
+
+
+# ==========================================
+# CONVERSACIONES GUARDADAS EN EL SERVIDOR
+# ==========================================
+
+def get_owned_conversation(conversation_id: int, user, allow_admin: bool = False) -> Conversation:
+    """
+    Obtiene una conversación verificando que pertenezca al usuario.
+
+    Args:
+        conversation_id: ID de la conversación
+        user: Usuario actual
+        allow_admin: Si es True, los administradores pueden acceder a cualquier conversación
+
+    Returns:
+        Conversation: Conversación
+
+    Raises:
+        ResourceNotFoundError: Si la conversación no existe
+        AuthorizationError: Si no pertenece al usuario o ya no tiene acceso al curso
+    """
+    conversation = db.session.get(Conversation, conversation_id)
+
+    if not conversation:
+        raise ResourceNotFoundError("Conversación no encontrada")
+
+    if user.is_admin() and allow_admin:
+        return conversation
+
+    if conversation.user_id != user.id:
+        raise AuthorizationError("No tienes acceso a esta conversación")
+
+    # El usuario pudo perder el acceso al curso después de crearla
+    if not user.is_admin():
+        if not get_course_roles(conversation.course_id):
+            raise AuthorizationError("No tienes acceso a este curso")
+
+    return conversation
+
+
+def parse_conversation_message(data) -> tuple:
+    """
+    Valida el body de un mensaje de conversación.
+
+    Returns:
+        tuple: (content, generation_config)
+
+    Raises:
+        ValidationError: Si el mensaje está vacío
+    """
+    if not data or not isinstance(data.get('content'), str) or not data['content'].strip():
+        raise ValidationError("Se requiere el campo 'content'")
+
+    return data['content'].strip(), build_generation_config(data)
+
+
+def record_conversation_exchange(conversation: Conversation, content: str, response_text: str) -> None:
+    """Guarda la pregunta y la respuesta como turnos de la conversación y hace commit."""
+    append_exchange(conversation, content, response_text)
+    db.session.commit()
+
+
+def schedule_conversation_compaction(conversation_id: int) -> None:
+    """
+    Compacta el historial en un thread propio, después de responder.
+
+    El resumen es otra llamada al LLM: hacerla antes de devolver la respuesta
+    duplicaría la latencia del mensaje que superó el presupuesto.
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                compact_conversation_history(conversation_id)
+            finally:
+                db.session.remove()
+
+    threading.Thread(target=run, name=f'compact-conversation-{conversation_id}', daemon=True).start()
+
+
+def compact_conversation_history(conversation_id: int) -> None:
+    """
+    Compacta el historial de una conversación si superó el presupuesto de tokens.
+
+    Un error al compactar no afecta la respuesta ya entregada. Si el gateway
+    del LLM está saturado o el dueño agotó su cuota de tokens se omite, y se
+    vuelve a intentar con el próximo mensaje.
+    """
+    try:
+        conversation = db.session.get(Conversation, conversation_id)
+
+        def summarize(previous_summary: str, turns: list) -> str:
+            return summarize_conversation_turns(previous_summary, turns, conversation)
+
+        if compact_conversation(conversation, summarize):
+            db.session.commit()
+    except ServiceUnavailableError:
+        db.session.rollback()
+        current_app.logger.info(f"Compactación de la conversación {conversation_id} omitida: chatbot saturado")
+    except QuotaExceededError:
+        db.session.rollback()
+        current_app.logger.info(f"Compactación de la conversación {conversation_id} omitida: cuota de tokens agotada")
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error al compactar la conversación {conversation_id}: {str(e)}")
+
+
+@chat_bp.route("/courses/<int:course_id>/conversations", methods=["POST"])
+@jwt_required()
+@course_access_required(course_id_param='course_id')
+def create_conversation(course_id):
+    """
+    Crear una conversación con el chatbot del curso.
+
+    Path params:
+        - course_id: ID del curso
+
+    Body (JSON, opcional):
+        - title: título de la conversación (por defecto, la primera pregunta)
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        201: Conversación creada
+        403: No tiene acceso al curso
+        404: Curso no encontrado
+    """
+    user = get_current_user()
+    course = Course.query.get(course_id)
+
+    if not course:
+        raise ResourceNotFoundError("Curso no encontrado")
+
+    data = request.get_json(silent=True) or {}
+
+    try:
+        conversation = start_conversation(user, course, title=data.get('title'))
+        db.session.commit()
+
+        return jsonify({
+            "msg": "Conversación creada exitosamente",
+            "conversation": conversation.to_dict()
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error al crear conversación: {str(e)}")
+        raise DatabaseError("Error al crear la conversación")
+
+
+@chat_bp.route("/courses/<int:course_id>/conversations", methods=["GET"])
+@jwt_required()
+@course_access_required(course_id_param='course_id')
+def list_conversations(course_id):
+    """
+    Listar las conversaciones del usuario actual en un curso (más recientes primero).
+
+    Path params:
+        - course_id: ID del curso
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Lista de conversaciones
+        403: No tiene acceso al curso
+    """
+    user = get_current_identity()
+
+    conversations = Conversation.query.filter_by(
+        user_id=user.id,
+        course_id=course_id
+    ).order_by(Conversation.updated_at.desc()).all()
+
+    return jsonify({
+        "conversations": [conversation.to_dict() for conversation in conversations],
+        "total": len(conversations)
+    }), 200
+
+
+@chat_bp.route("/conversations/<int:conversation_id>", methods=["GET"])
+@jwt_required()
+def get_conversation(conversation_id):
+    """
+    Obtener una conversación con todos sus mensajes.
+
+    Path params:
+        - conversation_id: ID de la conversación
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Conversación con sus mensajes
+        403: La conversación no pertenece al usuario
+        404: Conversación no encontrada
+    """
+    user = get_current_identity()
+    conversation = get_owned_conversation(conversation_id, user, allow_admin=True)
+
+    return jsonify(conversation.to_dict(include_turns=True)), 200
+
+
+@chat_bp.route("/conversations/<int:conversation_id>/messages", methods=["POST"])
+@jwt_required()
+def send_conversation_message(conversation_id):
+    """
+    Continuar una conversación: enviar un mensaje y recibir la respuesta.
+
+    El historial se arma en el servidor (resumen + turnos recientes), por lo
+    que el cliente solo envía el mensaje nuevo.
+
+    Path params:
+        - conversation_id: ID de la conversación
+
+    Body (JSON):
+        - content: texto del mensaje (requerido)
+        - temperature: float (opcional, default del config)
+        - max_tokens: int (opcional, default del config)
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Respuesta del chatbot
+        400: Mensaje vacío
+        403: La conversación no pertenece al usuario
+        404: Conversación no encontrada
+        429: Cuota de tokens agotada (con header Retry-After)
+        500: Error al procesar con el LLM
+        503: Chatbot saturado (con header Retry-After)
+    """
+    user = get_current_user()
+    conversation = get_owned_conversation(conversation_id, user)
+    course = conversation.course
+
+    content, generation_config = parse_conversation_message(request.get_json())
+    gemini_messages = build_history(conversation) + [{'role': 'user', 'parts': [content]}]
+
+    try:
+        response = send_course_message(course, user, gemini_messages, generation_config)
+        response_text = response.text
+
+        record_conversation_exchange(conversation, content, response_text)
+
+        current_app.logger.info(
+            f"Conversación {conversation.id} con curso {course.nombre} por {user.email} - "
+            f"{len(gemini_messages)} mensajes enviados"
+        )
+
+    except (QuotaExceededError, ServiceUnavailableError):
+        db.session.rollback()
+        raise
+
+    except ValueError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error de configuración del proveedor LLM: {str(e)}")
+        raise DatabaseError(f"Error de configuración del chatbot: {str(e)}")
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error al generar respuesta con el LLM: {str(e)}")
+        raise DatabaseError(f"Error al procesar el mensaje: {str(e)}")
+
+    body = {
+        "response": response_text,
+        "model": response.model,
+        "usage": response.usage,
+        "cached": response.cached,
+        "conversation": conversation.to_dict(),
+        "course": {
+            "id": course.id,
+            "nombre": course.nombre
+        }
+    }
+    schedule_conversation_compaction(conversation.id)
+
+    return jsonify(body), 200
+
+
+@chat_bp.route("/conversations/<int:conversation_id>/messages/stream", methods=["POST"])
+@jwt_required()
+def stream_conversation_message(conversation_id):
+    """
+    Continuar una conversación recibiendo la respuesta por streaming (SSE).
+
+    Mismos eventos que /courses/:id/chat/stream; el evento 'done' incluye
+    además la conversación actualizada.
+
+    Path params:
+        - conversation_id: ID de la conversación
+
+    Body (JSON):
+        - content: texto del mensaje (requerido)
+        - temperature: float (opcional, default del config)
+        - max_tokens: int (opcional, default del config)
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Stream text/event-stream
+        400: Mensaje vacío
+        403: La conversación no pertenece al usuario
+        404: Conversación no encontrada
+        429: Cuota de tokens agotada (con header Retry-After)
+        500: Error al iniciar la generación con el LLM
+        503: Chatbot saturado (con header Retry-After)
+    """
+    user = get_current_user()
+    conversation = get_owned_conversation(conversation_id, user)
+    course = conversation.course
+
+    content, generation_config = parse_conversation_message(request.get_json())
+    gemini_messages = build_history(conversation) + [{'role': 'user', 'parts': [content]}]
+
+    started_at = time.perf_counter()
+
+    try:
+        stream = send_course_message(course, user, gemini_messages, generation_config, stream=True)
+
+    except (QuotaExceededError, ServiceUnavailableError):
+        raise
+
+    except ValueError as e:
+        current_app.logger.error(f"Error de configuración del proveedor LLM: {str(e)}")
+        raise DatabaseError(f"Error de configuración del chatbot: {str(e)}")
+
+    except Exception as e:
+        current_app.logger.error(f"Error al iniciar streaming con el LLM: {str(e)}")
+        raise DatabaseError(f"Error al procesar el mensaje: {str(e)}")
+
+    conversation_id = conversation.id
+
+    def on_complete(response_text: str) -> dict:
+        conversation = db.session.get(Conversation, conversation_id)
+        record_conversation_exchange(conversation, content, response_text)
+        return {"conversation": conversation.to_dict()}
+
+    return stream_chat_response(
+        stream,
+        started_at=started_at,
+        course=course,
+        user=user,
+        messages_count=len(gemini_messages),
+        on_complete=on_complete,
+        after_done=lambda: compact_conversation_history(conversation_id)
+    )
+
+
 # ==========================================
 # ERROR HANDLERS
 # ==========================================
@@ -345,6 +1393,28 @@ def handle_app_error(error):
     return jsonify({"msg": error.message}), error.status_code
 
 
+@chat_bp.errorhandler(QuotaExceededError)
+def handle_quota_exceeded(error):
+    """Responde 429 indicando qué cuota se agotó y cuándo se reinicia."""
+    response = jsonify(dict(
+        error.details,
+        msg=error.message,
+        reset_at=error.reset_at.isoformat() if error.reset_at else None
+    ))
+    if error.retry_after:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.status_code
+
+
+@chat_bp.errorhandler(ServiceUnavailableError)
+def handle_service_unavailable(error):
+    """Responde 503 indicando cuándo reintentar."""
+    response = jsonify({"msg": error.message})
+    if error.retry_after:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response, error.status_code
+
+
 @chat_bp.errorhandler(Exception)
 def handle_unexpected_error(error):
     """Maneja errores inesperados."""
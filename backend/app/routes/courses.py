@@ -32,9 +32,14 @@ from ..exceptions import (
 )
 from ..decorators import (
     admin_required,
+    get_current_identity,
     get_current_user,
+    get_course_roles,
     course_teacher_or_admin_required
 )
+from ..utils.context_snapshot import bump_content_version
+from ..utils.institution_cache import invalidate_institutions_listing
+from ..utils.query_options import course_options, enrollment_options
 
 # Blueprint
 courses_bp = Blueprint('courses', __name__, url_prefix='/api/courses')
@@ -69,7 +74,7 @@ def list_courses():
     Returns:
         200: Lista de cursos
     """
-    user = get_current_user()
+    user = get_current_identity()
 
     # Parámetros de consulta
     institution_id = request.args.get('institution_id', type=int)
@@ -92,6 +97,9 @@ def list_courses():
         # Profesores y admins ven todos
         query = Course.query
 
+    # Grado e institución en la misma consulta
+    query = query.options(*course_options())
+
     # Aplicar filtros
     if institution_id:
         query = query.filter_by(institution_id=institution_id)
@@ -136,14 +144,14 @@ def my_courses():
     Returns:
         200: Lista de matrículas con cursos
     """
-    user = get_current_user()
+    user = get_current_identity()
 
     # Parámetros
     year = request.args.get('year', type=int)
     role_in_course = request.args.get('role_in_course')
 
-    # Query de inscripciones
-    query = UserCourse.query.filter_by(user_id=user.id)
+    # Query de inscripciones (curso, grado e institución en la misma consulta)
+    query = UserCourse.query.options(*enrollment_options(include_course=True)).filter_by(user_id=user.id)
 
     if year:
         query = query.filter_by(year=year)
@@ -208,6 +216,8 @@ def create_course():
 
     try:
         db.session.add(course)
+        # El listado público de instituciones muestra la cantidad de cursos
+        invalidate_institutions_listing()
         db.session.commit()
 
         current_app.logger.info(
@@ -244,7 +254,7 @@ def get_course(course_id):
         403: No tiene acceso al curso
         404: Curso no encontrado
     """
-    user = get_current_user()
+    user = get_current_identity()
     course = Course.query.get(course_id)
 
     if not course:
@@ -253,12 +263,7 @@ def get_course(course_id):
     # Verificar acceso
     if not user.is_admin():
         # Verificar si está inscrito
-        enrollment = UserCourse.query.filter_by(
-            user_id=user.id,
-            course_id=course_id
-        ).first()
-
-        if not enrollment:
+        if not get_course_roles(course_id):
             raise AuthorizationError("No tienes acceso a este curso")
 
     return jsonify(course.to_dict()), 200
@@ -282,6 +287,10 @@ def update_course(course_id):
         - institution_id: int (opcional)
         - grade_id: int (opcional)
         - is_active: bool (opcional, solo admin)
+        - model_routing: 'auto', 'fast' o 'large' (opcional; modelo del chatbot)
+        - routing_max_context_tokens, routing_max_history_messages,
+          routing_max_question_tokens: int (opcionales; umbrales del modelo
+          rápido, null = valor global)
 
     Headers:
         Authorization: Bearer <access_token>
@@ -319,6 +328,8 @@ def update_course(course_id):
         institution = Institution.query.get(data["institution_id"])
         if not institution:
             raise ResourceNotFoundError("Institución no encontrada")
+        if data["institution_id"] != course.institution_id:
+            invalidate_institutions_listing()
         course.institution_id = data["institution_id"]
 
     if "grade_id" in data:
@@ -327,10 +338,20 @@ def update_course(course_id):
             raise ResourceNotFoundError("Grado no encontrado")
         course.grade_id = data["grade_id"]
 
+    # Enrutamiento entre el modelo rápido y el grande (no cambia el contexto del chatbot)
+    for field in ("model_routing", "routing_max_context_tokens",
+                  "routing_max_history_messages", "routing_max_question_tokens"):
+        if field in data:
+            setattr(course, field, data[field])
+
     # Solo admins pueden cambiar is_active
     if "is_active" in data and user.is_admin():
         course.is_active = data["is_active"]
 
+    # Cambios que afectan el prompt del sistema del chatbot
+    if any(field in data for field in ("nombre", "prompt", "institution_id", "grade_id")):
+        bump_content_version(Course.id == course.id)
+
     try:
         db.session.commit()
         current_app.logger.info(f"Curso actualizado: {course.nombre}")
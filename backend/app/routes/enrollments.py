@@ -38,6 +38,10 @@ from ..decorators import (
     get_current_user,
     course_teacher_or_admin_required
 )
+from ..utils.context_snapshot import bump_content_version
+from ..utils.auth_cache import invalidate_memberships
+from ..utils.course_stats import adjust_course_counts
+from ..utils.query_options import course_options, enrollment_options
 
 # Blueprint
 enrollments_bp = Blueprint('enrollments', __name__, url_prefix='/api/enrollments')
@@ -77,8 +81,8 @@ def list_all_enrollments():
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 50, type=int), 100)
 
-    # Query base
-    query = UserCourse.query
+    # Query base (curso y usuario en la misma consulta)
+    query = UserCourse.query.options(*enrollment_options(include_course=True, include_user=True))
 
     # Aplicar filtros
     if year:
@@ -164,6 +168,8 @@ def enroll_student():
 
     try:
         db.session.add(enrollment)
+        adjust_course_counts(course.id, students=1)
+        invalidate_memberships([(user.id, course.id)])
         db.session.commit()
 
         current_app.logger.info(
@@ -245,6 +251,10 @@ def assign_teacher():
 
     try:
         db.session.add(enrollment)
+        adjust_course_counts(course.id, teachers=1)
+        # Los docentes aparecen en el prompt del sistema del curso
+        bump_content_version(Course.id == course.id)
+        invalidate_memberships([(data["user_id"], course.id)])
         db.session.commit()
 
         current_app.logger.info(
@@ -328,6 +338,8 @@ def bulk_enroll_students():
 
     try:
         db.session.bulk_save_objects(enrollments)
+        adjust_course_counts(course.id, students=len(enrollments))
+        invalidate_memberships([(user_id, course.id) for user_id in new_user_ids])
         db.session.commit()
         current_app.logger.info(
             f"{len(enrollments)} estudiantes inscritos al curso {course.nombre} (año {year})"
@@ -367,7 +379,7 @@ def get_course_enrollments(course_id):
         403: No autorizado
         404: Curso no encontrado
     """
-    course = Course.query.get(course_id)
+    course = db.session.get(Course, course_id, options=course_options())
     if not course:
         raise ResourceNotFoundError("Curso no encontrado")
 
@@ -375,8 +387,10 @@ def get_course_enrollments(course_id):
     year = request.args.get('year', type=int)
     role_in_course = request.args.get('role_in_course')
 
-    # Query de inscripciones
-    query = UserCourse.query.filter_by(course_id=course_id)
+    # Query de inscripciones (usuario en la misma consulta)
+    query = UserCourse.query.options(
+        *enrollment_options(include_course=False, include_user=True)
+    ).filter_by(course_id=course_id)
 
     if year:
         query = query.filter_by(year=year)
@@ -427,6 +441,13 @@ def delete_enrollment(enrollment_id):
         course_name = enrollment.course.nombre if enrollment.course else "Unknown"
         user_email = enrollment.user.email if enrollment.user else "Unknown"
 
+        if enrollment.role_in_course == 'teacher':
+            bump_content_version(Course.id == enrollment.course_id)
+            adjust_course_counts(enrollment.course_id, teachers=-1)
+        else:
+            adjust_course_counts(enrollment.course_id, students=-1)
+
+        invalidate_memberships([(enrollment.user_id, enrollment.course_id)])
         db.session.delete(enrollment)
         db.session.commit()
 
@@ -8,16 +8,17 @@ Endpoints:
 - GET    /courses/:id/files          - Listar archivos de un curso
 - POST   /courses/:id/files          - Subir archivo a un curso (profesor/admin)
 - GET    /files/:id/download         - Descargar un archivo
+- GET    /files/:id/parse-status     - Estado del parseo de un archivo
 - DELETE /files/:id                  - Eliminar un archivo (profesor/admin)
 """
 
 from flask import Blueprint, request, jsonify, current_app, send_file
 from flask_jwt_extended import jwt_required
-from datetime import datetime
+from sqlalchemy.orm import load_only
 import os
 
 from .. import db
-from ..models import CourseFile, Course, UserCourse
+from ..models import CourseFile, Course
 from ..schemas import CourseFileSchema
 from ..exceptions import (
     ValidationError,
@@ -26,12 +27,31 @@ from ..exceptions import (
     AuthorizationError
 )
 from ..decorators import (
+    get_current_identity,
     get_current_user,
+    get_course_roles,
     course_access_required,
     course_teacher_or_admin_required
 )
-from ..utils.file_handler import save_file, delete_file, get_file_path, file_exists
-from ..utils.file_parser import parse_file_to_text, can_parse_file
+from ..utils.file_handler import (
+    save_blob,
+    place_blob_file,
+    discard_temp_file,
+    delete_file,
+    get_file_path,
+    file_exists
+)
+from ..utils.blob_store import (
+    acquire_blob,
+    release_blob,
+    release_parsed_text,
+    delete_orphan_blob_file
+)
+from ..utils.file_parser import can_parse_file
+from ..utils.parse_queue import enqueue_parse_job, submit_parse_job
+from ..utils.context_snapshot import bump_content_version
+from ..utils.course_stats import adjust_course_counts, refresh_course_parse_stats
+from ..utils.query_options import course_file_options
 
 # Blueprint
 files_bp = Blueprint('files', __name__, url_prefix='/api')
@@ -60,11 +80,12 @@ def list_course_files(course_id):
         403: No tiene acceso al curso
         404: Curso no encontrado
     """
-    course = Course.query.get(course_id)
+    # Solo se serializan el ID y el nombre del curso (sin el prompt)
+    course = Course.query.options(load_only(Course.id, Course.nombre)).filter(Course.id == course_id).first()
     if not course:
         raise ResourceNotFoundError("Curso no encontrado")
 
-    files = CourseFile.query.filter_by(course_id=course_id).order_by(
+    files = CourseFile.query.options(*course_file_options()).filter_by(course_id=course_id).order_by(
         CourseFile.uploaded_at.desc()
     ).all()
 
@@ -97,7 +118,8 @@ def upload_course_file(course_id):
         Authorization: Bearer <access_token>
 
     Returns:
-        201: Archivo subido exitosamente
+        201: Archivo subido exitosamente (el parseo queda encolado; ver
+             GET /files/:id/parse-status)
         400: No se proporcionó archivo o tipo no permitido
         403: No autorizado
         404: Curso no encontrado
@@ -117,12 +139,14 @@ def upload_course_file(course_id):
     if not file or not file.filename:
         raise ValidationError("Archivo inválido")
 
+    tmp_path = None
+
     try:
-        # Guardar archivo
-        filepath, original_filename, filesize, mimetype = save_file(
-            file,
-            f'courses/{course_id}'  # Carpeta específica del curso
-        )
+        # Guardar archivo (deduplicado por contenido). Si el contenido ya
+        # existía se reutiliza el path del blob aunque la extensión difiera.
+        tmp_path, filepath, digest, original_filename, filesize, mimetype = save_blob(file)
+        blob = acquire_blob(digest, filepath, filesize)
+        filepath = blob.filepath
 
         # Crear registro en BD
         course_file = CourseFile(
@@ -131,36 +155,25 @@ def upload_course_file(course_id):
             filepath=filepath,
             filesize=filesize,
             mimetype=mimetype,
-            uploaded_by=user.id
+            uploaded_by=user.id,
+            blob_id=blob.id
         )
 
         db.session.add(course_file)
+
+        # El parseo para el chatbot se hace en segundo plano
+        parse_job = enqueue_parse_job(course_file) if can_parse_file(original_filename) else None
+
+        adjust_course_counts(course_id, files=1)
+        bump_content_version(Course.id == course_id)
         db.session.commit()
 
-        # NUEVO: Parsear archivo automáticamente para chatbot
-        if can_parse_file(original_filename):
-            try:
-                full_path = get_file_path(filepath)
-                parsed_content = parse_file_to_text(full_path)
-
-                if parsed_content:
-                    course_file.parsed_content = parsed_content
-                    course_file.parsed_at = datetime.utcnow()
-                    db.session.commit()
-
-                    current_app.logger.info(
-                        f"Archivo parseado: {original_filename} ({len(parsed_content)} caracteres)"
-                    )
-                else:
-                    current_app.logger.warning(
-                        f"Archivo parseado pero contenido vacío: {original_filename}"
-                    )
-
-            except Exception as e:
-                # Si falla el parseo, solo registrar warning pero no fallar el upload
-                current_app.logger.warning(
-                    f"No se pudo parsear archivo {original_filename}: {str(e)}"
-                )
+        # El archivo se ubica después del commit para que un borrado
+        # concurrente del mismo contenido vea el blob (ver delete_orphan_blob_file)
+        place_blob_file(tmp_path, filepath)
+
+        if parse_job:
+            submit_parse_job(parse_job)
         else:
             current_app.logger.info(
                 f"Archivo {original_filename} no es parseable (tipo no soportado)"
@@ -172,7 +185,8 @@ def upload_course_file(course_id):
 
         return jsonify({
             "msg": "Archivo subido exitosamente",
-            "file": course_file.to_dict()
+            "file": course_file.to_dict(),
+            "parse_status": parse_job.status if parse_job else None
         }), 201
 
     except ValueError as e:
@@ -180,6 +194,7 @@ def upload_course_file(course_id):
         raise ValidationError(str(e))
     except Exception as e:
         db.session.rollback()
+        discard_temp_file(tmp_path)
         current_app.logger.error(f"Error al subir archivo: {str(e)}")
         raise DatabaseError("Error al subir el archivo")
 
@@ -203,7 +218,7 @@ def download_file(file_id):
         403: No tiene acceso al curso
         404: Archivo no encontrado
     """
-    user = get_current_user()
+    user = get_current_identity()
     course_file = CourseFile.query.get(file_id)
 
     if not course_file:
@@ -211,12 +226,7 @@ def download_file(file_id):
 
     # Verificar acceso al curso
     if not user.is_admin():
-        enrollment = UserCourse.query.filter_by(
-            user_id=user.id,
-            course_id=course_file.course_id
-        ).first()
-
-        if not enrollment:
+        if not get_course_roles(course_file.course_id):
             raise AuthorizationError("No tienes acceso a este archivo")
 
     # Verificar que el archivo físico existe
@@ -240,6 +250,51 @@ def download_file(file_id):
         raise DatabaseError("Error al descargar el archivo")
 
 
+@files_bp.route("/files/<int:file_id>/parse-status", methods=["GET"])
+@jwt_required()
+def get_file_parse_status(file_id):
+    """
+    Consultar el estado del parseo de un archivo.
+
+    El usuario debe tener acceso al curso del archivo.
+
+    Path params:
+        - file_id: ID del archivo
+
+    Headers:
+        Authorization: Bearer <access_token>
+
+    Returns:
+        200: Estado del parseo ('queued', 'parsing', 'done', 'failed'), o null
+             si el tipo de archivo no se parsea
+        403: No tiene acceso al curso
+        404: Archivo no encontrado
+    """
+    user = get_current_identity()
+    course_file = CourseFile.query.get(file_id)
+
+    if not course_file:
+        raise ResourceNotFoundError("Archivo no encontrado")
+
+    # Verificar acceso al curso
+    if not user.is_admin():
+        if not get_course_roles(course_file.course_id):
+            raise AuthorizationError("No tienes acceso a este archivo")
+
+    parse_job = course_file.parse_job
+
+    return jsonify({
+        "file_id": course_file.id,
+        "status": parse_job.status if parse_job else None,
+        "has_parsed_content": course_file.parsed_text_id is not None,
+        "parsed_at": course_file.parsed_at.isoformat() if course_file.parsed_at else None,
+        "parse_outcome": course_file.parse_outcome,
+        "parse_error": course_file.parse_error,
+        "parse_duration_ms": course_file.parse_duration_ms,
+        "job": parse_job.to_dict() if parse_job else None
+    }), 200
+
+
 @files_bp.route("/files/<int:file_id>", methods=["DELETE"])
 @jwt_required()
 def delete_course_file(file_id):
@@ -268,17 +323,11 @@ def delete_course_file(file_id):
     # Verificar permisos
     if not user.is_admin():
         # Verificar si es profesor del curso
-        enrollment = UserCourse.query.filter_by(
-            user_id=user.id,
-            course_id=course_file.course_id,
-            role_in_course='teacher'
-        ).first()
-
-        if not enrollment:
+        if 'teacher' not in get_course_roles(course_file.course_id):
             raise AuthorizationError("No tienes permisos para eliminar este archivo")
 
-    # Eliminar archivo físico
-    if course_file.filepath:
+    # Archivos sin blob (subidos antes de la deduplicación) tienen su propio archivo físico
+    if course_file.blob_id is None and course_file.filepath:
         delete_file(course_file.filepath)
 
     try:
@@ -286,9 +335,26 @@ def delete_course_file(file_id):
         filename = course_file.filename
         course_name = course_file.course.nombre if course_file.course else "Unknown"
 
+        course_id = course_file.course_id
+        blob_id = course_file.blob_id
+        parsed_text_id = course_file.parsed_text_id
+
+        # El archivo se borra antes que el blob y el texto parseado que referencia
         db.session.delete(course_file)
+        db.session.flush()
+
+        orphan_filepath = release_blob(blob_id) if blob_id else None
+        if parsed_text_id:
+            release_parsed_text(parsed_text_id)
+            refresh_course_parse_stats(course_id)
+        adjust_course_counts(course_id, files=-1)
+        bump_content_version(Course.id == course_id)
         db.session.commit()
 
+        # El archivo físico se elimina solo cuando ningún otro archivo lo usa
+        if orphan_filepath:
+            delete_orphan_blob_file(orphan_filepath)
+
         current_app.logger.info(
             f"Archivo eliminado: {filename} del curso {course_name} por {user.email}"
         )
@@ -7,7 +7,7 @@ from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError as MarshmallowValidationError
 
 from .. import db
-from ..models import Grade
+from ..models import Course, Grade
 from ..schemas import GradeSchema, GradeCreateSchema, GradeUpdateSchema
 from ..exceptions import (
     ValidationError,
@@ -16,6 +16,7 @@ from ..exceptions import (
     ResourceNotFoundError,
 )
 from ..decorators import admin_required
+from ..utils.context_snapshot import bump_content_version
 
 grades_bp = Blueprint('grades', __name__, url_prefix='/api/grades')
 
@@ -126,6 +127,8 @@ def update_grade(grade_id):
         if duplicate:
             raise ConflictError("Ya existe un grado con ese nombre")
         grade.name = data["name"]
+        # El nombre del grado aparece en el prompt del sistema de sus cursos
+        bump_content_version(Course.grade_id == grade.id)
 
     if "order" in data and data["order"] != grade.order:
         duplicate = Grade.query.filter(
@@ -7,13 +7,16 @@ from datetime import datetime
 from flask import Blueprint, current_app, jsonify, request
 from marshmallow import ValidationError as MarshmallowValidationError
 from flask_jwt_extended import jwt_required
+from sqlalchemy import func
 
 from .. import db
 from ..decorators import admin_required
 from ..exceptions import DatabaseError, ValidationError, ResourceNotFoundError
-from ..models import Institution
+from ..models import Course, Institution
 from ..schemas import InstitutionCreateSchema, InstitutionUpdateSchema
 from ..utils.file_handler import save_file
+from ..utils.context_snapshot import bump_content_version
+from ..utils.institution_cache import get_institutions_listing, invalidate_institutions_listing
 
 institutions_bp = Blueprint('institutions', __name__, url_prefix='/api/institutions')
 
@@ -26,6 +29,8 @@ def list_institutions():
     """
     Listar todas las instituciones.
 
+    La respuesta de cada página se cachea por proceso (ver utils/institution_cache.py).
+
     Query params:
         - page: número de página (default: 1)
         - per_page: resultados por página (default: 20, max: 100)
@@ -36,19 +41,35 @@ def list_institutions():
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
 
-    pagination = Institution.query.order_by(Institution.nombre).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-
-    return jsonify({
-        "institutions": [institution.to_dict() for institution in pagination.items],
-        "total": pagination.total,
-        "page": pagination.page,
-        "pages": pagination.pages,
-        "per_page": pagination.per_page
-    }), 200
+    def build_listing() -> dict:
+        # Cursos por institución en una subconsulta agrupada (sin cargar Institution.courses)
+        courses_count = db.session.query(
+            Course.institution_id,
+            func.count(Course.id).label('courses_count')
+        ).group_by(Course.institution_id).subquery()
+
+        pagination = db.session.query(
+            Institution,
+            func.coalesce(courses_count.c.courses_count, 0)
+        ).outerjoin(
+            courses_count, courses_count.c.institution_id == Institution.id
+        ).order_by(Institution.nombre).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+        return {
+            "institutions": [
+                institution.to_dict(courses_count=count) for institution, count in pagination.items
+            ],
+            "total": pagination.total,
+            "page": pagination.page,
+            "pages": pagination.pages,
+            "per_page": pagination.per_page
+        }
+
+    return jsonify(get_institutions_listing(page, per_page, build_listing)), 200
 
 
 @institutions_bp.route("", methods=["POST"])
@@ -97,6 +118,7 @@ def create_institution():
 
     try:
         db.session.add(institution)
+        invalidate_institutions_listing()
         db.session.commit()
         current_app.logger.info("Institución creada: %s", institution.nombre)
         return jsonify({
@@ -134,6 +156,10 @@ def update_institution(institution_id):
         current_app.logger.warning("Error de validación en actualización de institución: %s", exc.messages)
         raise ValidationError(str(exc.messages))
 
+    if "nombre" in validated_data and validated_data["nombre"] != institution.nombre:
+        # El nombre de la institución aparece en el prompt del sistema de sus cursos
+        bump_content_version(Course.institution_id == institution.id)
+
     for key, value in validated_data.items():
         setattr(institution, key, value)
 
@@ -152,6 +178,7 @@ def update_institution(institution_id):
                 raise ValidationError(str(exc))
 
     try:
+        invalidate_institutions_listing()
         db.session.commit()
         current_app.logger.info("Institución actualizada: %s", institution.nombre)
         return jsonify({
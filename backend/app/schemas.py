@@ -281,6 +281,13 @@ class CourseUpdateSchema(Schema):
     institution_id = fields.Int()
     grade_id = fields.Int()
     is_active = fields.Bool()
+    model_routing = fields.Str(
+        allow_none=True,
+        validate=validate.OneOf(['auto', 'fast', 'large'])
+    )
+    routing_max_context_tokens = fields.Int(allow_none=True, validate=validate.Range(min=0))
+    routing_max_history_messages = fields.Int(allow_none=True, validate=validate.Range(min=0))
+    routing_max_question_tokens = fields.Int(allow_none=True, validate=validate.Range(min=0))
 
 
 class CourseSchema(Schema):
@@ -297,6 +304,7 @@ class CourseSchema(Schema):
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
     is_active = fields.Bool(dump_only=True)
+    model_routing = fields.Dict(dump_only=True)
     files_count = fields.Int(dump_only=True)
     students_count = fields.Int(dump_only=True)
     teachers_count = fields.Int(dump_only=True)
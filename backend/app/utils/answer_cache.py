@@ -0,0 +1,167 @@
+"""
+MÓDULO: CACHÉ DE RESPUESTAS DEL CHATBOT
+========================================
+
+Muchos estudiantes de un mismo curso hacen la misma pregunta en pocos
+minutos ("¿cuándo es la prueba?"). Las preguntas sin historial se responden
+desde una caché LRU del proceso, con TTL, en vez de llamar otra vez al LLM.
+
+La clave incluye:
+- El curso y su content_version (cambiar archivos o el prompt invalida las
+  respuestas automáticamente).
+- El answers_version del curso, que se incrementa al vaciar la caché del
+  curso: cada worker tiene su propia caché, y así las respuestas guardadas
+  en los demás workers dejan de usarse sin tener que avisarles.
+- La pregunta normalizada (minúsculas, sin tildes, sin signos de pregunta
+  ni puntuación de oración y con los espacios colapsados). Los operadores y
+  símbolos se conservan: "2+2" y "2*2" son preguntas distintas.
+- El modelo, el enrutamiento del curso (modo y umbrales, ver
+  utils/model_router.py) y los parámetros de generación. Cada respuesta se
+  guarda junto al modelo que la generó.
+
+Los profesores del curso pueden vaciar la caché de su curso (por ejemplo,
+si cambió una fecha que no está en los archivos).
+"""
+
+import re
+import threading
+import unicodedata
+
+from flask import current_app
+
+from .. import db
+from ..models import Course
+from .cache import LRUCache
+
+_answer_cache = None
+_cache_lock = threading.Lock()
+
+# course_id -> {"hits": n, "misses": n}
+_course_stats = {}
+_stats_lock = threading.Lock()
+
+# Solo signos de interrogación/exclamación y puntuación de oración; los
+# operadores y símbolos (2+2, C++, x>0) cambian el sentido de la pregunta.
+# Punto, coma, punto y coma y dos puntos se conservan dentro de números (2.5)
+_PUNCTUATION_RE = re.compile(r"[¿?¡!]|[.,;:](?!\w)", re.UNICODE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _get_cache() -> LRUCache:
+    """Crea la caché de respuestas de forma perezosa con los límites configurados."""
+    global _answer_cache
+    with _cache_lock:
+        if _answer_cache is None:
+            _answer_cache = LRUCache(
+                max_entries=current_app.config.get('ANSWER_CACHE_MAX_ENTRIES', 2000),
+                ttl=current_app.config.get('ANSWER_CACHE_TTL_SECONDS', 600)
+            )
+        return _answer_cache
+
+
+def answer_cache_enabled() -> bool:
+    return current_app.config.get('ANSWER_CACHE_ENABLED', True)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normaliza una pregunta para compararla con otras equivalentes.
+
+    Ej: "¿Cuándo es la PRUEBA?" -> "cuando es la prueba"
+        "¿Cuánto es 2+2?" -> "cuanto es 2+2" (distinta de "2*2" o "2-2")
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    without_punctuation = _PUNCTUATION_RE.sub(" ", without_accents)
+    return _WHITESPACE_RE.sub(" ", without_punctuation).strip()
+
+
+def answer_cache_key(course, question: str, generation: dict, routing: tuple) -> tuple:
+    """
+    Clave de caché de una pregunta sin historial.
+
+    Args:
+        course: Curso (se usa su id, content_version y answers_version)
+        question: Pregunta del usuario
+        generation: Configuración de generación
+        routing: Modelos y enrutamiento del curso (ver model_router.routing_signature)
+
+    Returns:
+        tuple: Clave (course_id primero, para invalidar por curso)
+    """
+    generation = generation or {}
+    return (
+        course.id,
+        course.content_version or 1,
+        course.answers_version or 1,
+        normalize_question(question),
+        routing,
+        repr(generation.get('temperature')),
+        repr(generation.get('max_output_tokens'))
+    )
+
+
+def _count(course_id: int, field: str) -> None:
+    with _stats_lock:
+        stats = _course_stats.setdefault(course_id, {"hits": 0, "misses": 0})
+        stats[field] += 1
+
+
+def get_cached_answer(key: tuple):
+    """
+    Busca una respuesta en caché.
+
+    Returns:
+        tuple | None: (texto, modelo que la generó), o None si no está
+    """
+    answer = _get_cache().get(key)
+    _count(key[0], "hits" if answer is not None else "misses")
+    return answer
+
+
+def store_answer(key: tuple, text: str, model: str) -> None:
+    """Guarda una respuesta con su modelo (las respuestas vacías no se guardan)."""
+    if text:
+        _get_cache().set(key, (text, model))
+
+
+def invalidate_course_answers(course_id: int) -> int:
+    """
+    Invalida las respuestas en caché de un curso en todos los procesos.
+
+    Elimina las de este proceso e incrementa el answers_version del curso;
+    en los demás workers las entradas anteriores quedan inalcanzables y salen
+    por TTL o LRU. No hace commit: el incremento viaja en la transacción del
+    llamador.
+
+    Returns:
+        int: Cantidad de respuestas eliminadas de este proceso
+    """
+    db.session.query(Course).filter(Course.id == course_id).update(
+        {Course.answers_version: Course.answers_version + 1},
+        synchronize_session=False
+    )
+    return _get_cache().delete_where(lambda key: key[0] == course_id)
+
+
+def course_answer_cache_stats(course_id: int) -> dict:
+    """Métricas de la caché para un curso y del proceso completo."""
+    cache = _get_cache()
+    with _stats_lock:
+        stats = dict(_course_stats.get(course_id, {"hits": 0, "misses": 0}))
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["entries"] = cache.count_where(lambda key: key[0] == course_id)
+
+    return {
+        "course": stats,
+        "process": cache.stats(),
+        "ttl_seconds": cache.ttl,
+        "enabled": answer_cache_enabled()
+    }
+
+
+def answer_cache_stats() -> dict:
+    """Métricas de la caché de respuestas del proceso completo."""
+    return dict(_get_cache().stats(), enabled=answer_cache_enabled())
@@ -0,0 +1,178 @@
+"""
+MÓDULO: CACHÉ DE AUTORIZACIÓN
+==============================
+
+Evita consultar `users` y `user_courses` en cada request autenticado para
+verificar si el usuario está activo, su rol y sus inscripciones, datos que
+cambian muy poco. Guarda en cachés LRU del proceso, con TTL corto:
+
+- user_id -> AuthIdentity (rol, activo e institución)
+- (user_id, course_id) -> roles en el curso (también "no inscrito")
+
+Las rutas que cambian estos datos (usuarios, roles, inscripciones) llaman a
+invalidate_user / invalidate_memberships antes del commit: se eliminan las
+entradas del proceso y se incrementa el contador compartido `auth` de la
+tabla cache_versions en la misma transacción. Cada proceso revisa ese
+contador como máximo cada AUTH_CACHE_VERSION_CHECK_SECONDS y vacía sus
+cachés si cambió, de modo que los demás workers dejan de usar datos viejos
+en ese plazo. El TTL (AUTH_CACHE_TTL_SECONDS) acota cualquier cambio hecho
+fuera de esas rutas (ej: directamente en la base de datos).
+"""
+
+import threading
+from collections import namedtuple
+
+from flask import current_app
+
+from .. import db
+from ..models import User, UserCourse
+from .cache import LRUCache
+from .cache_versions import SharedCacheVersion
+
+AUTH_VERSION_NAME = 'auth'
+
+
+class AuthIdentity(namedtuple('AuthIdentity', ['id', 'role', 'is_active', 'institution_id'])):
+    """Estado de autorización de un usuario (subconjunto de User, sin consultas)."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_user(cls, user: User) -> 'AuthIdentity':
+        return cls(user.id, user.role, user.is_active, user.institution_id)
+
+    def is_admin(self) -> bool:
+        return self.role == 'admin'
+
+    def is_teacher(self) -> bool:
+        return self.role == 'teacher'
+
+    def is_student(self) -> bool:
+        return self.role == 'student'
+
+
+_caches = None
+_caches_lock = threading.Lock()
+_version = SharedCacheVersion(AUTH_VERSION_NAME, 'AUTH_CACHE_VERSION_CHECK_SECONDS')
+
+
+def _get_caches() -> tuple:
+    """Crea las cachés (usuarios, inscripciones) de forma perezosa con la configuración."""
+    global _caches
+    with _caches_lock:
+        if _caches is None:
+            max_entries = current_app.config.get('AUTH_CACHE_MAX_ENTRIES', 10000)
+            ttl = current_app.config.get('AUTH_CACHE_TTL_SECONDS', 30)
+            _caches = (
+                LRUCache(max_entries=max_entries, ttl=ttl),
+                LRUCache(max_entries=max_entries, ttl=ttl),
+            )
+        return _caches
+
+
+def _enabled() -> bool:
+    return current_app.config.get('AUTH_CACHE_ENABLED', True)
+
+
+def _sync_version() -> None:
+    """Vacía las cachés si otro proceso incrementó el contador (revisado cada pocos segundos)."""
+    if _version.changed():
+        for cache in _get_caches():
+            cache.clear()
+
+
+def get_auth_identity(user_id: int):
+    """
+    Estado de autorización del usuario, desde la caché o la base de datos.
+
+    Returns:
+        AuthIdentity | None: None si el usuario no existe
+    """
+    if not _enabled():
+        user = User.query.get(user_id)
+        return AuthIdentity.from_user(user) if user else None
+
+    _sync_version()
+    users, _memberships = _get_caches()
+
+    identity = users.get(user_id)
+    if identity is None:
+        row = db.session.query(
+            User.id, User.role, User.is_active, User.institution_id
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = AuthIdentity(*row)
+        users.set(user_id, identity)
+
+    return identity
+
+
+def remember_user(user: User) -> None:
+    """Actualiza la caché con un usuario ya cargado (sin consultas)."""
+    if _enabled() and user is not None:
+        _get_caches()[0].set(user.id, AuthIdentity.from_user(user))
+
+
+def get_membership_roles(user_id: int, course_id: int) -> frozenset:
+    """
+    Roles del usuario en el curso ('student', 'teacher'), desde la caché o la base de datos.
+
+    Returns:
+        frozenset: Roles (vacío si no está inscrito)
+    """
+    query = db.session.query(UserCourse.role_in_course).filter(
+        UserCourse.user_id == user_id,
+        UserCourse.course_id == course_id
+    )
+
+    if not _enabled():
+        return frozenset(role for (role,) in query.all())
+
+    _sync_version()
+    _users, memberships = _get_caches()
+
+    key = (user_id, course_id)
+    roles = memberships.get(key)
+    if roles is None:
+        roles = frozenset(role for (role,) in query.all())
+        memberships.set(key, roles)
+
+    return roles
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Invalida el estado y las inscripciones cacheadas de un usuario.
+
+    No hace commit: el incremento del contador viaja en la misma transacción
+    del cambio. Usar al cambiar rol, estado o institución, o al eliminarlo.
+    """
+    if _enabled():
+        users, memberships = _get_caches()
+        users.delete(user_id)
+        memberships.delete_where(lambda key: key[0] == user_id)
+    _version.bump()
+
+
+def invalidate_memberships(pairs) -> None:
+    """
+    Invalida las inscripciones cacheadas de pares (user_id, course_id).
+
+    No hace commit (igual que invalidate_user).
+    """
+    if _enabled():
+        _users, memberships = _get_caches()
+        for pair in pairs:
+            memberships.delete(pair)
+    _version.bump()
+
+
+def auth_cache_stats() -> dict:
+    """Métricas de las cachés de usuarios e inscripciones del proceso."""
+    users, memberships = _get_caches()
+    return {
+        "users": users.stats(),
+        "memberships": memberships.stats(),
+        "version": _version.version,
+    }
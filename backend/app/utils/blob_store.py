@@ -0,0 +1,144 @@
+"""
+MÓDULO: ALMACENAMIENTO DE ARCHIVOS POR CONTENIDO
+=================================================
+
+Los archivos de cursos se guardan una sola vez por contenido (SHA-256) en
+UPLOAD_FOLDER/blobs/ab/cd/<sha256>.<ext> (la extensión es la de la primera
+subida; las siguientes reutilizan ese path). Cada CourseFile apunta a un
+FileBlob con contador de referencias; el archivo físico se elimina cuando
+el último CourseFile que lo usa se borra.
+
+El texto parseado (ParsedText) también se comparte entre archivos idénticos
+y se elimina cuando ningún CourseFile lo referencia.
+"""
+
+import os
+import uuid
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models import CourseFile, FileBlob, ParsedText
+from .file_handler import get_file_path
+
+
+def acquire_blob(digest: str, filepath: str, filesize: int) -> FileBlob:
+    """
+    Obtiene el blob de un digest sumándole una referencia (o lo crea).
+
+    El incremento es un UPDATE atómico; si el blob no existe se inserta en un
+    savepoint para tolerar que otro request lo cree al mismo tiempo. No hace
+    commit.
+
+    Args:
+        digest: SHA-256 del contenido
+        filepath: Path relativo del blob en storage
+        filesize: Tamaño en bytes
+
+    Returns:
+        FileBlob: Blob con la nueva referencia contada
+    """
+    for _ in range(2):
+        updated = db.session.query(FileBlob).filter(FileBlob.sha256 == digest).update(
+            {FileBlob.ref_count: FileBlob.ref_count + 1},
+            synchronize_session=False
+        )
+        if updated:
+            return FileBlob.query.filter_by(sha256=digest).populate_existing().one()
+
+        try:
+            with db.session.begin_nested():
+                blob = FileBlob(sha256=digest, filepath=filepath, filesize=filesize, ref_count=1)
+                db.session.add(blob)
+            return blob
+        except IntegrityError:
+            # Otro request insertó el mismo digest: reintentar el incremento
+            continue
+
+    raise RuntimeError(f"No se pudo registrar el blob {digest}")
+
+
+def release_blob(blob_id: int):
+    """
+    Resta una referencia a un blob y lo elimina si quedó sin referencias.
+
+    Se llama después de borrar el archivo que lo referenciaba y hacer flush
+    (course_files.blob_id es una clave foránea a file_blobs).
+
+    No hace commit ni borra el archivo físico: si retorna un path, se debe
+    llamar a delete_orphan_blob_file después del commit.
+
+    Args:
+        blob_id: ID del blob
+
+    Returns:
+        str | None: Path del archivo físico a eliminar, o None si sigue en uso
+    """
+    db.session.query(FileBlob).filter(FileBlob.id == blob_id).update(
+        {FileBlob.ref_count: FileBlob.ref_count - 1},
+        synchronize_session=False
+    )
+
+    blob = db.session.query(FileBlob.filepath).filter(
+        FileBlob.id == blob_id,
+        FileBlob.ref_count <= 0
+    ).first()
+    if blob is None:
+        return None
+
+    db.session.query(FileBlob).filter(FileBlob.id == blob_id).delete(synchronize_session=False)
+    return blob.filepath
+
+
+def delete_orphan_blob_file(filepath: str) -> None:
+    """
+    Elimina el archivo físico de un blob ya borrado de la BD.
+
+    Si entretanto se volvió a subir el mismo contenido (existe otro blob con
+    el mismo path), el archivo se conserva. Para no perder esa subida, el
+    archivo se aparta con un rename antes de consultar la BD: si la subida ya
+    hizo commit se restaura, y si aún no lo hace encontrará el path vacío y
+    escribirá su propia copia (place_blob_file).
+    """
+    full_path = get_file_path(filepath)
+    trash_path = f"{full_path}.{uuid.uuid4().hex}.deleted"
+
+    try:
+        os.replace(full_path, trash_path)
+    except FileNotFoundError:
+        return
+
+    # Transacción nueva para ver los blobs que se hayan confirmado después del rename
+    db.session.commit()
+    if FileBlob.query.filter_by(filepath=filepath).first() is not None:
+        os.replace(trash_path, full_path)
+        return
+
+    os.remove(trash_path)
+    current_app.logger.info(f"Blob sin referencias eliminado: {filepath}")
+
+
+def release_parsed_text(parsed_text_id: int) -> bool:
+    """
+    Elimina un texto parseado si ya ningún archivo lo referencia.
+
+    Se llama después de borrar o reemplazar la referencia en la sesión. No
+    hace commit.
+
+    Args:
+        parsed_text_id: ID del texto parseado
+
+    Returns:
+        bool: True si se eliminó
+    """
+    db.session.flush()
+
+    in_use = db.session.query(CourseFile.id).filter(
+        CourseFile.parsed_text_id == parsed_text_id
+    ).first()
+    if in_use is not None:
+        return False
+
+    db.session.query(ParsedText).filter(ParsedText.id == parsed_text_id).delete(synchronize_session=False)
+    return True
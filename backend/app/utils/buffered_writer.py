@@ -0,0 +1,175 @@
+"""
+MÓDULO: ESCRITURA EN LOTE FUERA DEL REQUEST
+============================================
+
+Buffer del proceso para registros que no necesitan escribirse en el mismo
+request (uso de tokens, telemetría de llamadas al LLM). Un thread por
+proceso los escribe en lote cada cierto intervalo, y al terminar el proceso
+se escribe lo pendiente.
+
+Así el request no espera la escritura ni necesita una segunda conexión a la
+base de datos mientras mantiene la suya (ej: esperando al LLM).
+
+Si un lote falla por un registro que la base de datos nunca va a aceptar
+(IntegrityError, ej: su usuario se eliminó mientras esperaba), se escribe
+registro por registro y solo se descartan los rechazados. Los demás
+errores (base de datos caída) devuelven los registros al buffer.
+"""
+
+import atexit
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+# Resultados de una escritura
+_WRITTEN = 'written'
+_REJECTED = 'rejected'
+_FAILED = 'failed'
+
+
+class BufferedWriter:
+    """Buffer de registros escrito en lote por un thread del proceso."""
+
+    def __init__(self, name: str, write, flush_seconds_key: str, max_entries_key: str):
+        """
+        Args:
+            name: Nombre corto del buffer (para el thread y los logs, ej: token-usage)
+            write: Función write(registros) que los escribe en una transacción propia
+            flush_seconds_key: Clave de configuración con el intervalo (0 = escribir de inmediato)
+            max_entries_key: Clave de configuración con el máximo de registros pendientes
+        """
+        self.name = name
+        self._write = write
+        self._flush_seconds_key = flush_seconds_key
+        self._max_entries_key = max_entries_key
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self._stats = {"written": 0, "failed_flushes": 0, "dropped": 0, "rejected": 0}
+
+    def add(self, entry) -> None:
+        """Agrega un registro (o lo escribe de inmediato si el intervalo es 0)."""
+        app = current_app._get_current_object()
+
+        if not app.config.get(self._flush_seconds_key, 1):
+            self._write_now([entry])
+            return
+
+        max_entries = app.config.get(self._max_entries_key, 10000)
+        with self._lock:
+            if len(self._buffer) >= max_entries:
+                self._stats["dropped"] += 1
+                return
+            self._buffer.append(entry)
+
+        self._ensure_flusher(app)
+
+    def flush(self) -> int:
+        """
+        Escribe los registros pendientes.
+
+        Si el lote choca con una restricción de la base de datos se reintenta
+        registro por registro; si la escritura falla por otro motivo, los
+        registros vuelven al buffer para el siguiente intento.
+
+        Returns:
+            int: Cantidad de registros escritos
+        """
+        with self._lock:
+            entries = self._buffer[:]
+            del self._buffer[:]
+
+        if not entries:
+            return 0
+
+        try:
+            self._write(entries)
+        except IntegrityError:
+            return self._write_one_by_one(entries)
+        except Exception as e:
+            self._log_failure(entries, e)
+            self._requeue(entries)
+            return 0
+
+        with self._lock:
+            self._stats["written"] += len(entries)
+        return len(entries)
+
+    def _write_one_by_one(self, entries: list) -> int:
+        """Escribe un lote rechazado registro por registro, descartando los inválidos."""
+        written = 0
+        for position, entry in enumerate(entries):
+            result = self._write_now([entry])
+            if result == _FAILED:
+                self._requeue(entries[position:])
+                break
+            if result == _WRITTEN:
+                written += 1
+        return written
+
+    def _write_now(self, entries: list) -> str:
+        """
+        Escribe registros sin reintentos.
+
+        Returns:
+            str: _WRITTEN, _REJECTED (descartados por la base de datos) o _FAILED
+        """
+        try:
+            self._write(entries)
+        except IntegrityError as e:
+            # Reintentar no sirve: se descartan
+            current_app.logger.warning(f"Registros rechazados en el buffer {self.name}, se descartan: {str(e)}")
+            with self._lock:
+                self._stats["rejected"] += len(entries)
+            return _REJECTED
+        except Exception as e:
+            self._log_failure(entries, e)
+            return _FAILED
+
+        with self._lock:
+            self._stats["written"] += len(entries)
+        return _WRITTEN
+
+    def _log_failure(self, entries: list, error: Exception) -> None:
+        current_app.logger.error(f"Error al escribir el buffer {self.name} ({len(entries)} registros): {str(error)}")
+        with self._lock:
+            self._stats["failed_flushes"] += 1
+
+    def _requeue(self, entries: list) -> None:
+        """Devuelve registros al inicio del buffer, descartando los que no caben."""
+        with self._lock:
+            room = current_app.config.get(self._max_entries_key, 10000) - len(self._buffer)
+            if room > 0:
+                self._buffer[:0] = entries[-room:]
+            self._stats["dropped"] += max(len(entries) - max(room, 0), 0)
+
+    def _ensure_flusher(self, app) -> None:
+        """Inicia el thread de escritura (uno por proceso, también después de un fork)."""
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        interval = app.config.get(self._flush_seconds_key, 1)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                with app.app_context():
+                    self.flush()
+
+        threading.Thread(target=run, name=f'{self.name}-flusher', daemon=True).start()
+        atexit.register(self._flush_at_exit, app)
+
+    def _flush_at_exit(self, app) -> None:
+        with app.app_context():
+            self.flush()
+
+    def stats(self) -> dict:
+        """Registros pendientes, escritos, descartados (buffer lleno) y rechazados por la base de datos."""
+        with self._lock:
+            return dict(self._stats, pending=len(self._buffer))
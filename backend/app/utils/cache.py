@@ -0,0 +1,125 @@
+"""Caché LRU en memoria del proceso, thread-safe, con límite por entradas, bytes y TTL."""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Caché LRU thread-safe.
+
+    Soporta tres límites independientes (cualquiera puede ser None):
+    - max_entries: cantidad máxima de entradas
+    - max_bytes: tamaño total máximo, medido con la función sizeof
+    - ttl: segundos de vida de cada entrada
+
+    Uso:
+        cache = LRUCache(max_entries=100, ttl=60)
+        cache.set("clave", valor)
+        valor = cache.get("clave")
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 1)
+        self._data = OrderedDict()  # clave -> (valor, tamaño, expira_en)
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Obtiene un valor y lo marca como usado recientemente."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """Guarda un valor, desalojando las entradas menos usadas si se exceden los límites."""
+        size = self.sizeof(value)
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            # Un valor más grande que la caché completa no se guarda
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._data[key] = (value, size, expires_at)
+            self._total_bytes += size
+
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._data))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key) -> bool:
+        """Elimina una entrada. Retorna True si existía."""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def delete_where(self, predicate) -> int:
+        """Elimina todas las entradas cuya clave cumple el predicado. Retorna cuántas eliminó."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def count_where(self, predicate) -> int:
+        """Cuenta las entradas cuya clave cumple el predicado."""
+        with self._lock:
+            return sum(1 for key in self._data if predicate(key))
+
+    def clear(self) -> None:
+        """Vacía la caché (las métricas se conservan)."""
+        with self._lock:
+            self._data.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        """Métricas de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key) -> None:
+        """Elimina una entrada sin tomar el lock (el llamador ya lo tiene)."""
+        _value, size, _expires_at = self._data.pop(key)
+        self._total_bytes -= size
@@ -0,0 +1,76 @@
+"""
+MÓDULO: VERSIONES COMPARTIDAS DE CACHÉS DEL PROCESO
+====================================================
+
+Cada worker guarda sus propias cachés en memoria (autorización, listado
+público de instituciones). Para que un cambio hecho en un worker llegue a
+los demás, cada caché tiene un contador en la tabla `cache_versions`:
+
+- Quien modifica los datos incrementa el contador en la misma transacción
+  del cambio (`bump`, sin commit).
+- Cada proceso lee el contador como máximo cada N segundos (`changed`) y
+  vacía su caché si cambió.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from .. import db
+from ..models import CacheVersion
+
+
+class SharedCacheVersion:
+    """Contador de la tabla cache_versions revisado periódicamente por el proceso."""
+
+    def __init__(self, name: str, check_seconds_key: str):
+        """
+        Args:
+            name: Nombre del contador (fila de cache_versions, ej: auth)
+            check_seconds_key: Clave de configuración con el intervalo de revisión
+        """
+        self.name = name
+        self._check_seconds_key = check_seconds_key
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Último valor leído del contador (None si no se ha leído)."""
+        return self._version
+
+    def changed(self) -> bool:
+        """
+        Lee el contador si pasó el intervalo de revisión.
+
+        Returns:
+            bool: True si otro proceso (o este) lo incrementó desde la última lectura
+        """
+        interval = current_app.config.get(self._check_seconds_key, 1)
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._checked_at < interval:
+                return False
+            self._checked_at = now
+
+        version = db.session.query(CacheVersion.version).filter(
+            CacheVersion.name == self.name
+        ).scalar() or 0
+
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+        return changed
+
+    def bump(self) -> None:
+        """Incrementa el contador en la transacción actual (sin commit)."""
+        updated = db.session.query(CacheVersion).filter(CacheVersion.name == self.name).update(
+            {CacheVersion.version: CacheVersion.version + 1, CacheVersion.updated_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(CacheVersion(name=self.name, version=1))
@@ -0,0 +1,128 @@
+"""
+MÓDULO: SNAPSHOT DEL PROMPT DEL SISTEMA POR CURSO
+==================================================
+
+Materializa la plantilla del prompt del sistema de cada curso para no
+reconstruirla en cada mensaje del chat.
+
+Cada curso tiene un `content_version` que se incrementa cuando cambia algo
+que afecta el prompt (archivos, prompt del curso, profesores, nombre de la
+institución o del grado). La plantilla se guarda:
+
+1. En una caché LRU del proceso, limitada por tamaño total en bytes.
+2. En la tabla course_context_snapshots, para que los workers nuevos
+   arranquen con la plantilla ya construida.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+
+from .. import db
+from ..models import Course, CourseContextSnapshot, UserCourse
+from .cache import LRUCache
+
+# course_id -> (content_version, plantilla)
+_snapshot_cache = None
+
+
+def _get_cache() -> LRUCache:
+    """Crea la caché de snapshots de forma perezosa con el límite configurado."""
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        _snapshot_cache = LRUCache(
+            max_bytes=current_app.config.get('CONTEXT_SNAPSHOT_CACHE_BYTES', 64 * 1024 * 1024),
+            sizeof=lambda entry: len(entry[1])
+        )
+    return _snapshot_cache
+
+
+def bump_content_version(*criteria) -> None:
+    """
+    Incrementa el content_version de los cursos que cumplen los criterios.
+
+    No hace commit: el incremento viaja en la misma transacción del cambio.
+
+    Uso:
+        bump_content_version(Course.id == course_id)
+        bump_content_version(Course.institution_id == institution.id)
+    """
+    db.session.query(Course).filter(*criteria).update(
+        {Course.content_version: Course.content_version + 1},
+        synchronize_session=False
+    )
+
+
+def bump_taught_courses_version(user_id: int) -> None:
+    """Incrementa el content_version de los cursos donde el usuario es profesor."""
+    taught_course_ids = db.session.query(UserCourse.course_id).filter(
+        UserCourse.user_id == user_id,
+        UserCourse.role_in_course == 'teacher'
+    )
+    bump_content_version(Course.id.in_(taught_course_ids.scalar_subquery()))
+
+
+def _store_snapshot(course_id: int, version: int, template: str, exists: bool) -> None:
+    """
+    Persiste el snapshot en una transacción propia.
+
+    No usa la sesión del request: un commit ahí cerraría la transacción del
+    llamador y expiraría los objetos que ya cargó (curso, usuario, conversación).
+    """
+    table = CourseContextSnapshot.__table__
+    values = {
+        "content_version": version,
+        "prompt_template": template,
+        "built_at": datetime.utcnow(),
+    }
+
+    try:
+        with db.engine.begin() as connection:
+            if exists:
+                connection.execute(table.update().where(table.c.course_id == course_id), values)
+            else:
+                connection.execute(table.insert(), dict(values, course_id=course_id))
+    except Exception as e:
+        # Otro worker pudo persistir el mismo snapshot; la plantilla igual es válida
+        current_app.logger.warning(f"No se pudo persistir el snapshot del curso {course_id}: {str(e)}")
+
+
+def get_prompt_template(course: Course, builder) -> str:
+    """
+    Obtiene la plantilla del prompt del sistema para la versión actual del curso.
+
+    Busca primero en la caché del proceso, luego en la tabla de snapshots y
+    solo si ambas están desactualizadas construye la plantilla con builder.
+
+    Args:
+        course: Curso (su content_version identifica la plantilla)
+        builder: Función builder(course) -> str que construye la plantilla
+
+    Returns:
+        str: Plantilla del prompt del sistema
+    """
+    cache = _get_cache()
+    version = course.content_version or 1
+
+    cached = cache.get(course.id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    snapshot = db.session.get(CourseContextSnapshot, course.id)
+    if snapshot and snapshot.content_version == version:
+        cache.set(course.id, (version, snapshot.prompt_template))
+        return snapshot.prompt_template
+
+    template = builder(course)
+    _store_snapshot(course.id, version, template, exists=snapshot is not None)
+
+    cache.set(course.id, (version, template))
+    current_app.logger.info(
+        f"Snapshot de prompt reconstruido para curso {course.id} (v{version}, {len(template)} caracteres)"
+    )
+    return template
+
+
+def snapshot_cache_stats() -> dict:
+    """Métricas de la caché de snapshots del proceso."""
+    return _get_cache().stats()
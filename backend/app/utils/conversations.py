@@ -0,0 +1,237 @@
+"""
+MÓDULO: CONVERSACIONES DEL CHATBOT
+===================================
+
+Conversaciones guardadas en el servidor: el cliente envía solo el mensaje
+nuevo y el historial se arma desde la BD.
+
+Para que los tokens de entrada por mensaje no crezcan con el largo de la
+conversación, el historial (resumen + turnos sin resumir) tiene un
+presupuesto (CONVERSATION_HISTORY_MAX_TOKENS). Al superarlo, los turnos más
+antiguos se compactan en un resumen acumulado y solo los más recientes se
+envían textualmente.
+"""
+
+from flask import current_app
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .. import db
+from ..exceptions import QuotaExceededError, ServiceUnavailableError
+from ..models import Conversation, ConversationTurn
+from .file_parser import estimate_token_count, truncate_text
+
+SUMMARY_INSTRUCTION = (
+    "Eres un asistente que resume conversaciones entre un estudiante y el chatbot de su curso. "
+    "Escribe un resumen breve en español, en viñetas, que conserve las preguntas del estudiante, "
+    "las respuestas y datos clave entregados, y cualquier acuerdo o tarea pendiente. "
+    "No inventes información."
+)
+
+# Mensajes con los que el resumen se antepone al historial enviado al modelo
+SUMMARY_USER_PREFIX = "[Resumen de la conversación anterior]"
+SUMMARY_MODEL_ACK = "Entendido, tendré en cuenta ese resumen de nuestra conversación."
+
+
+def start_conversation(user, course, title: str = None) -> Conversation:
+    """
+    Crea una conversación vacía. No hace commit.
+
+    Args:
+        user: Usuario dueño de la conversación
+        course: Curso del chatbot
+        title: Título opcional (por defecto, la primera pregunta)
+
+    Returns:
+        Conversation: Conversación nueva
+    """
+    conversation = Conversation(
+        user_id=user.id,
+        course_id=course.id,
+        title=title[:200] if title else None,
+        summarized_turns=0,
+        turn_count=0
+    )
+    db.session.add(conversation)
+    return conversation
+
+
+def append_exchange(conversation: Conversation, question: str, answer: str) -> tuple:
+    """
+    Agrega la pregunta y la respuesta al final de la conversación. No hace commit.
+
+    Las posiciones se reservan con un UPDATE atómico de turn_count (que además
+    bloquea la fila hasta el commit) y no con el valor leído al inicio del
+    request: dos mensajes simultáneos en la misma conversación (doble envío,
+    dos pestañas) reciben posiciones distintas.
+
+    Args:
+        conversation: Conversación
+        question: Mensaje del usuario
+        answer: Respuesta del modelo
+
+    Returns:
+        tuple: (turno del usuario, turno del modelo)
+    """
+    db.session.query(Conversation).filter(Conversation.id == conversation.id).update(
+        {Conversation.turn_count: Conversation.turn_count + 2},
+        synchronize_session=False
+    )
+    turn_count = db.session.query(Conversation.turn_count).filter(
+        Conversation.id == conversation.id
+    ).scalar()
+    set_committed_value(conversation, 'turn_count', turn_count)
+
+    turns = tuple(
+        ConversationTurn(
+            conversation=conversation,
+            position=turn_count - 2 + offset,
+            role=role,
+            content=content,
+            token_count=estimate_token_count(content)
+        )
+        for offset, (role, content) in enumerate((('user', question), ('model', answer)))
+    )
+    db.session.add_all(turns)
+
+    if not conversation.title:
+        conversation.title = question[:200]
+
+    return turns
+
+
+def get_active_turns(conversation: Conversation) -> list:
+    """Turnos que aún no fueron compactados en el resumen, en orden."""
+    return conversation.turns.filter(
+        ConversationTurn.position >= conversation.summarized_turns
+    ).all()
+
+
+def build_history(conversation: Conversation) -> list:
+    """
+    Arma el historial a enviar al modelo: resumen (si existe) + turnos recientes.
+
+    Args:
+        conversation: Conversación
+
+    Returns:
+        list: Mensajes en formato de Gemini [{'role': ..., 'parts': [...]}]
+    """
+    history = []
+
+    if conversation.summary:
+        history.append({'role': 'user', 'parts': [f"{SUMMARY_USER_PREFIX}\n{conversation.summary}"]})
+        history.append({'role': 'model', 'parts': [SUMMARY_MODEL_ACK]})
+
+    for turn in get_active_turns(conversation):
+        history.append({'role': turn.role, 'parts': [turn.content]})
+
+    return history
+
+
+def build_summary_prompt(previous_summary: str, turns: list) -> str:
+    """
+    Prompt para resumir turnos junto con el resumen anterior.
+
+    Args:
+        previous_summary: Resumen acumulado hasta ahora (o None)
+        turns: Turnos a incorporar al resumen
+
+    Returns:
+        str: Prompt para el modelo
+    """
+    lines = []
+
+    if previous_summary:
+        lines.append("Resumen previo de la conversación:")
+        lines.append(previous_summary)
+        lines.append("")
+
+    lines.append("Nuevos mensajes a incorporar al resumen:")
+    for turn in turns:
+        speaker = "Estudiante" if turn.role == 'user' else "Chatbot"
+        lines.append(f"{speaker}: {turn.content}")
+
+    lines.append("")
+    lines.append("Escribe el resumen actualizado de toda la conversación.")
+    return "\n".join(lines)
+
+
+def _fallback_summary(previous_summary: str, turns: list, max_tokens: int) -> str:
+    """Resumen extractivo (sin modelo) usado si la llamada al modelo falla."""
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        speaker = "Estudiante" if turn.role == 'user' else "Chatbot"
+        lines.append(f"- {speaker}: {truncate_text(turn.content, 50)}")
+
+    summary = "\n".join(lines)
+    max_chars = max_tokens * 4
+    # Conservar lo más reciente si se excede el presupuesto
+    return summary[-max_chars:] if len(summary) > max_chars else summary
+
+
+def compact_conversation(conversation: Conversation, summarize) -> bool:
+    """
+    Compacta los turnos más antiguos en el resumen si el historial excede el presupuesto.
+
+    Se compacta hasta dejar el historial en la mitad del presupuesto, para no
+    resumir en cada mensaje. Los últimos CONVERSATION_KEEP_RECENT_TURNS turnos
+    se conservan textualmente salvo que por sí solos excedan el presupuesto;
+    el último intercambio nunca se compacta. No hace commit.
+
+    Args:
+        conversation: Conversación
+        summarize: Función summarize(previous_summary, turns) -> str que llama al modelo
+
+    Returns:
+        bool: True si se compactaron turnos
+
+    Raises:
+        ServiceUnavailableError: Si summarize no obtuvo cupo para el LLM
+        QuotaExceededError: Si el dueño de la conversación agotó su cuota de tokens
+    """
+    budget = current_app.config.get('CONVERSATION_HISTORY_MAX_TOKENS', 4000)
+    keep_recent = current_app.config.get('CONVERSATION_KEEP_RECENT_TURNS', 4)
+    summary_max_tokens = current_app.config.get('CONVERSATION_SUMMARY_MAX_TOKENS', 600)
+
+    turns = get_active_turns(conversation)
+    remaining = estimate_token_count(conversation.summary) + sum(turn.token_count for turn in turns)
+
+    if remaining <= budget:
+        return False
+
+    target = budget // 2
+    to_compact = []
+
+    for index, turn in enumerate(turns[:-2]):
+        in_recent = index >= len(turns) - keep_recent
+        if remaining <= (budget if in_recent else target):
+            break
+        to_compact.append(turn)
+        remaining -= turn.token_count
+
+    # El historial conservado debe empezar con un mensaje del usuario
+    while to_compact and len(to_compact) < len(turns) - 1 and turns[len(to_compact)].role != 'user':
+        to_compact.append(turns[len(to_compact)])
+
+    if not to_compact:
+        return False
+
+    try:
+        summary = summarize(conversation.summary, to_compact)
+    except (ServiceUnavailableError, QuotaExceededError):
+        # Sin cupo o sin cuota para el LLM: no se compacta ahora (tampoco con el resumen extractivo)
+        raise
+    except Exception as e:
+        current_app.logger.warning(
+            f"No se pudo resumir la conversación {conversation.id} con el modelo: {str(e)}"
+        )
+        summary = _fallback_summary(conversation.summary, to_compact, summary_max_tokens)
+
+    conversation.summary = truncate_text(summary.strip(), summary_max_tokens)
+    conversation.summarized_turns = to_compact[-1].position + 1
+
+    current_app.logger.info(
+        f"Conversación {conversation.id}: {len(to_compact)} turnos compactados "
+        f"(historial ~{remaining} tokens + resumen)"
+    )
+    return True
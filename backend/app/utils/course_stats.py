@@ -0,0 +1,137 @@
+"""
+MÓDULO: ESTADÍSTICAS AGREGADAS POR CURSO
+=========================================
+
+Mantiene en la fila del curso totales que de otro modo requerirían recorrer
+todos sus archivos o inscripciones:
+
+- Contenido parseado (archivos parseados, caracteres y tokens estimados): se
+  recalcula con una consulta agregada en la misma transacción que modifica
+  los archivos.
+- Cantidad de archivos, estudiantes y profesores: se ajusta con un UPDATE
+  atómico (`files_count = files_count + n`) en la misma transacción que sube
+  o elimina archivos y crea o elimina inscripciones, sin depender de lo que
+  vean otras transacciones concurrentes.
+
+`flask repair-course-counts` recalcula los contadores de todos los cursos
+(ej: después de cargar datos fuera de las rutas).
+"""
+
+from sqlalchemy import case, func
+
+from .. import db
+from ..models import Course, CourseFile, UserCourse
+
+
+def refresh_course_parse_stats(course_id: int) -> None:
+    """
+    Recalcula los totales de contenido parseado de un curso.
+
+    No hace commit: los totales viajan en la misma transacción del cambio.
+
+    Args:
+        course_id: ID del curso
+    """
+    files_count, char_count, token_estimate = db.session.query(
+        func.count(CourseFile.id),
+        func.coalesce(func.sum(CourseFile.char_count), 0),
+        func.coalesce(func.sum(CourseFile.token_estimate), 0)
+    ).filter(
+        CourseFile.course_id == course_id,
+        CourseFile.parsed_text_id.isnot(None)
+    ).one()
+
+    db.session.query(Course).filter(Course.id == course_id).update({
+        Course.parsed_files_count: files_count,
+        Course.parsed_char_count: char_count,
+        Course.parsed_token_estimate: token_estimate
+    }, synchronize_session=False)
+
+
+def adjust_course_counts(course_id: int, files: int = 0, students: int = 0, teachers: int = 0) -> None:
+    """
+    Suma (o resta) a los contadores de archivos e inscripciones de un curso.
+
+    No hace commit: el ajuste viaja en la misma transacción del cambio.
+
+    Args:
+        course_id: ID del curso
+        files: Archivos agregados (negativo si se eliminaron)
+        students: Inscripciones de estudiante agregadas o eliminadas
+        teachers: Asignaciones de profesor agregadas o eliminadas
+    """
+    values = {}
+    if files:
+        values[Course.files_count] = Course.files_count + files
+    if students:
+        values[Course.students_count] = Course.students_count + students
+    if teachers:
+        values[Course.teachers_count] = Course.teachers_count + teachers
+    if not values:
+        return
+
+    db.session.query(Course).filter(Course.id == course_id).update(values, synchronize_session=False)
+
+
+def adjust_enrollment_counts(enrollments) -> None:
+    """
+    Resta a cada curso las inscripciones que se van a eliminar (ej: al borrar un usuario).
+
+    No hace commit.
+
+    Args:
+        enrollments: Inscripciones (UserCourse) a eliminar
+    """
+    deltas = {}
+    for enrollment in enrollments:
+        students, teachers = deltas.get(enrollment.course_id, (0, 0))
+        if enrollment.role_in_course == 'student':
+            students -= 1
+        elif enrollment.role_in_course == 'teacher':
+            teachers -= 1
+        deltas[enrollment.course_id] = (students, teachers)
+
+    for course_id, (students, teachers) in deltas.items():
+        adjust_course_counts(course_id, students=students, teachers=teachers)
+
+
+def recompute_course_counts() -> int:
+    """
+    Recalcula los contadores de archivos e inscripciones de todos los cursos.
+
+    Una consulta agrupada por tabla (inscripciones por curso y rol, archivos
+    por curso) y un UPDATE por curso cuyo contador no coincide. No hace commit.
+
+    Returns:
+        int: Cantidad de cursos corregidos
+    """
+    enrollment_counts = {
+        course_id: (students, teachers)
+        for course_id, students, teachers in db.session.query(
+            UserCourse.course_id,
+            func.coalesce(func.sum(case((UserCourse.role_in_course == 'student', 1), else_=0)), 0),
+            func.coalesce(func.sum(case((UserCourse.role_in_course == 'teacher', 1), else_=0)), 0)
+        ).group_by(UserCourse.course_id)
+    }
+    file_counts = dict(
+        db.session.query(CourseFile.course_id, func.count(CourseFile.id)).group_by(CourseFile.course_id)
+    )
+
+    repaired = 0
+    courses = db.session.query(
+        Course.id, Course.files_count, Course.students_count, Course.teachers_count
+    ).all()
+    for course_id, files_count, students_count, teachers_count in courses:
+        students, teachers = enrollment_counts.get(course_id, (0, 0))
+        files = file_counts.get(course_id, 0)
+        if (files_count, students_count, teachers_count) == (files, students, teachers):
+            continue
+
+        db.session.query(Course).filter(Course.id == course_id).update({
+            Course.files_count: files,
+            Course.students_count: students,
+            Course.teachers_count: teachers
+        }, synchronize_session=False)
+        repaired += 1
+
+    return repaired
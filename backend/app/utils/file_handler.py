@@ -1,4 +1,5 @@
 """Utilidades para manejo de archivos."""
+import hashlib
 import os
 import uuid
 from werkzeug.utils import secure_filename
@@ -91,6 +92,108 @@ def save_file(file, folder: str, file_type: str = 'documents') -> tuple:
     return (relative_path, file.filename, filesize, file.content_type or 'application/octet-stream')
 
 
+BLOB_FOLDER = 'blobs'
+_HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+def blob_relative_path(digest: str, ext: str) -> str:
+    """
+    Path relativo de un blob dentro de UPLOAD_FOLDER.
+
+    Se reparte en subcarpetas por los primeros caracteres del digest
+    (blobs/ab/cd/abcd....pdf) para no acumular miles de archivos en un
+    solo directorio.
+    """
+    return os.path.join(BLOB_FOLDER, digest[:2], digest[2:4], f"{digest}.{ext}")
+
+
+def save_blob(file) -> tuple:
+    """
+    Escribe un archivo subido a un temporal calculando su SHA-256.
+
+    El archivo todavía no queda en su path definitivo: primero se registra el
+    blob (acquire_blob) y, después del commit, se llama a place_blob_file con
+    el path que quedó en la BD, que para contenido repetido es el de la
+    primera subida.
+
+    Args:
+        file: FileStorage object de Flask
+
+    Returns:
+        tuple: (tmp_path, filepath, digest, original_filename, filesize, mimetype),
+        donde filepath es el path que tendría el blob si es nuevo
+
+    Raises:
+        ValueError: Si el tipo de archivo no está permitido
+    """
+    if not file or not file.filename:
+        raise ValueError("No se proporcionó un archivo válido")
+
+    if not is_allowed_extension(file.filename):
+        raise ValueError(f"Tipo de archivo no permitido: {file.filename}")
+
+    ext = file.filename.rsplit('.', 1)[1].lower()
+
+    tmp_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER, 'tmp')
+    os.makedirs(tmp_folder, exist_ok=True)
+    tmp_path = os.path.join(tmp_folder, uuid.uuid4().hex)
+
+    sha256 = hashlib.sha256()
+    filesize = 0
+
+    try:
+        with open(tmp_path, 'wb') as tmp_file:
+            while True:
+                chunk = file.stream.read(_HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                tmp_file.write(chunk)
+                filesize += len(chunk)
+    except Exception:
+        discard_temp_file(tmp_path)
+        raise
+
+    digest = sha256.hexdigest()
+    return (
+        tmp_path,
+        blob_relative_path(digest, ext),
+        digest,
+        file.filename,
+        filesize,
+        file.content_type or 'application/octet-stream'
+    )
+
+
+def place_blob_file(tmp_path: str, filepath: str) -> None:
+    """
+    Mueve el temporal de save_blob al path del blob registrado en la BD.
+
+    Si el archivo ya existe (contenido repetido) el temporal se descarta. Se
+    llama después del commit del blob: así, si un borrado concurrente de la
+    última referencia eliminó el archivo, o lo hace a continuación, este se
+    vuelve a escribir con el temporal o delete_orphan_blob_file lo restaura.
+
+    Args:
+        tmp_path: Path absoluto del temporal
+        filepath: Path relativo del blob (FileBlob.filepath)
+    """
+    full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filepath)
+
+    if os.path.exists(full_path):
+        discard_temp_file(tmp_path)
+        return
+
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    os.replace(tmp_path, full_path)
+
+
+def discard_temp_file(tmp_path: str) -> None:
+    """Elimina un temporal de save_blob si todavía existe."""
+    if tmp_path and os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
 def delete_file(filepath: str) -> bool:
     """
     Elimina un archivo del storage.
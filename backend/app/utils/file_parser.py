@@ -16,78 +16,146 @@ Soporta:
 """
 
 import os
+from collections import namedtuple
 from flask import current_app
 from PyPDF2 import PdfReader
 from docx import Document
 from openpyxl import load_workbook
 
 
-def parse_pdf(filepath: str) -> str:
-    """Parsea un archivo PDF a texto."""
+# Versión de los parsers: incrementarla cuando cambie el texto que producen,
+# para que no se reutilice texto parseado con una versión anterior
+PARSER_VERSION = 2
+
+# Resultado del parseo: texto y si se cortó por los límites de páginas/filas
+ParseResult = namedtuple('ParseResult', ['text', 'truncated'])
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.markdown', '.csv', '.py', '.js', '.java',
+                   '.cpp', '.c', '.html', '.css', '.json', '.xml', '.rst'}
+
+
+def parse_pdf(filepath: str, max_pages: int = None) -> ParseResult:
+    """Parsea un archivo PDF a texto (como máximo max_pages páginas)."""
     try:
         reader = PdfReader(filepath)
         text_parts = []
+        truncated = False
         for page_num, page in enumerate(reader.pages, 1):
-            text = page.extract_text()
+            if max_pages and page_num > max_pages:
+                truncated = True
+                break
+            text = page.extract_text() or ""
             if text.strip():
                 text_parts.append(f"--- Página {page_num} ---\n{text}")
-        return "\n\n".join(text_parts) if text_parts else ""
+        return ParseResult("\n\n".join(text_parts) if text_parts else "", truncated)
     except Exception as e:
         raise Exception(f"Error al parsear PDF: {str(e)}")
 
 
-def parse_docx(filepath: str) -> str:
+def parse_docx(filepath: str) -> ParseResult:
     """Parsea un archivo Word (.docx) a texto."""
     try:
         doc = Document(filepath)
         paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-        return "\n\n".join(paragraphs)
+        return ParseResult("\n\n".join(paragraphs), False)
     except Exception as e:
         raise Exception(f"Error al parsear DOCX: {str(e)}")
 
 
-def parse_xlsx(filepath: str) -> str:
-    """Parsea un archivo Excel (.xlsx) a texto."""
+def parse_xlsx(filepath: str, max_rows: int = None) -> ParseResult:
+    """Parsea un archivo Excel (.xlsx) a texto (como máximo max_rows filas en total)."""
     try:
-        workbook = load_workbook(filepath, data_only=True)
+        # read_only lee las filas en streaming en vez de cargar todo el libro
+        workbook = load_workbook(filepath, data_only=True, read_only=True)
         text_parts = []
+        rows_read = 0
+        truncated = False
 
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text_parts.append(f"## Hoja: {sheet_name}\n")
-
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " | ".join(str(cell) if cell is not None else "" for cell in row)
-                if row_text.strip():
-                    text_parts.append(row_text)
-
-            text_parts.append("")  # Línea en blanco entre hojas
-
-        return "\n".join(text_parts)
+        try:
+            for sheet_name in workbook.sheetnames:
+                sheet = workbook[sheet_name]
+                text_parts.append(f"## Hoja: {sheet_name}\n")
+
+                for row in sheet.iter_rows(values_only=True):
+                    if max_rows and rows_read >= max_rows:
+                        truncated = True
+                        break
+                    rows_read += 1
+                    row_text = " | ".join(str(cell) if cell is not None else "" for cell in row)
+                    if row_text.strip():
+                        text_parts.append(row_text)
+
+                text_parts.append("")  # Línea en blanco entre hojas
+
+                if truncated:
+                    break
+        finally:
+            workbook.close()
+
+        return ParseResult("\n".join(text_parts), truncated)
     except Exception as e:
         raise Exception(f"Error al parsear XLSX: {str(e)}")
 
 
-def parse_text_file(filepath: str) -> str:
+def parse_text_file(filepath: str) -> ParseResult:
     """Parsea archivos de texto plano."""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
+            return ParseResult(f.read(), False)
     except UnicodeDecodeError:
         # Intentar con latin-1 si UTF-8 falla
         try:
             with open(filepath, 'r', encoding='latin-1') as f:
-                return f.read()
+                return ParseResult(f.read(), False)
         except Exception as e:
             raise Exception(f"Error al leer archivo de texto: {str(e)}")
     except Exception as e:
         raise Exception(f"Error al parsear archivo de texto: {str(e)}")
 
 
+def parse_file(filepath: str, max_pages: int = None, max_rows: int = None) -> ParseResult:
+    """
+    Parsea un archivo según su extensión, respetando los límites de páginas/filas.
+
+    No depende del contexto de Flask, por lo que puede ejecutarse en los
+    procesos del pool de parseo (ver parser_pool.py).
+
+    Args:
+        filepath: Ruta absoluta al archivo a parsear
+        max_pages: Máximo de páginas a leer de un PDF (None = sin límite)
+        max_rows: Máximo de filas a leer de un Excel (None = sin límite)
+
+    Returns:
+        ParseResult: Texto extraído y si se truncó por los límites
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        Exception: Si falla el parseo o el tipo no está soportado
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Archivo no encontrado: {filepath}")
+
+    ext = os.path.splitext(filepath)[1].lower()
+
+    if ext == '.pdf':
+        return parse_pdf(filepath, max_pages)
+    elif ext == '.docx':
+        return parse_docx(filepath)
+    elif ext == '.xlsx':
+        return parse_xlsx(filepath, max_rows)
+    elif ext in TEXT_EXTENSIONS:
+        return parse_text_file(filepath)
+    else:
+        raise Exception(f"Tipo de archivo no soportado: {ext}")
+
+
 def parse_file_to_text(filepath: str) -> str:
     """
     Parsea un archivo a texto plano según su extensión.
 
+    Parsea en el proceso actual y sin límites; para archivos subidos por
+    usuarios se usa parser_pool.parse_file_isolated.
+
     Args:
         filepath: Ruta absoluta al archivo a parsear
 
@@ -101,21 +169,8 @@ def parse_file_to_text(filepath: str) -> str:
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"Archivo no encontrado: {filepath}")
 
-    ext = os.path.splitext(filepath)[1].lower()
-
     try:
-        if ext == '.pdf':
-            return parse_pdf(filepath)
-        elif ext == '.docx':
-            return parse_docx(filepath)
-        elif ext == '.xlsx':
-            return parse_xlsx(filepath)
-        elif ext in ['.txt', '.md', '.markdown', '.csv', '.py', '.js', '.java',
-                     '.cpp', '.c', '.html', '.css', '.json', '.xml', '.rst']:
-            return parse_text_file(filepath)
-        else:
-            raise Exception(f"Tipo de archivo no soportado: {ext}")
-
+        return parse_file(filepath).text
     except Exception as e:
         current_app.logger.error(f"Error al parsear archivo {filepath}: {str(e)}")
         raise Exception(f"No se pudo parsear el archivo: {str(e)}")
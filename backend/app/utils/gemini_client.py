@@ -0,0 +1,149 @@
+"""
+MÓDULO: CLIENTE DE GEMINI COMPARTIDO
+=====================================
+
+Configura el SDK de Gemini una sola vez por proceso y reutiliza las
+instancias de GenerativeModel entre requests.
+
+- `genai.configure` reinicia los clientes del SDK (y su canal gRPC), por lo
+  que llamarlo en cada request rompía la reutilización de conexiones. Ahora
+  se llama al crear la app y otra vez solo si el proceso se bifurcó (los
+  workers de gunicorn no deben compartir el canal del proceso padre).
+- Los modelos se guardan en un registro LRU del proceso, con clave
+  (modelo, digest del prompt del sistema, configuración de generación), de
+  modo que los mensajes de un mismo curso reutilizan el mismo objeto. Por
+  eso el prompt del sistema no lleva los fragmentos recuperados en cada
+  pregunta: van en el mensaje del usuario (ver build_chat_prompt en
+  routes/chat.py).
+"""
+
+import hashlib
+import os
+import threading
+
+import google.generativeai as genai
+from flask import current_app
+
+from .cache import LRUCache
+
+_configured_pid = None
+_configured_key = None
+_configure_lock = threading.Lock()
+
+# (modelo, sha256 del prompt, configuración) -> GenerativeModel
+_model_registry = None
+_registry_lock = threading.Lock()
+
+
+def _api_key_from_config(config) -> str:
+    """Obtiene la API key válida desde la configuración (o None)."""
+    api_key = config.get('GEMINI_API_KEY')
+    if not api_key or api_key == "YOUR_GEMINI_API_KEY_HERE":
+        return None
+    return api_key
+
+
+def configure_gemini(config) -> bool:
+    """
+    Configura el SDK de Gemini si aún no se hizo en este proceso.
+
+    Args:
+        config: Configuración de Flask (app.config)
+
+    Returns:
+        bool: True si el SDK quedó configurado
+    """
+    global _configured_pid, _configured_key
+
+    api_key = _api_key_from_config(config)
+    if api_key is None:
+        return False
+
+    with _configure_lock:
+        if _configured_pid == os.getpid() and _configured_key == api_key:
+            return True
+
+        genai.configure(api_key=api_key)
+        _configured_pid = os.getpid()
+        _configured_key = api_key
+
+        # Los modelos creados con la configuración anterior se descartan
+        if _model_registry is not None:
+            _model_registry.clear()
+
+    return True
+
+
+def ensure_gemini_configured() -> None:
+    """
+    Verifica que Gemini esté configurado en el proceso actual.
+
+    Raises:
+        ValueError: Si la API key no está configurada
+    """
+    if not configure_gemini(current_app.config):
+        raise ValueError("GEMINI_API_KEY no está configurada correctamente en .env")
+
+
+def _get_registry() -> LRUCache:
+    """Crea el registro de modelos de forma perezosa con el límite configurado."""
+    global _model_registry
+    with _registry_lock:
+        if _model_registry is None:
+            _model_registry = LRUCache(max_entries=current_app.config.get('GEMINI_MODEL_CACHE_SIZE', 128))
+        return _model_registry
+
+
+def _generation_config_key(generation_config) -> tuple:
+    """Convierte la configuración de generación en una clave hashable."""
+    if generation_config is None:
+        return ()
+
+    if isinstance(generation_config, dict):
+        items = generation_config.items()
+    else:
+        items = vars(generation_config).items()
+
+    return tuple(sorted((name, repr(value)) for name, value in items if value is not None))
+
+
+def get_generative_model(model_name: str, system_instruction: str, generation_config=None):
+    """
+    Obtiene un GenerativeModel reutilizable para el modelo, prompt y configuración.
+
+    Args:
+        model_name: Nombre del modelo (ej: 'gemini-1.5-flash')
+        system_instruction: Prompt del sistema (o None)
+        generation_config: genai.GenerationConfig opcional
+
+    Returns:
+        genai.GenerativeModel: Modelo (compartido entre requests)
+
+    Raises:
+        ValueError: Si la API key no está configurada
+    """
+    ensure_gemini_configured()
+
+    key = (
+        model_name,
+        hashlib.sha256((system_instruction or '').encode('utf-8')).hexdigest(),
+        _generation_config_key(generation_config)
+    )
+
+    registry = _get_registry()
+    model = registry.get(key)
+    if model is None:
+        # Si dos threads lo crean a la vez, ambos objetos son equivalentes
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction,
+            generation_config=generation_config
+        )
+        registry.set(key, model)
+
+    return model
+
+
+def model_registry_stats() -> dict:
+    """Métricas del registro de modelos del proceso (incluye hit_rate)."""
+    return _get_registry().stats()
@@ -0,0 +1,84 @@
+"""
+MÓDULO: CACHÉ DEL LISTADO PÚBLICO DE INSTITUCIONES
+===================================================
+
+GET /api/institutions es público y lo consulta la pantalla de registro de
+cada usuario nuevo, pero las instituciones y sus cursos cambian muy poco.
+Cada proceso guarda la respuesta serializada de cada página (page, per_page)
+en una caché LRU con TTL (INSTITUTIONS_CACHE_TTL_SECONDS).
+
+Las rutas que crean o modifican instituciones o cursos llaman a
+invalidate_institutions_listing antes del commit: se vacía la caché del
+proceso y se incrementa el contador compartido `institutions` de la tabla
+cache_versions (ver utils/cache_versions.py), que los demás workers revisan
+cada INSTITUTIONS_CACHE_VERSION_CHECK_SECONDS.
+"""
+
+import threading
+
+from flask import current_app
+
+from .cache import LRUCache
+from .cache_versions import SharedCacheVersion
+
+INSTITUTIONS_VERSION_NAME = 'institutions'
+
+_cache = None
+_cache_lock = threading.Lock()
+_version = SharedCacheVersion(INSTITUTIONS_VERSION_NAME, 'INSTITUTIONS_CACHE_VERSION_CHECK_SECONDS')
+
+
+def _get_cache() -> LRUCache:
+    """Crea la caché de forma perezosa con la configuración."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LRUCache(
+                max_entries=current_app.config.get('INSTITUTIONS_CACHE_MAX_ENTRIES', 256),
+                ttl=current_app.config.get('INSTITUTIONS_CACHE_TTL_SECONDS', 300)
+            )
+        return _cache
+
+
+def get_institutions_listing(page: int, per_page: int, build) -> dict:
+    """
+    Página del listado de instituciones, desde la caché o recién armada.
+
+    Args:
+        page: Número de página
+        per_page: Resultados por página
+        build: Función sin argumentos que arma la respuesta desde la base de datos
+
+    Returns:
+        dict: Respuesta serializada (no modificar: se comparte entre requests)
+    """
+    if not current_app.config.get('INSTITUTIONS_CACHE_ENABLED', True):
+        return build()
+
+    cache = _get_cache()
+    if _version.changed():
+        cache.clear()
+
+    key = (page, per_page)
+    listing = cache.get(key)
+    if listing is None:
+        listing = build()
+        cache.set(key, listing)
+    return listing
+
+
+def invalidate_institutions_listing() -> None:
+    """
+    Invalida el listado cacheado en todos los procesos.
+
+    No hace commit: el incremento del contador viaja en la misma transacción
+    del cambio.
+    """
+    if current_app.config.get('INSTITUTIONS_CACHE_ENABLED', True):
+        _get_cache().clear()
+    _version.bump()
+
+
+def institutions_cache_stats() -> dict:
+    """Métricas de la caché del listado de este proceso."""
+    return dict(_get_cache().stats(), version=_version.version)
@@ -0,0 +1,219 @@
+"""
+MÓDULO: CONTROL DE ADMISIÓN DE LLAMADAS AL LLM
+===============================================
+
+Limita las llamadas simultáneas al proveedor de LLM por proceso para no
+agotar los workers ni provocar 429 del proveedor en ráfagas:
+
+- Como máximo LLM_MAX_IN_FLIGHT llamadas en curso.
+- Las que exceden el límite esperan en una cola de como máximo
+  LLM_QUEUE_MAX_DEPTH peticiones y LLM_QUEUE_MAX_WAIT_SECONDS segundos.
+- Si la cola está llena o se cumple el plazo, se rechaza de inmediato con
+  503 y Retry-After: es preferible fallar rápido a dejar crecer la latencia.
+- Al liberarse un cupo, la cola se atiende por turnos entre instituciones y,
+  dentro de cada institución, entre cursos, para que un curso con muchas
+  peticiones no acapare el servicio.
+
+En streaming el cupo se mantiene hasta que termina el stream.
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+from ..exceptions import ServiceUnavailableError
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+class _Waiter:
+    """Petición esperando un cupo."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+
+
+class LLMGateway:
+    """Semáforo de llamadas al LLM con cola acotada y reparto justo por institución/curso."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait_seconds: float, retry_after_seconds: int = 5):
+        """
+        Args:
+            max_in_flight: Llamadas simultáneas permitidas
+            max_queue: Peticiones máximas esperando
+            max_wait_seconds: Espera máxima en la cola
+            retry_after_seconds: Valor de Retry-After al rechazar
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.retry_after_seconds = retry_after_seconds
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # institution_id -> OrderedDict(course_id -> deque[_Waiter])
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._waits_ms = deque(maxlen=1000)
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "max_queue_depth": 0,
+        }
+
+    def _reject(self, reason: str, message: str):
+        self._stats[reason] += 1
+        return ServiceUnavailableError(message, retry_after=self.retry_after_seconds)
+
+    def acquire(self, institution_id: int, course_id: int) -> None:
+        """
+        Obtiene un cupo, esperando en la cola si es necesario.
+
+        Raises:
+            ServiceUnavailableError: Si la cola está llena o se cumplió el plazo de espera
+        """
+        started = time.monotonic()
+
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queued:
+                self._in_flight += 1
+                self._stats["admitted"] += 1
+                self._waits_ms.append(0.0)
+                return
+
+            if self._queued >= self.max_queue:
+                raise self._reject("rejected_queue_full", "El chatbot está saturado, intenta nuevamente en unos segundos")
+
+            waiter = _Waiter()
+            courses = self._queues.setdefault(institution_id, OrderedDict())
+            courses.setdefault(course_id, deque()).append(waiter)
+            self._queued += 1
+            self._stats["queued"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+
+        waiter.event.wait(self.max_wait_seconds)
+
+        with self._lock:
+            if not waiter.admitted:
+                # Plazo cumplido: salir de la cola (el cupo no se llegó a asignar)
+                self._remove_waiter(institution_id, course_id, waiter)
+                raise self._reject("rejected_timeout", "El chatbot está saturado, intenta nuevamente en unos segundos")
+
+            self._waits_ms.append((time.monotonic() - started) * 1000)
+
+    def release(self) -> None:
+        """Libera un cupo y lo asigna a la siguiente petición en espera (por turnos)."""
+        with self._lock:
+            waiter = self._next_waiter()
+            if waiter is None:
+                self._in_flight -= 1
+                return
+
+            # El cupo pasa directamente a la petición en espera
+            waiter.admitted = True
+            self._stats["admitted"] += 1
+            waiter.event.set()
+
+    def _next_waiter(self):
+        """Saca la siguiente petición: primera institución, primer curso, y los rota al final."""
+        while self._queues:
+            institution_id, courses = next(iter(self._queues.items()))
+            course_id, waiters = next(iter(courses.items()))
+            waiter = waiters.popleft()
+            self._queued -= 1
+
+            if waiters:
+                courses.move_to_end(course_id)
+            else:
+                del courses[course_id]
+
+            if courses:
+                self._queues.move_to_end(institution_id)
+            else:
+                del self._queues[institution_id]
+
+            return waiter
+
+        return None
+
+    def _remove_waiter(self, institution_id: int, course_id: int, waiter: _Waiter) -> None:
+        courses = self._queues.get(institution_id)
+        waiters = courses.get(course_id) if courses else None
+        if not waiters or waiter not in waiters:
+            return
+
+        waiters.remove(waiter)
+        self._queued -= 1
+        if not waiters:
+            del courses[course_id]
+        if not courses:
+            del self._queues[institution_id]
+
+    def stats(self) -> dict:
+        """Métricas: cupos en uso, profundidad de la cola y tiempos de espera recientes."""
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            stats = dict(
+                self._stats,
+                in_flight=self._in_flight,
+                max_in_flight=self.max_in_flight,
+                queue_depth=self._queued,
+                max_queue=self.max_queue,
+            )
+
+        if waits:
+            stats["wait_ms"] = {
+                "p50": round(waits[int(len(waits) * 0.50)], 2),
+                "p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 2),
+                "max": round(waits[-1], 2),
+            }
+        return stats
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Obtiene el gateway del proceso (se crea de forma perezosa con la configuración)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(
+                max_in_flight=current_app.config.get('LLM_MAX_IN_FLIGHT', 16),
+                max_queue=current_app.config.get('LLM_QUEUE_MAX_DEPTH', 64),
+                max_wait_seconds=current_app.config.get('LLM_QUEUE_MAX_WAIT_SECONDS', 10),
+                retry_after_seconds=current_app.config.get('LLM_RETRY_AFTER_SECONDS', 5)
+            )
+        return _gateway
+
+
+def admitted_stream(gateway: LLMGateway, stream):
+    """
+    Generador que entrega los fragmentos de un stream y libera el cupo al terminar.
+
+    Si el generador se descarta sin iterarlo (ej: el cliente se desconectó
+    antes del primer fragmento), el cupo se libera igual al recolectarlo.
+    """
+    lock = threading.Lock()
+    released = []
+
+    def release_once():
+        with lock:
+            if released:
+                return
+            released.append(True)
+        gateway.release()
+
+    def chunks():
+        try:
+            yield from stream
+        finally:
+            release_once()
+
+    generator = chunks()
+    weakref.finalize(generator, release_once)
+    return generator
@@ -0,0 +1,402 @@
+"""
+MÓDULO: PROVEEDORES DE MODELOS DE LENGUAJE
+===========================================
+
+Interfaz común para el acceso al LLM del chatbot (chat, streaming, generación
+simple y conteo de tokens), de modo que las rutas no dependan del SDK de
+Gemini.
+
+Proveedores (LLM_PROVIDER):
+- 'gemini': Google Gemini (google.generativeai).
+- 'fake': proveedor local determinista, sin red. Simula latencia hasta el
+  primer token, velocidad de generación (tokens/s) y tasa de fallos según la
+  configuración LLM_FAKE_*. Sirve para pruebas de carga y para medir el
+  costo propio del backend (armado del prompt, recuperación, colas) aislado
+  del proveedor.
+
+Los mensajes del historial usan el formato [{'role': 'user'|'model',
+'parts': ['texto']}] y la configuración de generación es un dict con
+'temperature' y 'max_output_tokens'.
+
+Cada proveedor tiene un modelo por defecto (grande) y opcionalmente un modelo
+rápido para preguntas simples (ver utils/model_router.py).
+
+El proveedor de la app se envuelve con plazos, reintentos y circuit breaker
+(ver utils/llm_resilience.py).
+"""
+
+import hashlib
+import random
+import threading
+import time
+from collections import namedtuple
+
+import google.generativeai as genai
+from flask import current_app
+
+from .file_parser import estimate_token_count
+from .gemini_client import configure_gemini, get_generative_model
+
+# Respuesta completa de un proveedor (cached=True si vino de la caché de respuestas)
+LLMResponse = namedtuple('LLMResponse', ['text', 'model', 'usage', 'cached'], defaults=[False])
+
+
+class LLMError(Exception):
+    """Error al generar una respuesta con el proveedor."""
+
+    retryable = True
+
+
+class LLMTimeoutError(LLMError, TimeoutError):
+    """El proveedor no respondió dentro del plazo."""
+
+
+class LLMStream:
+    """
+    Respuesta en streaming.
+
+    Al iterarla entrega los fragmentos de texto; `usage` queda disponible
+    cuando termina la iteración.
+    """
+
+    def __init__(self, chunks, model: str, usage_getter, cached: bool = False):
+        """
+        Args:
+            chunks: Iterable de fragmentos de texto
+            model: Modelo que genera la respuesta
+            usage_getter: Función sin argumentos que retorna el uso de tokens
+            cached: True si la respuesta viene de la caché de respuestas
+        """
+        self._chunks = chunks
+        self.model = model
+        self._usage_getter = usage_getter
+        self.cached = cached
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+    @property
+    def usage(self) -> dict:
+        return self._usage_getter()
+
+
+def empty_usage() -> dict:
+    """Uso de tokens vacío (mismo formato que retornan los proveedores)."""
+    return {"prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "total_tokens": 0}
+
+
+class LLMProvider:
+    """Interfaz de un proveedor de LLM."""
+
+    name = None
+
+    def __init__(self, config):
+        """
+        Args:
+            config: Configuración de Flask (app.config)
+        """
+        self.default_model = config.get('GEMINI_MODEL', 'gemini-1.5-flash')
+        self.fast_model = config.get('GEMINI_FAST_MODEL') or None  # None = sin enrutamiento
+
+    def chat(self, system_instruction: str, history: list, message: str,
+             generation: dict = None, model: str = None, timeout: float = None) -> LLMResponse:
+        """
+        Envía un mensaje con historial y retorna la respuesta completa.
+
+        Args:
+            system_instruction: Prompt del sistema
+            history: Mensajes anteriores
+            message: Mensaje nuevo del usuario
+            generation: Configuración de generación
+            model: Modelo a usar (por defecto, default_model)
+            timeout: Segundos máximos de espera de la respuesta (opcional)
+
+        Returns:
+            LLMResponse: Texto, modelo y uso de tokens
+
+        Raises:
+            ValueError: Si el proveedor no está configurado
+            LLMTimeoutError: (o DeadlineExceeded del SDK) si se cumplió el plazo
+            LLMError: (u otra excepción del SDK) si la generación falla
+        """
+        raise NotImplementedError
+
+    def stream_chat(self, system_instruction: str, history: list, message: str,
+                    generation: dict = None, model: str = None, timeout: float = None) -> LLMStream:
+        """Igual que chat(), pero retorna la respuesta en streaming."""
+        raise NotImplementedError
+
+    def generate(self, system_instruction: str, prompt: str,
+                 generation: dict = None, model: str = None, timeout: float = None) -> LLMResponse:
+        """Genera una respuesta a un prompt suelto (sin historial)."""
+        raise NotImplementedError
+
+    def count_tokens(self, text: str, model: str = None) -> int:
+        """Cuenta los tokens de un texto según el tokenizador del proveedor."""
+        raise NotImplementedError
+
+
+# ==========================================
+# GEMINI
+# ==========================================
+
+def usage_to_dict(usage_metadata) -> dict:
+    """Convierte el usage_metadata de Gemini a un diccionario serializable."""
+    if usage_metadata is None:
+        return empty_usage()
+
+    return {
+        "prompt_tokens": getattr(usage_metadata, 'prompt_token_count', 0) or 0,
+        "output_tokens": getattr(usage_metadata, 'candidates_token_count', 0) or 0,
+        "cached_tokens": getattr(usage_metadata, 'cached_content_token_count', 0) or 0,
+        "total_tokens": getattr(usage_metadata, 'total_token_count', 0) or 0,
+    }
+
+
+def _chunk_text(chunk) -> str:
+    """Extrae el texto de un fragmento de streaming (algunos fragmentos no traen partes)."""
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def _request_options(timeout: float):
+    """Opciones de la llamada al SDK: plazo de la llamada, sin los reintentos propios del SDK."""
+    if timeout is None:
+        return None
+    return {"timeout": timeout, "retry": None}
+
+
+class GeminiProvider(LLMProvider):
+    """Proveedor Google Gemini."""
+
+    name = 'gemini'
+
+    def _model(self, system_instruction: str, generation: dict, model: str):
+        generation_config = genai.GenerationConfig(**generation) if generation else None
+        return get_generative_model(model or self.default_model, system_instruction, generation_config)
+
+    def chat(self, system_instruction, history, message, generation=None, model=None, timeout=None):
+        model_name = model or self.default_model
+        chat = self._model(system_instruction, generation, model_name).start_chat(history=history)
+        response = chat.send_message(message, request_options=_request_options(timeout))
+        return LLMResponse(response.text, model_name, usage_to_dict(response.usage_metadata))
+
+    def stream_chat(self, system_instruction, history, message, generation=None, model=None, timeout=None):
+        model_name = model or self.default_model
+        chat = self._model(system_instruction, generation, model_name).start_chat(history=history)
+
+        # Con stream=True el SDK retorna al recibir el primer fragmento
+        response = chat.send_message(message, stream=True, request_options=_request_options(timeout))
+        chunks = (text for text in map(_chunk_text, response) if text)
+        return LLMStream(chunks, model_name, lambda: usage_to_dict(response.usage_metadata))
+
+    def generate(self, system_instruction, prompt, generation=None, model=None, timeout=None):
+        model_name = model or self.default_model
+        response = self._model(system_instruction, generation, model_name).generate_content(
+            prompt,
+            request_options=_request_options(timeout)
+        )
+        return LLMResponse(response.text, model_name, usage_to_dict(response.usage_metadata))
+
+    def count_tokens(self, text, model=None):
+        return self._model(None, None, model).count_tokens(text).total_tokens
+
+
+# ==========================================
+# PROVEEDOR FALSO (PRUEBAS DE CARGA)
+# ==========================================
+
+FAKE_LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'exponential')
+
+# Palabras con las que se arma la respuesta determinista
+_FAKE_WORDS = (
+    "según", "los", "materiales", "del", "curso", "la", "respuesta", "es", "que",
+    "el", "contenido", "revisado", "indica", "una", "idea", "principal", "y",
+    "algunos", "ejemplos", "para", "practicar", "en", "clase"
+)
+
+
+class FakeProvider(LLMProvider):
+    """
+    Proveedor local determinista para pruebas de carga.
+
+    El texto de la respuesta depende solo del prompt y el mensaje; los
+    tiempos y fallos se sortean con un generador aleatorio con semilla
+    (LLM_FAKE_SEED), por lo que una corrida de un solo thread es reproducible.
+    """
+
+    name = 'fake'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.default_model = config.get('LLM_FAKE_MODEL', 'fake-llm')
+        self.fast_model = config.get('LLM_FAKE_FAST_MODEL', 'fake-llm-fast') or None
+        self.fast_speedup = max(config.get('LLM_FAKE_FAST_SPEEDUP', 3), 1)  # El modelo rápido responde N veces antes
+        self.latency_ms = config.get('LLM_FAKE_LATENCY_MS', 300)
+        self.latency_jitter_ms = config.get('LLM_FAKE_LATENCY_JITTER_MS', 100)
+        self.latency_distribution = config.get('LLM_FAKE_LATENCY_DISTRIBUTION', 'normal')
+        self.tokens_per_second = config.get('LLM_FAKE_TOKENS_PER_SECOND', 80)
+        self.throughput_jitter = config.get('LLM_FAKE_THROUGHPUT_JITTER', 0.2)
+        self.output_tokens = config.get('LLM_FAKE_OUTPUT_TOKENS', 200)
+        self.failure_rate = config.get('LLM_FAKE_FAILURE_RATE', 0.0)
+        self.chunk_tokens = config.get('LLM_FAKE_CHUNK_TOKENS', 8)
+
+        if self.latency_distribution not in FAKE_LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"LLM_FAKE_LATENCY_DISTRIBUTION debe ser uno de: {', '.join(FAKE_LATENCY_DISTRIBUTIONS)}"
+            )
+
+        self._random = random.Random(config.get('LLM_FAKE_SEED', 0))
+        self._lock = threading.Lock()
+
+    def _sample_latency(self) -> float:
+        """Segundos hasta el primer token según la distribución configurada."""
+        mean = self.latency_ms
+        jitter = self.latency_jitter_ms
+
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                value = self._random.uniform(mean - jitter, mean + jitter)
+            elif self.latency_distribution == 'normal':
+                value = self._random.gauss(mean, jitter)
+            elif self.latency_distribution == 'exponential':
+                value = self._random.expovariate(1 / mean) if mean > 0 else 0
+            else:
+                value = mean
+
+        return max(value, 0) / 1000
+
+    def _speedup(self, model: str) -> float:
+        return self.fast_speedup if model is not None and model == self.fast_model else 1
+
+    def _sample_tokens_per_second(self) -> float:
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.throughput_jitter, self.throughput_jitter)
+        return max(self.tokens_per_second * factor, 1)
+
+    def _sleep(self, seconds: float, timeout: float = None) -> None:
+        """Espera `seconds`, o solo `timeout` y lanza LLMTimeoutError si el plazo es menor."""
+        if timeout is not None and seconds > timeout:
+            time.sleep(max(timeout, 0))
+            raise LLMTimeoutError("El proveedor falso no respondió dentro del plazo")
+        time.sleep(seconds)
+
+    def _maybe_fail(self) -> None:
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+        if failed:
+            raise LLMError("Fallo simulado del proveedor falso")
+
+    def _response_text(self, seed_text: str, max_output_tokens: int = None) -> str:
+        """Respuesta determinista de ~output_tokens tokens derivada del texto de entrada."""
+        tokens = self.output_tokens
+        if max_output_tokens:
+            tokens = min(tokens, max_output_tokens)
+
+        digest = hashlib.sha256(seed_text.encode('utf-8')).digest()
+        words = []
+        length = 0
+        position = 0
+        while length < tokens * 4:
+            word = _FAKE_WORDS[digest[position % len(digest)] % len(_FAKE_WORDS)]
+            words.append(word)
+            length += len(word) + 1
+            position += 1
+
+        return " ".join(words).capitalize() + "."
+
+    def _usage(self, prompt_text: str, output_text: str) -> dict:
+        prompt_tokens = self.count_tokens(prompt_text)
+        output_tokens = self.count_tokens(output_text)
+        return dict(
+            empty_usage(),
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            total_tokens=prompt_tokens + output_tokens
+        )
+
+    def _prepare(self, system_instruction: str, history: list, message: str, generation: dict) -> tuple:
+        """Retorna (texto del prompt completo, texto de la respuesta)."""
+        prompt_text = "\n".join(
+            [system_instruction or ""]
+            + [part for entry in history for part in entry.get('parts', [])]
+            + [message]
+        )
+        max_output_tokens = (generation or {}).get('max_output_tokens')
+        return prompt_text, self._response_text(prompt_text, max_output_tokens)
+
+    def chat(self, system_instruction, history, message, generation=None, model=None, timeout=None):
+        prompt_text, text = self._prepare(system_instruction, history, message, generation)
+
+        speedup = self._speedup(model)
+        latency = self._sample_latency() / speedup
+        self._sleep(latency, timeout)
+        self._maybe_fail()
+        self._sleep(
+            self.count_tokens(text) / (self._sample_tokens_per_second() * speedup),
+            timeout - latency if timeout is not None else None
+        )
+
+        return LLMResponse(text, model or self.default_model, self._usage(prompt_text, text))
+
+    def stream_chat(self, system_instruction, history, message, generation=None, model=None, timeout=None):
+        prompt_text, text = self._prepare(system_instruction, history, message, generation)
+
+        # Como el SDK real, la llamada retorna al tener el primer fragmento
+        speedup = self._speedup(model)
+        self._sleep(self._sample_latency() / speedup, timeout)
+        self._maybe_fail()
+
+        chunk_chars = self.chunk_tokens * 4
+        seconds_per_chunk = self.chunk_tokens / (self._sample_tokens_per_second() * speedup)
+
+        def chunks():
+            for start in range(0, len(text), chunk_chars):
+                if start:
+                    time.sleep(seconds_per_chunk)
+                yield text[start:start + chunk_chars]
+
+        return LLMStream(chunks(), model or self.default_model, lambda: self._usage(prompt_text, text))
+
+    def generate(self, system_instruction, prompt, generation=None, model=None, timeout=None):
+        return self.chat(system_instruction, [], prompt, generation=generation, model=model, timeout=timeout)
+
+    def count_tokens(self, text, model=None):
+        return estimate_token_count(text)
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+
+def init_llm_provider(app) -> None:
+    """
+    Crea el proveedor de LLM configurado (LLM_PROVIDER) al iniciar la app.
+
+    Args:
+        app: Instancia de Flask
+
+    Raises:
+        ValueError: Si LLM_PROVIDER no es un proveedor conocido
+    """
+    name = app.config.get('LLM_PROVIDER', 'gemini')
+    provider_class = PROVIDERS.get(name)
+    if provider_class is None:
+        raise ValueError(f"LLM_PROVIDER desconocido: {name} (opciones: {', '.join(PROVIDERS)})")
+
+    if name == GeminiProvider.name and not configure_gemini(app.config):
+        app.logger.warning("GEMINI_API_KEY no está configurada; el chatbot no estará disponible")
+
+    # Plazos, reintentos, hedging y circuit breaker alrededor del proveedor
+    from .llm_resilience import ResilientProvider
+
+    app.extensions['llm_provider'] = ResilientProvider(provider_class(app.config), app.config)
+
+
+def get_llm_provider() -> LLMProvider:
+    """Proveedor de LLM de la app actual."""
+    return current_app.extensions['llm_provider']
@@ -0,0 +1,361 @@
+"""
+MÓDULO: RESILIENCIA DE LAS LLAMADAS AL LLM
+===========================================
+
+Envuelve al proveedor de LLM (ver utils/llm_provider.py) para que un
+problema transitorio del proveedor no se convierta en un 500 tras una espera
+indefinida:
+
+- Plazos: cada intento tiene como máximo LLM_CALL_TIMEOUT_SECONDS y la
+  llamada completa, con reintentos, LLM_CALL_DEADLINE_SECONDS.
+- Reintentos con backoff exponencial (con jitter) para errores transitorios:
+  códigos HTTP de LLM_RETRY_STATUS_CODES, timeouts y LLMError reintentables.
+  Los errores definitivos (ej: 400 por un prompt inválido) no se reintentan.
+- Peticiones de respaldo (hedging, opcional con LLM_HEDGE_ENABLED): si un
+  intento tarda más que el percentil LLM_HEDGE_PERCENTILE de las latencias
+  recientes, se lanza un segundo intento en paralelo y se usa el primero que
+  responda. La petición de respaldo no ocupa un cupo del control de admisión.
+- Circuit breaker: tras LLM_BREAKER_FAILURE_THRESHOLD fallos transitorios
+  seguidos, las llamadas fallan de inmediato con 503 durante
+  LLM_BREAKER_RESET_SECONDS; después se deja pasar una llamada de prueba y,
+  si responde, el circuito se cierra.
+
+En streaming todo esto aplica hasta obtener el stream (primer fragmento): un
+error a mitad de la respuesta no se reintenta porque el cliente ya recibió
+texto.
+"""
+
+import math
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+from ..exceptions import ServiceUnavailableError
+from .llm_provider import LLMProvider, LLMTimeoutError
+
+DEFAULT_RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+# Latencias recientes guardadas por operación (para el percentil del hedging)
+LATENCY_WINDOW = 500
+
+
+def is_retryable_error(error: Exception, retry_status_codes) -> bool:
+    """
+    Indica si un error del proveedor es transitorio.
+
+    Las excepciones de google.api_core traen el código HTTP en `code`; las
+    del proveedor propio indican `retryable`.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code in retry_status_codes
+
+    return getattr(error, 'retryable', False)
+
+
+def _percentile(sorted_values: list, percentile: float) -> float:
+    index = min(int(len(sorted_values) * percentile / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class CircuitBreaker:
+    """Circuit breaker por fallos consecutivos (cerrado -> abierto -> semiabierto)."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        """
+        Args:
+            failure_threshold: Fallos transitorios seguidos que abren el circuito (0 = desactivado)
+            reset_seconds: Segundos que el circuito permanece abierto antes de probar otra vez
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> None:
+        """
+        Verifica si se puede llamar al proveedor.
+
+        Raises:
+            ServiceUnavailableError: Si el circuito está abierto
+        """
+        if self.failure_threshold <= 0:
+            return
+
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_seconds - time.monotonic()
+                if remaining > 0:
+                    self._stats["rejected"] += 1
+                    raise self._unavailable(remaining)
+                self._state = self.HALF_OPEN
+
+            # Semiabierto: solo pasa una llamada de prueba a la vez
+            if self._trial_in_flight:
+                self._stats["rejected"] += 1
+                raise self._unavailable(self.reset_seconds)
+            self._trial_in_flight = True
+
+    def _unavailable(self, retry_after: float) -> ServiceUnavailableError:
+        return ServiceUnavailableError(
+            "El chatbot no está disponible en este momento, intenta nuevamente en unos segundos",
+            retry_after=max(math.ceil(retry_after), 1)
+        )
+
+    def record_success(self) -> None:
+        """El proveedor respondió: se cierra el circuito."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Fallo transitorio: abre el circuito al llegar al umbral (o si falló la prueba)."""
+        if self.failure_threshold <= 0:
+            return
+
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_ignored(self) -> None:
+        """Error que no dice nada de la salud del proveedor: solo libera la llamada de prueba."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, state=self._state, consecutive_failures=self._failures)
+            if self._state == self.OPEN:
+                stats["retry_in_seconds"] = round(
+                    max(self._opened_at + self.reset_seconds - time.monotonic(), 0), 2
+                )
+            return stats
+
+
+class ResilientProvider(LLMProvider):
+    """Proveedor de LLM con plazos, reintentos, hedging y circuit breaker."""
+
+    def __init__(self, provider: LLMProvider, config):
+        """
+        Args:
+            provider: Proveedor real (Gemini, falso, ...)
+            config: Configuración de Flask (app.config)
+        """
+        self.provider = provider
+        self.name = provider.name
+        self.default_model = provider.default_model
+        self.fast_model = provider.fast_model
+
+        self.call_timeout = config.get('LLM_CALL_TIMEOUT_SECONDS', 60)
+        self.call_deadline = config.get('LLM_CALL_DEADLINE_SECONDS', 90)
+        self.max_attempts = max(config.get('LLM_RETRY_MAX_ATTEMPTS', 3), 1)
+        self.backoff_base = config.get('LLM_RETRY_BACKOFF_BASE_SECONDS', 0.5)
+        self.backoff_max = config.get('LLM_RETRY_BACKOFF_MAX_SECONDS', 8)
+        self.retry_status_codes = set(config.get('LLM_RETRY_STATUS_CODES', DEFAULT_RETRY_STATUS_CODES))
+        self.hedge_enabled = config.get('LLM_HEDGE_ENABLED', False)
+        self.hedge_percentile = config.get('LLM_HEDGE_PERCENTILE', 95)
+        self.hedge_min_samples = config.get('LLM_HEDGE_MIN_SAMPLES', 20)
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.get('LLM_BREAKER_FAILURE_THRESHOLD', 5),
+            reset_seconds=config.get('LLM_BREAKER_RESET_SECONDS', 30)
+        )
+
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._latencies = {
+            operation: deque(maxlen=LATENCY_WINDOW)
+            for operation in ('chat', 'stream_chat', 'generate')
+        }
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "transient_errors": 0,
+            "timeouts": 0,
+            "permanent_errors": 0,
+            "deadline_exceeded": 0,
+            "hedges": 0,
+            "hedges_won": 0,
+        }
+
+    def chat(self, system_instruction, history, message, generation=None, model=None, timeout=None):
+        return self._call('chat', timeout, lambda attempt_timeout: self.provider.chat(
+            system_instruction, history, message, generation=generation, model=model, timeout=attempt_timeout
+        ))
+
+    def stream_chat(self, system_instruction, history, message, generation=None, model=None, timeout=None):
+        return self._call('stream_chat', timeout, lambda attempt_timeout: self.provider.stream_chat(
+            system_instruction, history, message, generation=generation, model=model, timeout=attempt_timeout
+        ))
+
+    def generate(self, system_instruction, prompt, generation=None, model=None, timeout=None):
+        return self._call('generate', timeout, lambda attempt_timeout: self.provider.generate(
+            system_instruction, prompt, generation=generation, model=model, timeout=attempt_timeout
+        ))
+
+    def count_tokens(self, text, model=None):
+        return self.provider.count_tokens(text, model=model)
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._stats[field] += 1
+
+    def _call(self, operation: str, deadline: float, fn):
+        """
+        Ejecuta una llamada con plazo, reintentos y circuit breaker.
+
+        Args:
+            operation: 'chat', 'stream_chat' o 'generate'
+            deadline: Plazo total en segundos (por defecto LLM_CALL_DEADLINE_SECONDS)
+            fn: Función fn(timeout_del_intento) que llama al proveedor
+
+        Raises:
+            ServiceUnavailableError: Si el circuito está abierto
+            LLMTimeoutError: Si se agotó el plazo total
+            Exception: El último error del proveedor
+        """
+        self._count("calls")
+        deadline_at = time.monotonic() + (deadline or self.call_deadline)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self._count("deadline_exceeded")
+                raise LLMTimeoutError("Se agotó el plazo de la llamada al LLM")
+
+            self.breaker.before_call()
+            self._count("attempts")
+            started = time.monotonic()
+
+            try:
+                result = self._attempt(operation, fn, min(self.call_timeout, remaining))
+            except Exception as e:
+                if not is_retryable_error(e, self.retry_status_codes):
+                    self.breaker.record_ignored()
+                    self._count("permanent_errors")
+                    raise
+
+                self.breaker.record_failure()
+                self._count("timeouts" if isinstance(e, TimeoutError) or getattr(e, 'code', None) == 504
+                            else "transient_errors")
+
+                # Backoff exponencial con jitter completo
+                delay = self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                if attempt >= self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    raise
+
+                current_app.logger.warning(
+                    f"Error transitorio del LLM en {operation} (intento {attempt}/{self.max_attempts}), "
+                    f"reintentando en {delay:.2f}s: {str(e)}"
+                )
+                self._count("retries")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            with self._lock:
+                self._latencies[operation].append(time.monotonic() - started)
+            return result
+
+    def _hedge_delay(self, operation: str):
+        """Segundos tras los cuales lanzar la petición de respaldo (None si no corresponde)."""
+        if not self.hedge_enabled:
+            return None
+
+        with self._lock:
+            samples = sorted(self._latencies[operation])
+
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return _percentile(samples, self.hedge_percentile)
+
+    def _attempt(self, operation: str, fn, timeout: float):
+        """Un intento, con una petición de respaldo si tarda más que el percentil configurado."""
+        hedge_delay = self._hedge_delay(operation)
+        if hedge_delay is None or hedge_delay >= timeout:
+            return fn(timeout)
+
+        app = current_app._get_current_object()
+        results = queue.Queue()
+        started = time.monotonic()
+
+        def run(index: int, attempt_timeout: float):
+            with app.app_context():
+                try:
+                    results.put((index, fn(attempt_timeout), None))
+                except Exception as e:
+                    results.put((index, None, e))
+
+        threading.Thread(target=run, args=(0, timeout), name='llm-attempt', daemon=True).start()
+        pending = 1
+        hedged = False
+
+        while True:
+            wait = None if hedged else max(hedge_delay - (time.monotonic() - started), 0)
+            try:
+                index, result, error = results.get(timeout=wait)
+            except queue.Empty:
+                # El intento superó el percentil: lanzar el respaldo con el plazo restante
+                hedged = True
+                pending += 1
+                self._count("hedges")
+                threading.Thread(
+                    target=run,
+                    args=(1, max(timeout - (time.monotonic() - started), 0.001)),
+                    name='llm-hedge',
+                    daemon=True
+                ).start()
+                continue
+
+            pending -= 1
+            if error is None:
+                if index == 1:
+                    self._count("hedges_won")
+                return result
+
+            if not pending:
+                raise error
+
+    def stats(self) -> dict:
+        """Métricas de reintentos, hedging, circuit breaker y latencias por operación."""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = {operation: sorted(values) for operation, values in self._latencies.items()}
+
+        stats["breaker"] = self.breaker.stats()
+        stats["latency_ms"] = {
+            operation: {
+                "samples": len(values),
+                "p50": round(_percentile(values, 50) * 1000, 2),
+                "p95": round(_percentile(values, 95) * 1000, 2),
+            }
+            for operation, values in latencies.items() if values
+        }
+        return stats
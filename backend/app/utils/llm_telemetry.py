@@ -0,0 +1,283 @@
+"""
+MÓDULO: TELEMETRÍA DE LLAMADAS AL LLM
+======================================
+
+Registra cada llamada al proveedor de LLM (chat, stream y resúmenes de
+conversaciones) en la tabla `llm_calls`: tokens de entrada, de salida y
+cacheados, tiempo hasta el primer fragmento, latencia total, espera en el
+control de admisión, modelo, ruta (rápida o grande, ver utils/model_router.py),
+curso e institución.
+
+- Los registros se escriben en lote desde un thread cada
+  LLM_TELEMETRY_FLUSH_SECONDS (ver utils/buffered_writer.py), fuera del
+  request.
+- `llm_telemetry_report` agrega por curso, institución, día o ruta: sumas de
+  tokens en SQL y percentiles de latencia calculados sobre las llamadas más
+  recientes de cada grupo (LLM_TELEMETRY_PERCENTILE_SAMPLE).
+- `flask prune-llm-telemetry` elimina los registros más antiguos que
+  LLM_TELEMETRY_RETENTION_DAYS.
+
+Las respuestas del caché de respuestas no llaman al LLM y no se registran.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func
+
+from .. import db
+from ..models import Course, Institution, LLMCall
+from .buffered_writer import BufferedWriter
+
+GROUP_BY_COURSE = 'course'
+GROUP_BY_INSTITUTION = 'institution'
+GROUP_BY_DAY = 'day'
+GROUP_BY_ROUTE = 'route'
+GROUP_BY_OPTIONS = (GROUP_BY_COURSE, GROUP_BY_INSTITUTION, GROUP_BY_DAY, GROUP_BY_ROUTE)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _elapsed_ms(start: float, end: float):
+    if start is None or end is None:
+        return None
+    return int(round((end - start) * 1000))
+
+
+def record_llm_call(operation: str, course, user_id: int, model: str, usage: dict = None,
+                    started_at: float = None, first_chunk_at: float = None, finished_at: float = None,
+                    queued_at: float = None, status: str = LLMCall.STATUS_OK, route: str = None) -> None:
+    """
+    Registra la telemetría de una llamada al LLM.
+
+    Los tiempos son valores de time.perf_counter(). Sin `first_chunk_at`
+    (llamadas sin streaming) el tiempo al primer fragmento es la latencia total.
+
+    Args:
+        operation: LLMCall.OPERATION_CHAT, OPERATION_STREAM u OPERATION_SUMMARY
+        course: Curso del chat
+        user_id: ID del usuario que originó la llamada (None si no aplica)
+        model: Modelo que respondió
+        usage: Uso de tokens reportado por el proveedor
+        started_at: Inicio de la llamada al proveedor
+        first_chunk_at: Llegada del primer fragmento (streaming)
+        finished_at: Fin de la llamada (por defecto, ahora)
+        queued_at: Inicio de la espera por un cupo del control de admisión
+        status: LLMCall.STATUS_OK o STATUS_ERROR
+        route: Ruta elegida por el enrutamiento de modelos ('fast' o 'large', opcional)
+    """
+    if not current_app.config.get('LLM_TELEMETRY_ENABLED', True):
+        return
+
+    if finished_at is None:
+        finished_at = time.perf_counter()
+    usage = usage or {}
+    latency_ms = _elapsed_ms(started_at, finished_at) or 0
+
+    entry = {
+        "user_id": user_id,
+        "course_id": course.id,
+        "institution_id": course.institution_id,
+        "model": model,
+        "operation": operation,
+        "route": route,
+        "status": status,
+        "prompt_tokens": usage.get("prompt_tokens", 0) or 0,
+        "output_tokens": usage.get("output_tokens", 0) or 0,
+        "cached_tokens": usage.get("cached_tokens", 0) or 0,
+        "queue_ms": _elapsed_ms(queued_at, started_at),
+        "ttft_ms": _elapsed_ms(started_at, first_chunk_at) if first_chunk_at is not None else (
+            latency_ms if status == LLMCall.STATUS_OK else None
+        ),
+        "latency_ms": latency_ms,
+        "created_at": datetime.utcnow(),
+    }
+
+    _telemetry_writer.add(entry)
+
+
+def flush_llm_telemetry() -> int:
+    """Escribe de inmediato los registros pendientes (ej: antes de terminar un script)."""
+    return _telemetry_writer.flush()
+
+
+def llm_telemetry_writer_stats() -> dict:
+    """Registros pendientes, escritos, descartados y rechazados del buffer de telemetría."""
+    return _telemetry_writer.stats()
+
+
+def _write_calls(entries: list) -> None:
+    """Inserta los registros en una transacción propia."""
+    with db.engine.begin() as connection:
+        connection.execute(LLMCall.__table__.insert(), entries)
+
+
+# Registros pendientes de escribir (ver record_llm_call)
+_telemetry_writer = BufferedWriter(
+    'llm-telemetry',
+    _write_calls,
+    flush_seconds_key='LLM_TELEMETRY_FLUSH_SECONDS',
+    max_entries_key='LLM_TELEMETRY_BUFFER_MAX'
+)
+
+
+def _percentiles(values: list) -> dict:
+    """Percentiles (nearest-rank) de una lista de milisegundos."""
+    if not values:
+        return None
+
+    values = sorted(values)
+    result = {f"p{p}": values[min(int(len(values) * p / 100), len(values) - 1)] for p in PERCENTILES}
+    result["max"] = values[-1]
+    return result
+
+
+def _day_key(value) -> str:
+    """Normaliza func.date(...) (date en PostgreSQL/MySQL, texto en SQLite) a 'YYYY-MM-DD'."""
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def llm_telemetry_report(group_by: str, since: datetime, until: datetime,
+                         course_id: int = None, institution_id: int = None) -> dict:
+    """
+    Agrega la telemetría de un rango de fechas.
+
+    Las sumas se calculan en SQL con una consulta agrupada. Los percentiles
+    de latencia y de tiempo al primer fragmento (solo llamadas exitosas) se
+    calculan en Python sobre las LLM_TELEMETRY_PERCENTILE_SAMPLE llamadas más
+    recientes de cada grupo, para no leer todas las filas de un rango amplio.
+    Cuando un grupo tiene más llamadas, sus percentiles son una aproximación
+    que refleja el período más reciente; los del total se calculan sobre la
+    unión de las muestras, por lo que los grupos grandes pesan menos que en
+    los datos completos.
+
+    Args:
+        group_by: 'course', 'institution', 'day' o 'route'
+        since: Inicio del rango (incluido)
+        until: Fin del rango (excluido)
+        course_id: Filtrar por curso (opcional)
+        institution_id: Filtrar por institución (opcional)
+
+    Returns:
+        dict: {"groups": [...], "totals": {...}} con llamadas, errores, tokens y percentiles
+    """
+    key_columns = {
+        GROUP_BY_COURSE: LLMCall.course_id,
+        GROUP_BY_INSTITUTION: LLMCall.institution_id,
+        GROUP_BY_DAY: func.date(LLMCall.created_at),
+        GROUP_BY_ROUTE: LLMCall.route,
+    }
+    key_column = key_columns[group_by]
+
+    filters = [LLMCall.created_at >= since, LLMCall.created_at < until]
+    if course_id is not None:
+        filters.append(LLMCall.course_id == course_id)
+    if institution_id is not None:
+        filters.append(LLMCall.institution_id == institution_id)
+
+    sums = db.session.query(
+        key_column,
+        func.count(LLMCall.id),
+        func.coalesce(func.sum(case((LLMCall.status == LLMCall.STATUS_ERROR, 1), else_=0)), 0),
+        func.coalesce(func.sum(LLMCall.prompt_tokens), 0),
+        func.coalesce(func.sum(LLMCall.output_tokens), 0),
+        func.coalesce(func.sum(LLMCall.cached_tokens), 0)
+    ).filter(*filters).group_by(key_column).all()
+
+    # Las N llamadas exitosas más recientes de cada grupo (función de ventana)
+    sample_size = current_app.config.get('LLM_TELEMETRY_PERCENTILE_SAMPLE', 5000)
+    recent = db.session.query(
+        key_column.label('key'),
+        LLMCall.latency_ms.label('latency_ms'),
+        LLMCall.ttft_ms.label('ttft_ms'),
+        func.row_number().over(
+            partition_by=key_column,
+            order_by=(LLMCall.created_at.desc(), LLMCall.id.desc())
+        ).label('position')
+    ).filter(*filters, LLMCall.status == LLMCall.STATUS_OK).subquery()
+
+    timings = db.session.query(
+        recent.c.key,
+        recent.c.latency_ms,
+        recent.c.ttft_ms
+    ).filter(recent.c.position <= sample_size).all()
+
+    normalize = _day_key if group_by == GROUP_BY_DAY else (lambda value: value)
+    latencies = {}
+    ttfts = {}
+    for key, latency_ms, ttft_ms in timings:
+        key = normalize(key)
+        latencies.setdefault(key, []).append(latency_ms)
+        if ttft_ms is not None:
+            ttfts.setdefault(key, []).append(ttft_ms)
+
+    names = {}
+    if group_by == GROUP_BY_COURSE:
+        ids = [row[0] for row in sums]
+        names = dict(db.session.query(Course.id, Course.nombre).filter(Course.id.in_(ids)).all()) if ids else {}
+    elif group_by == GROUP_BY_INSTITUTION:
+        ids = [row[0] for row in sums]
+        names = dict(db.session.query(Institution.id, Institution.nombre).filter(Institution.id.in_(ids)).all()) if ids else {}
+
+    def summary(calls, errors, prompt_tokens, output_tokens, cached_tokens, latency_values, ttft_values) -> dict:
+        return {
+            "calls": calls,
+            "errors": errors,
+            "prompt_tokens": int(prompt_tokens),
+            "output_tokens": int(output_tokens),
+            "cached_tokens": int(cached_tokens),
+            "total_tokens": int(prompt_tokens) + int(output_tokens),
+            "latency_ms": _percentiles(latency_values),
+            "ttft_ms": _percentiles(ttft_values),
+        }
+
+    groups = []
+    for key, calls, errors, prompt_tokens, output_tokens, cached_tokens in sums:
+        key = normalize(key)
+        group = {group_by: key}
+        if names:
+            group["nombre"] = names.get(key)
+        group.update(summary(
+            calls, errors, prompt_tokens, output_tokens, cached_tokens,
+            latencies.get(key, []), ttfts.get(key, [])
+        ))
+        groups.append(group)
+
+    if group_by in (GROUP_BY_DAY, GROUP_BY_ROUTE):
+        groups.sort(key=lambda group: group[group_by] or "")
+    else:
+        groups.sort(key=lambda group: group["total_tokens"], reverse=True)
+
+    totals = summary(
+        sum(group["calls"] for group in groups),
+        sum(group["errors"] for group in groups),
+        sum(group["prompt_tokens"] for group in groups),
+        sum(group["output_tokens"] for group in groups),
+        sum(group["cached_tokens"] for group in groups),
+        [value for values in latencies.values() for value in values],
+        [value for values in ttfts.values() for value in values]
+    )
+
+    return {"groups": groups, "totals": totals}
+
+
+def prune_llm_telemetry(retention_days: int = None) -> int:
+    """
+    Elimina los registros de telemetría más antiguos que la retención. Hace commit.
+
+    Args:
+        retention_days: Días a conservar (por defecto LLM_TELEMETRY_RETENTION_DAYS)
+
+    Returns:
+        int: Cantidad de registros eliminados
+    """
+    if retention_days is None:
+        retention_days = current_app.config.get('LLM_TELEMETRY_RETENTION_DAYS', 30)
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = LLMCall.query.filter(LLMCall.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
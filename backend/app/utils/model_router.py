@@ -0,0 +1,154 @@
+"""
+MÓDULO: ENRUTAMIENTO DE MODELOS DEL CHATBOT
+============================================
+
+Elige para cada mensaje entre el modelo rápido del proveedor (fast_model,
+ej: GEMINI_FAST_MODEL) y el modelo grande (default_model), según:
+
+- El tamaño del prompt del sistema ya armado (incluye los fragmentos
+  recuperados para la pregunta).
+- La cantidad de mensajes del historial.
+- La pregunta: largo, varias preguntas juntas, fórmulas o código, y
+  palabras que piden razonamiento (explica, compara, demuestra, ...).
+
+Un saludo o una pregunta corta con poco contexto va al modelo rápido; todo lo
+demás, al grande. Los umbrales globales son LLM_ROUTING_FAST_MAX_* y cada
+curso puede sobrescribirlos o fijar siempre un modelo (Course.model_routing).
+
+Cada decisión se registra en el log y en la telemetría de la llamada (ruta),
+para comparar latencias por ruta en GET /api/chat/telemetry?group_by=route.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+from flask import current_app
+
+from .file_parser import estimate_token_count
+
+ROUTE_FAST = 'fast'
+ROUTE_LARGE = 'large'
+
+ROUTING_AUTO = 'auto'
+ROUTING_MODES = (ROUTING_AUTO, ROUTE_FAST, ROUTE_LARGE)
+
+# Umbrales: atributo del curso -> (clave de configuración, valor por defecto)
+THRESHOLDS = {
+    'routing_max_context_tokens': ('LLM_ROUTING_FAST_MAX_CONTEXT_TOKENS', 2500),
+    'routing_max_history_messages': ('LLM_ROUTING_FAST_MAX_HISTORY_MESSAGES', 4),
+    'routing_max_question_tokens': ('LLM_ROUTING_FAST_MAX_QUESTION_TOKENS', 60),
+}
+
+# Raíces (sin tildes) de palabras que piden razonamiento o desarrollo
+COMPLEX_MARKERS = (
+    'por que', 'explica', 'compar', 'diferencia', 'analiz', 'demuestr', 'resuelv',
+    'calcul', 'paso a paso', 'justific', 'desarroll', 'argument', 'evalu',
+    'relacion', 'interpret', 'resum', 'ensayo', 'ejercicio',
+)
+
+# Operaciones aritméticas, fórmulas o bloques de código
+_FORMULA_PATTERN = re.compile(r'\d\s*[-+*/^=<>]\s*\d|```|\\frac|[∫√∑π]|\b(def|class|function|return)\b')
+
+RouteDecision = namedtuple('RouteDecision', ['route', 'model', 'reason', 'features'])
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _normalize(text: str) -> str:
+    """Minúsculas y sin tildes."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def routing_thresholds(course) -> dict:
+    """Umbrales del modelo rápido para el curso (los del curso o los globales)."""
+    thresholds = {}
+    for attribute, (config_key, default) in THRESHOLDS.items():
+        value = getattr(course, attribute, None)
+        thresholds[attribute] = value if value is not None else current_app.config.get(config_key, default)
+    return thresholds
+
+
+def question_features(question: str) -> dict:
+    """Rasgos simples de la pregunta usados por el enrutamiento."""
+    normalized = _normalize(question or "")
+    return {
+        "question_tokens": estimate_token_count(question or ""),
+        "questions": max(normalized.count('?'), 1),
+        "complex_marker": next((marker for marker in COMPLEX_MARKERS if marker in normalized), None),
+        "formula": bool(_FORMULA_PATTERN.search(question or "")),
+    }
+
+
+def routing_signature(provider, course) -> tuple:
+    """
+    Todo lo que, además del contenido y la pregunta, decide el modelo de una respuesta.
+
+    Se usa en la clave de la caché de respuestas: si cambia el modo o los
+    umbrales del curso, las respuestas de otro modelo dejan de usarse.
+    """
+    enabled = bool(provider.fast_model) and current_app.config.get('LLM_ROUTING_ENABLED', True)
+    return (
+        provider.default_model,
+        provider.fast_model if enabled else None,
+        getattr(course, 'model_routing', None) or ROUTING_AUTO,
+        tuple(sorted(routing_thresholds(course).items())) if enabled else None,
+    )
+
+
+def route_chat(provider, course, system_prompt: str, history: list, question: str) -> RouteDecision:
+    """
+    Elige el modelo para responder un mensaje del chat.
+
+    Args:
+        provider: Proveedor de LLM (default_model y fast_model)
+        course: Curso del chat (modo y umbrales propios)
+        system_prompt: Prompt del sistema ya armado
+        history: Historial enviado al modelo
+        question: Último mensaje del usuario
+
+    Returns:
+        RouteDecision: Ruta ('fast' o 'large'), modelo, motivo y rasgos medidos
+    """
+    mode = getattr(course, 'model_routing', None) or ROUTING_AUTO
+    features = {}
+
+    if not provider.fast_model or not current_app.config.get('LLM_ROUTING_ENABLED', True):
+        route, reason = ROUTE_LARGE, 'disabled'
+    elif mode != ROUTING_AUTO:
+        route, reason = mode, 'course'
+    else:
+        thresholds = routing_thresholds(course)
+        features = dict(
+            question_features(question),
+            context_tokens=estimate_token_count(system_prompt or ""),
+            history_messages=len(history),
+        )
+
+        if features["context_tokens"] > thresholds['routing_max_context_tokens']:
+            route, reason = ROUTE_LARGE, 'context'
+        elif features["history_messages"] > thresholds['routing_max_history_messages']:
+            route, reason = ROUTE_LARGE, 'history'
+        elif features["question_tokens"] > thresholds['routing_max_question_tokens']:
+            route, reason = ROUTE_LARGE, 'question_length'
+        elif features["questions"] > 1 or features["formula"] or features["complex_marker"]:
+            route, reason = ROUTE_LARGE, 'complexity'
+        else:
+            route, reason = ROUTE_FAST, 'simple'
+
+    model = provider.fast_model if route == ROUTE_FAST else provider.default_model
+
+    with _stats_lock:
+        key = f"{route}:{reason}"
+        _stats[key] = _stats.get(key, 0) + 1
+
+    return RouteDecision(route, model, reason, features)
+
+
+def routing_stats() -> dict:
+    """Decisiones de este proceso por ruta y motivo (ej: {"fast:simple": 10})."""
+    with _stats_lock:
+        return dict(_stats)
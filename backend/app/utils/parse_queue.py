@@ -0,0 +1,431 @@
+"""
+MÓDULO: COLA DE PARSEO EN SEGUNDO PLANO
+========================================
+
+Los archivos subidos se parsean fuera del request HTTP. La subida solo
+guarda el archivo y crea un ParseJob en estado 'queued'; un worker lo toma,
+lo marca como 'parsing', parsea el archivo, genera los fragmentos de
+recuperación y lo deja en 'done' o 'failed'.
+
+Modos de ejecución (PARSE_QUEUE_MODE):
+- 'thread': un pool de threads dentro del proceso web procesa los trabajos
+  apenas se encolan.
+- 'worker': los trabajos solo se encolan; los procesa un proceso aparte con
+  `flask parse-worker`.
+
+El parseo en sí corre en el pool de procesos de parser_pool.py, con timeout
+y límite de memoria; el resultado queda en CourseFile.parse_outcome. Si otro
+archivo con el mismo contenido (blob) ya se parseó con la misma versión de
+parseo, su texto se reutiliza sin volver a parsear.
+
+La cola vive en la tabla parse_jobs, por lo que sobrevive a reinicios: los
+trabajos pendientes (o abandonados por un worker caído) se retoman con
+`flask parse-worker` o, en modo 'thread', al llegar el primer request al
+proceso web.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .. import db
+from ..models import CourseFile, ParseJob
+from .blob_store import release_parsed_text
+from .course_stats import refresh_course_parse_stats
+from .file_handler import get_file_path
+from .parser_pool import (
+    OUTCOME_EMPTY,
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    OUTCOME_TRUNCATED,
+    current_parser_version,
+    parse_file_isolated
+)
+from .retrieval import index_course_file
+
+
+def enqueue_parse_job(course_file: CourseFile) -> ParseJob:
+    """
+    Crea (o reinicia) el trabajo de parseo de un archivo.
+
+    Si el contenido ya se parseó para otro archivo idéntico, se reutiliza y
+    el trabajo queda directamente en 'done'. No hace commit; después del
+    commit se debe llamar a submit_parse_job.
+
+    Args:
+        course_file: Archivo del curso a parsear
+
+    Returns:
+        ParseJob: Trabajo en estado 'queued'
+    """
+    job = course_file.parse_job
+    if job is None:
+        job = ParseJob(course_file=course_file)
+        db.session.add(job)
+
+    job.status = ParseJob.STATUS_QUEUED
+    job.attempts = 0
+    job.error = None
+    job.started_at = None
+    job.finished_at = None
+
+    if reuse_parsed_content(course_file):
+        job.status = ParseJob.STATUS_DONE
+        job.finished_at = datetime.utcnow()
+
+    return job
+
+
+def reuse_parsed_content(course_file: CourseFile) -> bool:
+    """
+    Copia el texto parseado de otro archivo con el mismo blob y versión de parseo.
+
+    No hace commit.
+
+    Args:
+        course_file: Archivo del curso (con blob asignado)
+
+    Returns:
+        bool: True si se reutilizó el contenido (no hace falta parsear)
+    """
+    if course_file.blob_id is None:
+        return False
+
+    donor = CourseFile.query.filter(
+        CourseFile.blob_id == course_file.blob_id,
+        CourseFile.id != course_file.id,
+        CourseFile.parser_version == current_parser_version(),
+        CourseFile.parsed_text_id.isnot(None)
+    ).order_by(CourseFile.parsed_at.desc()).first()
+
+    if donor is None:
+        return False
+
+    # Ambos archivos comparten la misma fila de texto parseado
+    course_file.parsed_text = donor.parsed_text
+    course_file.char_count = donor.char_count
+    course_file.token_estimate = donor.token_estimate
+    course_file.parsed_at = datetime.utcnow()
+    course_file.parse_outcome = donor.parse_outcome
+    course_file.parse_error = None
+    course_file.parse_duration_ms = 0
+    course_file.parser_version = donor.parser_version
+    index_course_file(course_file)
+    refresh_course_parse_stats(course_file.course_id)
+
+    current_app.logger.info(
+        f"Contenido parseado reutilizado para {course_file.filename} (archivo {donor.id})"
+    )
+    return True
+
+
+def claim_job(job_id: int) -> bool:
+    """
+    Marca atómicamente un trabajo 'queued' como 'parsing'.
+
+    El UPDATE condicionado al estado garantiza que dos workers no tomen el
+    mismo trabajo.
+
+    Args:
+        job_id: ID del trabajo
+
+    Returns:
+        bool: True si este worker obtuvo el trabajo
+    """
+    claimed = db.session.query(ParseJob).filter(
+        ParseJob.id == job_id,
+        ParseJob.status == ParseJob.STATUS_QUEUED
+    ).update({
+        ParseJob.status: ParseJob.STATUS_PARSING,
+        ParseJob.attempts: ParseJob.attempts + 1,
+        ParseJob.started_at: datetime.utcnow(),
+        ParseJob.finished_at: None
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def claim_next_job():
+    """
+    Toma el trabajo pendiente más antiguo de la cola.
+
+    Returns:
+        int | None: ID del trabajo tomado, o None si la cola está vacía
+    """
+    while True:
+        job_id = db.session.query(ParseJob.id).filter(
+            ParseJob.status == ParseJob.STATUS_QUEUED
+        ).order_by(ParseJob.created_at, ParseJob.id).limit(1).scalar()
+
+        if job_id is None:
+            return None
+
+        if claim_job(job_id):
+            return job_id
+        # Otro worker lo tomó primero; intentar con el siguiente
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Devuelve a la cola los trabajos 'parsing' abandonados por un worker caído.
+
+    Returns:
+        int: Cantidad de trabajos reencolados
+    """
+    stale_seconds = current_app.config.get('PARSE_JOB_STALE_SECONDS', 600)
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+
+    requeued = db.session.query(ParseJob).filter(
+        ParseJob.status == ParseJob.STATUS_PARSING,
+        ParseJob.started_at < cutoff
+    ).update({ParseJob.status: ParseJob.STATUS_QUEUED}, synchronize_session=False)
+    db.session.commit()
+    return requeued
+
+
+def run_parse_job(job_id: int) -> str:
+    """
+    Ejecuta un trabajo ya tomado (estado 'parsing').
+
+    Si el parseo falla y quedan intentos (PARSE_JOB_MAX_ATTEMPTS), el
+    trabajo vuelve a la cola; si no, queda en 'failed' con el error. Los
+    timeouts y excesos de memoria no se reintentan.
+
+    Args:
+        job_id: ID del trabajo
+
+    Returns:
+        str: Estado final del trabajo
+    """
+    job = db.session.get(ParseJob, job_id)
+    if job is None:
+        return ParseJob.STATUS_FAILED
+
+    course_file = job.course_file
+    started = time.monotonic()
+
+    try:
+        # Un archivo idéntico pudo terminar de parsearse mientras este esperaba
+        if reuse_parsed_content(course_file):
+            job.status = ParseJob.STATUS_DONE
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return job.status
+
+        result = parse_file_isolated(get_file_path(course_file.filepath))
+
+        if result.text:
+            previous_text_id = course_file.parsed_text_id
+            course_file.parsed_content = result.text
+            if previous_text_id:
+                release_parsed_text(previous_text_id)
+            course_file.parsed_at = datetime.utcnow()
+            chunks_count = index_course_file(course_file)
+            refresh_course_parse_stats(course_file.course_id)
+            current_app.logger.info(
+                f"Archivo parseado: {course_file.filename} ({len(result.text)} caracteres, "
+                f"{chunks_count} fragmentos{', truncado' if result.truncated else ''})"
+            )
+        else:
+            current_app.logger.warning(f"Archivo parseado pero contenido vacío: {course_file.filename}")
+
+        if not result.text:
+            course_file.parse_outcome = OUTCOME_EMPTY
+        else:
+            course_file.parse_outcome = OUTCOME_TRUNCATED if result.truncated else OUTCOME_OK
+        course_file.parse_error = None
+        course_file.parse_duration_ms = int((time.monotonic() - started) * 1000)
+        course_file.parser_version = current_parser_version()
+
+        job.status = ParseJob.STATUS_DONE
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ParseJob, job_id)
+        course_file = job.course_file
+        max_attempts = current_app.config.get('PARSE_JOB_MAX_ATTEMPTS', 2)
+        retryable = getattr(e, 'retryable', True)
+
+        course_file.parse_outcome = getattr(e, 'outcome', OUTCOME_ERROR)
+        course_file.parse_error = str(e)
+        course_file.parse_duration_ms = int((time.monotonic() - started) * 1000)
+
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        if retryable and job.attempts < max_attempts:
+            job.status = ParseJob.STATUS_QUEUED
+        else:
+            job.status = ParseJob.STATUS_FAILED
+        db.session.commit()
+
+        current_app.logger.warning(
+            f"No se pudo parsear archivo {course_file.filename} "
+            f"(intento {job.attempts}/{max_attempts}, {course_file.parse_outcome}): {str(e)}"
+        )
+
+    return job.status
+
+
+def process_parse_job(job_id: int) -> str:
+    """
+    Toma y ejecuta un trabajo específico, reintentando mientras queden intentos.
+
+    Returns:
+        str | None: Estado final, o None si otro worker ya lo había tomado
+    """
+    status = None
+    while claim_job(job_id):
+        status = run_parse_job(job_id)
+        if status != ParseJob.STATUS_QUEUED:
+            break
+    return status
+
+
+def run_worker(poll_interval: float = 2.0, once: bool = False, concurrency: int = 1) -> int:
+    """
+    Loop del worker de parseo (usado por `flask parse-worker`).
+
+    Args:
+        poll_interval: Segundos de espera cuando la cola está vacía
+        once: Si es True, procesa la cola pendiente y termina
+        concurrency: Trabajos en paralelo (cada uno usa un proceso del pool)
+
+    Returns:
+        int: Cantidad de trabajos procesados
+    """
+    requeued = requeue_stale_jobs()
+    if requeued:
+        current_app.logger.warning(f"Trabajos de parseo abandonados reencolados: {requeued}")
+
+    if concurrency <= 1:
+        return _worker_loop(poll_interval, once)
+
+    app = current_app._get_current_object()
+    processed = []
+
+    def loop():
+        with app.app_context():
+            try:
+                processed.append(_worker_loop(poll_interval, once))
+            finally:
+                db.session.remove()
+
+    threads = [
+        threading.Thread(target=loop, name=f'parse-worker-{position}', daemon=True)
+        for position in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(processed)
+
+
+def _worker_loop(poll_interval: float, once: bool) -> int:
+    """Toma y ejecuta trabajos de la cola hasta vaciarla (once) o para siempre."""
+    processed = 0
+
+    while True:
+        job_id = claim_next_job()
+
+        if job_id is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        run_parse_job(job_id)
+        processed += 1
+        db.session.remove()
+
+
+def init_parse_executor(app) -> None:
+    """
+    Crea el pool de threads de parseo si PARSE_QUEUE_MODE es 'thread'.
+
+    Con el primer request del proceso se envía al pool la recuperación de la
+    cola (ver _resume_pending_jobs). No se hace al crear la app porque
+    create_app también se usa en comandos como `flask db upgrade`.
+
+    Args:
+        app: Instancia de Flask
+    """
+    if app.config.get('PARSE_QUEUE_MODE', 'thread') != 'thread':
+        return
+
+    executor = ThreadPoolExecutor(
+        max_workers=app.config.get('PARSE_WORKER_THREADS', 2),
+        thread_name_prefix='parse-worker'
+    )
+    app.extensions['parse_executor'] = executor
+
+    resumed = threading.Event()
+    resume_lock = threading.Lock()
+
+    @app.before_request
+    def resume_parse_queue():
+        if resumed.is_set():
+            return
+        with resume_lock:
+            if not resumed.is_set():
+                resumed.set()
+                executor.submit(_resume_pending_jobs, app)
+
+
+def _resume_pending_jobs(app) -> None:
+    """
+    Procesa los trabajos que quedaron en la tabla al reiniciar el proceso.
+
+    Reencola los abandonados por un proceso caído y vacía la cola con
+    claim_next_job; si otro proceso toma el mismo trabajo, el UPDATE
+    condicionado de claim_job evita parsearlo dos veces.
+    """
+    with app.app_context():
+        try:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                app.logger.warning(f"Trabajos de parseo abandonados reencolados: {requeued}")
+
+            processed = _worker_loop(poll_interval=0, once=True)
+            if processed:
+                app.logger.info(f"Trabajos de parseo pendientes procesados al iniciar: {processed}")
+        except Exception as e:
+            app.logger.error(f"No se pudo retomar la cola de parseo: {str(e)}", exc_info=True)
+        finally:
+            db.session.remove()
+
+
+def submit_parse_job(job: ParseJob) -> None:
+    """
+    Envía un trabajo recién encolado al pool de threads (modo 'thread').
+
+    Los trabajos que no quedaron en 'queued' (contenido reutilizado) se ignoran.
+
+    En modo 'worker' no hace nada: el trabajo queda en la tabla para el
+    proceso `flask parse-worker`.
+    """
+    app = current_app._get_current_object()
+    executor = app.extensions.get('parse_executor')
+    if executor is None or job.status != ParseJob.STATUS_QUEUED:
+        return
+
+    executor.submit(_process_in_app_context, app, job.id)
+
+
+def _process_in_app_context(app, job_id: int) -> None:
+    """Ejecuta un trabajo dentro de un app context propio del thread."""
+    with app.app_context():
+        try:
+            process_parse_job(job_id)
+        except Exception as e:
+            app.logger.error(f"Error inesperado en trabajo de parseo {job_id}: {str(e)}", exc_info=True)
+        finally:
+            db.session.remove()
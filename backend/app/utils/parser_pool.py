@@ -0,0 +1,361 @@
+"""
+MÓDULO: POOL DE PROCESOS PARA PARSEO DE ARCHIVOS
+=================================================
+
+Los parsers (PyPDF2, python-docx, openpyxl) corren en procesos aparte para
+que un archivo malformado o gigante no bloquee ni tumbe el proceso web:
+
+- Cada tarea tiene un timeout de reloj (PARSER_TIMEOUT_SECONDS); si se
+  cumple, el proceso se mata y se reemplaza.
+- Cada proceso tiene un límite de memoria virtual (RLIMIT_AS,
+  PARSER_MEMORY_LIMIT_MB).
+- Los PDF y Excel se leen como máximo hasta PARSER_MAX_PDF_PAGES páginas y
+  PARSER_MAX_SHEET_ROWS filas.
+- Un proceso que muere (segfault, OOM killer) se detecta y se reemplaza, y
+  cada proceso se recicla tras PARSER_WORKER_MAX_TASKS tareas.
+
+Hay PARSER_POOL_SIZE procesos, por lo que varios archivos subidos a la vez
+se parsean en paralelo en distintos núcleos.
+"""
+
+import atexit
+import multiprocessing
+import os
+import signal
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows: sin límite de memoria por proceso
+    resource = None
+
+from flask import current_app
+
+from .file_parser import PARSER_VERSION, ParseResult, parse_file
+
+# Resultados posibles del parseo (se guardan en CourseFile.parse_outcome)
+OUTCOME_OK = 'ok'
+OUTCOME_TRUNCATED = 'truncated'
+OUTCOME_EMPTY = 'empty'
+OUTCOME_ERROR = 'error'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOME_MEMORY_LIMIT = 'memory_limit'
+OUTCOME_CRASHED = 'crashed'
+
+# 'spawn' evita heredar threads y conexiones a la BD del proceso web
+_MP_CONTEXT = multiprocessing.get_context('spawn')
+
+# Segundos máximos para que un proceso nuevo arranque (importa los parsers)
+WORKER_STARTUP_TIMEOUT = 60
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ParseError(Exception):
+    """Error de parseo dentro del pool."""
+
+    outcome = OUTCOME_ERROR
+    retryable = True
+
+
+class ParseTimeoutError(ParseError):
+    """El parseo superó el timeout; no se reintenta."""
+
+    outcome = OUTCOME_TIMEOUT
+    retryable = False
+
+
+class ParseMemoryError(ParseError):
+    """El parseo superó el límite de memoria; no se reintenta."""
+
+    outcome = OUTCOME_MEMORY_LIMIT
+    retryable = False
+
+
+class ParseCrashError(ParseError):
+    """El proceso del parser murió durante la tarea."""
+
+    outcome = OUTCOME_CRASHED
+
+
+def _worker_main(conn, memory_limit_bytes) -> None:
+    """Loop de un proceso del pool: recibe rutas y devuelve el texto parseado."""
+    # Ctrl+C lo maneja el proceso padre
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if resource is not None and memory_limit_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+
+    # Avisar que terminó de arrancar: el timeout de cada tarea no incluye el arranque
+    conn.send(('ready', None, False))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+
+        if task is None:
+            return
+
+        filepath, max_pages, max_rows = task
+        try:
+            result = parse_file(filepath, max_pages=max_pages, max_rows=max_rows)
+            conn.send(('ok', result.text, result.truncated))
+        except Exception as e:
+            # Los parsers envuelven sus errores; el MemoryError original queda en __context__
+            if isinstance(e, MemoryError) or isinstance(e.__context__, MemoryError):
+                conn.send(('memory', str(e) or "MemoryError", False))
+                return  # El proceso puede quedar en mal estado; se reemplaza
+            conn.send(('error', str(e), False))
+
+
+class _Worker:
+    """Proceso del pool con su canal de comunicación."""
+
+    def __init__(self, memory_limit_bytes: int):
+        self.conn, child_conn = _MP_CONTEXT.Pipe()
+        self.process = _MP_CONTEXT.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_bytes),
+            name='parser-worker',
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        """Espera el aviso de arranque del proceso."""
+        if self.ready:
+            return
+
+        if not self.conn.poll(WORKER_STARTUP_TIMEOUT):
+            raise OSError("El proceso de parseo no arrancó a tiempo")
+
+        self.conn.recv()
+        self.ready = True
+
+    def stop(self, kill: bool = False) -> None:
+        """Detiene el proceso (kill=True lo mata sin esperar)."""
+        if not kill and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=2)
+            except (OSError, EOFError):
+                pass
+
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+
+        self.conn.close()
+
+
+class ParserPool:
+    """Pool de procesos de parseo con timeout, límite de memoria y reciclaje."""
+
+    def __init__(self, size: int, timeout: float, memory_limit_mb: int = None,
+                 max_pages: int = None, max_rows: int = None, max_tasks_per_worker: int = None):
+        """
+        Args:
+            size: Cantidad máxima de procesos (parseos en paralelo)
+            timeout: Segundos máximos por archivo
+            memory_limit_mb: Límite de memoria virtual por proceso
+            max_pages: Máximo de páginas a leer por PDF
+            max_rows: Máximo de filas a leer por Excel
+            max_tasks_per_worker: Tareas antes de reciclar un proceso
+        """
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.max_pages = max_pages
+        self.max_rows = max_rows
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.pid = os.getpid()
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._stats = {
+            "tasks": 0,
+            "timeouts": 0,
+            "memory_errors": 0,
+            "crashes": 0,
+            "workers_started": 0
+        }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _checkout(self) -> _Worker:
+        """Toma un proceso libre y vivo, o inicia uno nuevo."""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.stop(kill=True)
+
+        self._count("workers_started")
+        return _Worker(self.memory_limit_bytes)
+
+    def _checkin(self, worker: _Worker) -> None:
+        """Devuelve un proceso al pool o lo recicla si cumplió su cuota de tareas."""
+        if self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+            worker.stop()
+            return
+
+        with self._lock:
+            self._idle.append(worker)
+
+    def parse(self, filepath: str) -> ParseResult:
+        """
+        Parsea un archivo en un proceso del pool.
+
+        Bloquea hasta que haya un proceso libre y el parseo termine.
+
+        Args:
+            filepath: Ruta absoluta al archivo
+
+        Returns:
+            ParseResult: Texto extraído y si se truncó por los límites
+
+        Raises:
+            ParseTimeoutError: Si se superó el timeout (el proceso se mata)
+            ParseMemoryError: Si se superó el límite de memoria
+            ParseCrashError: Si el proceso murió durante la tarea
+            ParseError: Si el parser lanzó un error
+        """
+        with self._slots:
+            worker = self._checkout()
+            self._count("tasks")
+            worker.tasks += 1
+
+            try:
+                worker.wait_ready()
+                worker.conn.send((filepath, self.max_pages, self.max_rows))
+
+                if not worker.conn.poll(self.timeout):
+                    worker.stop(kill=True)
+                    self._count("timeouts")
+                    raise ParseTimeoutError(f"El parseo superó el límite de {self.timeout:g} segundos")
+
+                status, payload, truncated = worker.conn.recv()
+
+            except (EOFError, OSError):
+                worker.stop(kill=True)
+                self._count("crashes")
+                raise ParseCrashError(
+                    f"El proceso de parseo terminó inesperadamente (código {worker.process.exitcode})"
+                )
+
+            if status == 'memory':
+                worker.stop(kill=True)
+                self._count("memory_errors")
+                raise ParseMemoryError(f"El parseo superó el límite de memoria: {payload}")
+
+            self._checkin(worker)
+
+            if status == 'error':
+                raise ParseError(payload)
+
+            return ParseResult(payload, truncated)
+
+    def shutdown(self) -> None:
+        """Detiene todos los procesos libres del pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+    def stats(self) -> dict:
+        """Métricas del pool."""
+        with self._lock:
+            return dict(self._stats, size=self.size, idle_workers=len(self._idle))
+
+
+def get_parser_pool():
+    """
+    Obtiene el pool de parseo del proceso actual (se crea de forma perezosa).
+
+    Returns:
+        ParserPool | None: Pool, o None si PARSER_POOL_SIZE es 0 (parseo en el proceso)
+    """
+    global _pool
+
+    size = current_app.config.get('PARSER_POOL_SIZE', 2)
+    if size <= 0:
+        return None
+
+    with _pool_lock:
+        # Un pool heredado de otro proceso (fork del servidor) no es utilizable
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ParserPool(
+                size=size,
+                timeout=current_app.config.get('PARSER_TIMEOUT_SECONDS', 60),
+                memory_limit_mb=current_app.config.get('PARSER_MEMORY_LIMIT_MB'),
+                max_pages=current_app.config.get('PARSER_MAX_PDF_PAGES'),
+                max_rows=current_app.config.get('PARSER_MAX_SHEET_ROWS'),
+                max_tasks_per_worker=current_app.config.get('PARSER_WORKER_MAX_TASKS')
+            )
+        return _pool
+
+
+def parse_file_isolated(filepath: str) -> ParseResult:
+    """
+    Parsea un archivo subido por un usuario con los límites configurados.
+
+    Args:
+        filepath: Ruta absoluta al archivo
+
+    Returns:
+        ParseResult: Texto extraído y si se truncó por los límites
+
+    Raises:
+        ParseError: (o subclases) si el parseo falla
+    """
+    pool = get_parser_pool()
+
+    if pool is None:
+        try:
+            return parse_file(
+                filepath,
+                max_pages=current_app.config.get('PARSER_MAX_PDF_PAGES'),
+                max_rows=current_app.config.get('PARSER_MAX_SHEET_ROWS')
+            )
+        except Exception as e:
+            raise ParseError(str(e))
+
+    return pool.parse(filepath)
+
+
+def current_parser_version() -> str:
+    """
+    Identificador de la versión de parseo vigente.
+
+    Incluye los límites de páginas/filas, ya que cambian el texto resultante.
+
+    Returns:
+        str: Ej: 'v2-p500-r50000'
+    """
+    return (
+        f"v{PARSER_VERSION}"
+        f"-p{current_app.config.get('PARSER_MAX_PDF_PAGES') or 0}"
+        f"-r{current_app.config.get('PARSER_MAX_SHEET_ROWS') or 0}"
+    )
+
+
+def parser_pool_stats() -> dict:
+    """Métricas del pool del proceso actual (vacío si aún no se creó)."""
+    return _pool.stats() if _pool is not None and _pool.pid == os.getpid() else {}
+
+
+@atexit.register
+def shutdown_parser_pool() -> None:
+    """Detiene los procesos del pool al terminar el proceso."""
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.shutdown()
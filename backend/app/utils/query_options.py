@@ -0,0 +1,82 @@
+"""
+MÓDULO: OPCIONES DE CARGA PARA LISTADOS
+========================================
+
+Los métodos to_dict de los modelos recorren relaciones (institución, grado,
+curso, usuario, quien subió el archivo). En un listado, cargarlas de forma
+perezosa significa una consulta por fila (N+1). Estas funciones devuelven las
+opciones de carga que corresponden a cada forma de serializar, para usarlas
+con `.options(...)` en la consulta del listado:
+
+- Relaciones muchos-a-uno con joinedload (en la misma consulta, sin afectar
+  la paginación).
+- Solo las columnas que se serializan de las relaciones (load_only).
+- Columnas de texto grandes que no se serializan, diferidas (defer).
+
+Así cada listado ejecuta una cantidad fija de consultas sin importar el
+tamaño de la página. Al cambiar un to_dict, actualizar aquí sus opciones.
+"""
+
+from sqlalchemy.orm import defer, joinedload
+
+from ..models import Course, CourseFile, Institution, User, UserCourse
+
+
+def _institution_summary(relationship):
+    """La institución como la resumen User.to_dict y Course.to_dict (id, nombre y color)."""
+    return joinedload(relationship).load_only(
+        Institution.id, Institution.nombre, Institution.colorinstitucional
+    )
+
+
+def user_options() -> tuple:
+    """Opciones para User.to_dict: institución resumida y grado."""
+    return (
+        _institution_summary(User.institution),
+        joinedload(User.grade),
+    )
+
+
+def course_options(include_institution: bool = True) -> tuple:
+    """Opciones para Course.to_dict: grado e institución resumida (si se incluye)."""
+    options = (joinedload(Course.grade),)
+    if include_institution:
+        options += (_institution_summary(Course.institution),)
+    return options
+
+
+def enrollment_options(include_course: bool = True, include_user: bool = False) -> tuple:
+    """
+    Opciones para UserCourse.to_dict.
+
+    Args:
+        include_course: Se serializa el curso (Course.to_dict sin estadísticas)
+        include_user: Se serializa el resumen del usuario (id, username, email y rol)
+    """
+    options = ()
+    if include_course:
+        course = joinedload(UserCourse.course)
+        options += (
+            course.joinedload(Course.grade),
+            course.joinedload(Course.institution).load_only(
+                Institution.id, Institution.nombre, Institution.colorinstitucional
+            ),
+        )
+    if include_user:
+        options += (
+            joinedload(UserCourse.user).load_only(User.id, User.username, User.email, User.role),
+        )
+    return options
+
+
+def course_file_options() -> tuple:
+    """
+    Opciones para CourseFile.to_dict sin contenido parseado.
+
+    El contenido vive en parsed_texts y solo se carga al acceder a
+    parsed_content; el detalle del error de parseo no se serializa.
+    """
+    return (
+        joinedload(CourseFile.uploader).load_only(User.id, User.username),
+        defer(CourseFile.parse_error),
+    )
@@ -0,0 +1,373 @@
+"""
+MÓDULO: RECUPERACIÓN DE FRAGMENTOS (BM25)
+==========================================
+
+Divide el contenido parseado de los archivos de un curso en fragmentos
+(por página o párrafo) y construye un índice invertido BM25 por curso para
+seleccionar solo los fragmentos relevantes a la pregunta del estudiante.
+
+La normalización está pensada para español:
+- minúsculas y eliminación de tildes/diéresis
+- eliminación de stopwords comunes
+- stemming liviano: primero el plural (-s/-es) y luego sufijos derivativos
+  o la vocal final, para que singular y plural compartan la misma raíz
+
+Los términos se guardan ya normalizados en course_file_chunks.terms: al
+cambiar la normalización hay que regenerarlos con `flask reindex-files`.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+from flask import current_app
+
+from .. import db
+from ..models import Course, CourseFile, CourseFileChunk
+from .cache import LRUCache
+from .context_snapshot import bump_content_version
+from .file_parser import estimate_token_count, truncate_text
+
+
+# Fragmento indexado en memoria (sin dependencia de la sesión de SQLAlchemy)
+IndexedChunk = namedtuple(
+    'IndexedChunk',
+    ['id', 'course_file_id', 'filename', 'position', 'content', 'token_count']
+)
+
+SPANISH_STOPWORDS = {
+    'a', 'al', 'algo', 'algunas', 'algunos', 'ante', 'antes', 'como', 'con', 'contra',
+    'cual', 'cuando', 'de', 'del', 'desde', 'donde', 'durante', 'e', 'el', 'ella',
+    'ellas', 'ellos', 'en', 'entre', 'era', 'es', 'esa', 'esas', 'ese', 'eso', 'esos',
+    'esta', 'estan', 'estas', 'este', 'esto', 'estos', 'fue', 'ha', 'hay', 'la', 'las',
+    'le', 'les', 'lo', 'los', 'mas', 'me', 'mi', 'mis', 'muy', 'ni', 'no', 'nos', 'o',
+    'os', 'para', 'pero', 'por', 'porque', 'que', 'quien', 'se', 'sea', 'segun', 'ser',
+    'si', 'sin', 'sobre', 'son', 'su', 'sus', 'tambien', 'te', 'tiene', 'tu', 'tus',
+    'u', 'un', 'una', 'unas', 'uno', 'unos', 'y', 'ya', 'yo',
+}
+
+# Sufijos ordenados de más largo a más corto (se elimina el primero que calce)
+_SPANISH_SUFFIXES = sorted((
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'uciones', 'adoras',
+    'adores', 'ancias', 'encias', 'idades', 'mente', 'acion', 'ucion', 'adora',
+    'ador', 'ancia', 'encia', 'idad', 'ibles', 'ables', 'able', 'ible', 'istas',
+    'ista', 'osos', 'osas', 'oso', 'osa', 'ivas', 'ivos', 'iva', 'ivo', 'ando',
+    'iendo', 'ados', 'adas', 'idos', 'idas', 'ado', 'ada', 'ido', 'ida',
+    'a', 'o', 'e',
+), key=len, reverse=True)
+
+_VOWELS = 'aeiou'
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+_PAGE_PATTERN = re.compile(r'(?=^--- Página \d+ ---$)', re.MULTILINE)
+_PARAGRAPH_PATTERN = re.compile(r'\n\s*\n')
+
+# Caché de índices por curso: course_id -> (content_version, índice)
+_index_cache = None
+
+
+def strip_accents(text: str) -> str:
+    """Elimina tildes y diéresis de un texto (á -> a, ü -> u, ñ -> n)."""
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def _strip_plural(word: str) -> str:
+    """
+    Quita la marca de plural: -s tras vocal (pruebas -> prueba) y -es tras
+    consonante (profesores -> profesor, naciones -> nacion).
+    """
+    if len(word) - 2 >= 3 and word.endswith('es') and word[-3] not in _VOWELS:
+        return word[:-2]
+    if len(word) - 1 >= 3 and word.endswith('s') and word[-2] in _VOWELS:
+        return word[:-1]
+    return word
+
+
+def stem_spanish(word: str) -> str:
+    """
+    Stemming liviano para español basado en sufijos.
+
+    Se quita primero el plural y después el primer sufijo que calce (de más
+    largo a más corto), de modo que el singular y el plural de una palabra
+    producen la misma raíz:
+
+    >>> [stem_spanish(w) for w in ('prueba', 'pruebas')]
+    ['prueb', 'prueb']
+    >>> [stem_spanish(w) for w in ('libro', 'libros', 'celula', 'celulas')]
+    ['libr', 'libr', 'celul', 'celul']
+    >>> [stem_spanish(w) for w in ('clase', 'clases', 'profesor', 'profesores')]
+    ['clas', 'clas', 'profesor', 'profesor']
+    >>> [stem_spanish(w) for w in ('informacion', 'informaciones')]
+    ['inform', 'inform']
+
+    Args:
+        word: Palabra normalizada (minúsculas y sin tildes)
+
+    Returns:
+        str: Raíz aproximada de la palabra
+    """
+    word = _strip_plural(word)
+    for suffix in _SPANISH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """
+    Normaliza y tokeniza un texto en términos indexables.
+
+    Args:
+        text: Texto libre (pregunta o contenido de archivo)
+
+    Returns:
+        list: Términos normalizados, sin stopwords y con stemming
+    """
+    if not text:
+        return []
+
+    normalized = strip_accents(text.lower())
+    return [
+        stem_spanish(token)
+        for token in _TOKEN_PATTERN.findall(normalized)
+        if token not in SPANISH_STOPWORDS and len(token) > 1
+    ]
+
+
+def split_into_chunks(text: str, max_tokens: int) -> list:
+    """
+    Divide un texto en fragmentos por página y párrafo.
+
+    Los párrafos consecutivos se agrupan hasta alcanzar max_tokens; los
+    párrafos que por sí solos superan el límite se cortan.
+
+    Args:
+        text: Contenido parseado del archivo
+        max_tokens: Tamaño máximo aproximado de cada fragmento
+
+    Returns:
+        list: Fragmentos de texto no vacíos
+    """
+    if not text:
+        return []
+
+    chunks = []
+
+    for page in _PAGE_PATTERN.split(text):
+        current = []
+        current_tokens = 0
+
+        for paragraph in _PARAGRAPH_PATTERN.split(page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+
+            paragraph_tokens = estimate_token_count(paragraph)
+
+            if current and current_tokens + paragraph_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current = []
+                current_tokens = 0
+
+            # Párrafos gigantes (ej: planillas) se cortan en bloques del tamaño máximo
+            while paragraph_tokens > max_tokens:
+                max_chars = max_tokens * 4
+                chunks.append(paragraph[:max_chars])
+                paragraph = paragraph[max_chars:]
+                paragraph_tokens = estimate_token_count(paragraph)
+
+            if paragraph:
+                current.append(paragraph)
+                current_tokens += paragraph_tokens
+
+        if current:
+            chunks.append("\n\n".join(current))
+
+    return chunks
+
+
+class BM25Index:
+    """Índice invertido BM25 en memoria sobre los fragmentos de un curso."""
+
+    def __init__(self, documents, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents: Iterable de tuplas (IndexedChunk, lista_de_términos)
+            k1: Saturación de frecuencia de términos
+            b: Normalización por largo del documento
+        """
+        self.k1 = k1
+        self.b = b
+        self.chunks = []
+        self.doc_lengths = []
+        self.postings = defaultdict(list)  # término -> [(índice_doc, frecuencia)]
+
+        for chunk, terms in documents:
+            doc_index = len(self.chunks)
+            self.chunks.append(chunk)
+            self.doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings[term].append((doc_index, frequency))
+
+        total_length = sum(self.doc_lengths)
+        self.avg_doc_length = (total_length / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query_terms: list, top_k: int) -> list:
+        """
+        Busca los fragmentos más relevantes para los términos de la consulta.
+
+        Args:
+            query_terms: Términos normalizados de la pregunta
+            top_k: Cantidad máxima de resultados
+
+        Returns:
+            list: Tuplas (IndexedChunk, puntaje) ordenadas por puntaje descendente
+        """
+        if not self.chunks or not query_terms:
+            return []
+
+        total_docs = len(self.chunks)
+        scores = defaultdict(float)
+
+        for term in set(query_terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            doc_freq = len(postings)
+            idf = math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+            for doc_index, frequency in postings:
+                length_ratio = self.doc_lengths[doc_index] / self.avg_doc_length if self.avg_doc_length else 0
+                denominator = frequency + self.k1 * (1 - self.b + self.b * length_ratio)
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / denominator
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.chunks[doc_index], score) for doc_index, score in ranked]
+
+
+def index_course_file(course_file: CourseFile, max_tokens: int = None) -> int:
+    """
+    (Re)genera los fragmentos indexables de un archivo a partir de su parsed_content.
+
+    No hace commit: los fragmentos quedan en la sesión junto al archivo y el
+    content_version del curso se incrementa en la misma transacción.
+
+    Args:
+        course_file: Archivo del curso ya parseado
+        max_tokens: Tamaño máximo de cada fragmento (default del config)
+
+    Returns:
+        int: Cantidad de fragmentos generados
+    """
+    if max_tokens is None:
+        max_tokens = current_app.config.get('RETRIEVAL_CHUNK_TOKENS', 400)
+
+    course_file.chunks = []
+
+    # Los índices en memoria se identifican por la versión de contenido del curso
+    bump_content_version(Course.id == course_file.course_id)
+
+    for position, content in enumerate(split_into_chunks(course_file.parsed_content, max_tokens)):
+        course_file.chunks.append(CourseFileChunk(
+            course_id=course_file.course_id,
+            position=position,
+            content=content,
+            token_count=estimate_token_count(content),
+            terms=" ".join(tokenize(content))
+        ))
+
+    return len(course_file.chunks)
+
+
+def get_course_index(course: Course) -> BM25Index:
+    """
+    Obtiene el índice BM25 de un curso para su content_version actual.
+
+    Cualquier cambio en los fragmentos incrementa el content_version del curso,
+    por lo que un índice en caché con la misma versión sigue siendo válido y
+    no requiere consultas.
+
+    Args:
+        course: Curso
+
+    Returns:
+        BM25Index: Índice del curso (vacío si no tiene fragmentos)
+    """
+    global _index_cache
+    if _index_cache is None:
+        _index_cache = LRUCache(max_entries=current_app.config.get('RETRIEVAL_INDEX_CACHE_SIZE', 64))
+
+    version = course.content_version or 1
+    cached = _index_cache.get(course.id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    rows = db.session.query(
+        CourseFileChunk.id,
+        CourseFileChunk.course_file_id,
+        CourseFile.filename,
+        CourseFileChunk.position,
+        CourseFileChunk.content,
+        CourseFileChunk.token_count,
+        CourseFileChunk.terms
+    ).join(CourseFile, CourseFile.id == CourseFileChunk.course_file_id).filter(
+        CourseFileChunk.course_id == course.id
+    ).order_by(CourseFile.uploaded_at.desc(), CourseFileChunk.position).all()
+
+    index = BM25Index(
+        (IndexedChunk(*row[:6]), (row.terms or "").split())
+        for row in rows
+    )
+
+    _index_cache.set(course.id, (version, index))
+    return index
+
+
+def retrieve_relevant_chunks(course: Course, query: str, max_tokens: int = None, top_k: int = None):
+    """
+    Selecciona los fragmentos más relevantes para una pregunta dentro de un presupuesto.
+
+    Args:
+        course: Curso
+        query: Pregunta del usuario
+        max_tokens: Presupuesto de tokens para el contexto (default del config)
+        top_k: Cantidad máxima de fragmentos (default del config)
+
+    Returns:
+        list | None: Fragmentos seleccionados (IndexedChunk) en orden de relevancia,
+        o None si el curso aún no tiene fragmentos indexados
+    """
+    if max_tokens is None:
+        max_tokens = current_app.config.get('RETRIEVAL_MAX_CONTEXT_TOKENS', 4000)
+    if top_k is None:
+        top_k = current_app.config.get('RETRIEVAL_TOP_K', 8)
+
+    index = get_course_index(course)
+    if not len(index):
+        return None
+
+    selected = []
+    total_tokens = 0
+
+    for chunk, _score in index.search(tokenize(query), top_k):
+        if total_tokens + chunk.token_count > max_tokens:
+            remaining_tokens = max_tokens - total_tokens
+            if remaining_tokens > 200 and not selected:
+                # Al menos un fragmento, aunque haya que truncarlo
+                selected.append(chunk._replace(
+                    content=truncate_text(chunk.content, remaining_tokens),
+                    token_count=remaining_tokens
+                ))
+                total_tokens = max_tokens
+            continue
+
+        selected.append(chunk)
+        total_tokens += chunk.token_count
+
+    return selected
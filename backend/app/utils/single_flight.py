@@ -0,0 +1,210 @@
+"""
+MÓDULO: COALESCENCIA DE LLAMADAS IDÉNTICAS (SINGLE-FLIGHT)
+===========================================================
+
+Cuando llegan varias peticiones idénticas al mismo tiempo (ej: 40
+estudiantes envían la misma pregunta en clase), solo la primera (líder)
+llama al LLM; las demás (seguidoras) esperan y reciben el mismo resultado.
+
+- Respuesta completa: las seguidoras esperan a que termine la llamada del
+  líder y reciben su resultado (o su error).
+- Streaming: el stream del líder se consume en un thread aparte que guarda
+  los fragmentos; cada petición (líder incluido) los lee desde el inicio a
+  medida que llegan. Las peticiones que llegan mientras el stream sigue
+  activo también se unen.
+
+La coalescencia es por proceso: con varios workers, cada uno hace como
+máximo una llamada por clave.
+"""
+
+import threading
+
+from flask import current_app
+
+
+class SingleFlightTimeout(Exception):
+    """La llamada del líder no terminó dentro del tiempo de espera."""
+
+    retryable = True
+
+
+class _Call:
+    """Llamada en curso compartida por el líder y sus seguidoras."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class _SharedStream:
+    """Fragmentos de un stream compartido, llenados por un thread y leídos por varias peticiones."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.chunks = []
+        self.usage = None
+        self.error = None
+        self.finished = False
+        self._condition = threading.Condition()
+
+    def pump(self, upstream) -> None:
+        """Consume el stream del proveedor guardando cada fragmento."""
+        try:
+            for text in upstream:
+                with self._condition:
+                    self.chunks.append(text)
+                    self._condition.notify_all()
+            self.usage = upstream.usage
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._condition:
+                self.finished = True
+                self._condition.notify_all()
+
+    def reader(self, timeout: float):
+        """Generador con todos los fragmentos desde el inicio, esperando los que falten."""
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self.chunks) and not self.finished:
+                    if not self._condition.wait(timeout):
+                        raise SingleFlightTimeout("El stream compartido dejó de recibir fragmentos")
+
+                if index < len(self.chunks):
+                    text = self.chunks[index]
+                    index += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+
+            yield text
+
+
+class SingleFlight:
+    """Registro de llamadas en curso por clave."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0, "errors": 0}
+
+    def _join(self, key) -> tuple:
+        """Retorna (call, es_lider) registrando la llamada si no existe."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                return call, True
+
+            call.followers += 1
+            self._stats["followers"] += 1
+            return call, False
+
+    def _release(self, key, call: _Call) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def _wait(self, call: _Call, timeout: float):
+        if not call.done.wait(timeout):
+            raise SingleFlightTimeout("La llamada compartida no terminó a tiempo")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn, timeout: float = None) -> tuple:
+        """
+        Ejecuta fn() una sola vez por clave entre las peticiones concurrentes.
+
+        Args:
+            key: Clave hashable de la llamada
+            fn: Función sin argumentos que hace la llamada
+            timeout: Segundos máximos de espera para las seguidoras
+
+        Returns:
+            tuple: (resultado, coalesced) donde coalesced es True si se reutilizó
+                   el resultado de otra petición
+
+        Raises:
+            SingleFlightTimeout: Si el líder no terminó a tiempo
+            Exception: El error del líder, si falló
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self._wait(call, timeout), True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            self._count("errors")
+            raise
+        finally:
+            self._release(key, call)
+            call.done.set()
+
+        return call.result, False
+
+    def stream(self, key, start, timeout: float = None) -> tuple:
+        """
+        Comparte un stream entre las peticiones concurrentes con la misma clave.
+
+        Args:
+            key: Clave hashable de la llamada
+            start: Función sin argumentos que inicia el stream (retorna un LLMStream)
+            timeout: Segundos máximos de espera entre fragmentos
+
+        Returns:
+            tuple: (_SharedStream, coalesced)
+
+        Raises:
+            SingleFlightTimeout: Si el líder no inició el stream a tiempo
+            Exception: El error del líder al iniciar el stream
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self._wait(call, timeout), True
+
+        try:
+            upstream = start()
+            shared = _SharedStream(upstream.model)
+        except Exception as e:
+            call.error = e
+            self._count("errors")
+            self._release(key, call)
+            call.done.set()
+            raise
+
+        app = current_app._get_current_object()
+
+        def pump():
+            # La clave se libera al terminar el stream: quien llegue antes se une
+            with app.app_context():
+                try:
+                    shared.pump(upstream)
+                finally:
+                    self._release(key, call)
+
+        threading.Thread(target=pump, name='single-flight-stream', daemon=True).start()
+
+        call.result = shared
+        call.done.set()
+        return shared, False
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._stats[field] += 1
+
+    def stats(self) -> dict:
+        """Métricas de coalescencia del proceso."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+# Llamadas al LLM del chat de cursos
+chat_flights = SingleFlight()
@@ -0,0 +1,384 @@
+"""
+MÓDULO: CUOTAS DE TOKENS DEL CHATBOT
+=====================================
+
+Limita cuántos tokens del LLM puede consumir cada usuario, curso e
+institución por día y por mes (TOKEN_QUOTA_*; 0 = sin límite). A diferencia
+del rate limiter por IP, la cuota es por identidad (los estudiantes detrás
+del NAT del colegio no comparten cupo) y pondera cada llamada por sus tokens
+reales (una pregunta con 30k tokens de contexto cuesta más que un "hola").
+
+- Antes de llamar al LLM se verifica que ningún ámbito haya agotado su
+  cuota; si alguno la agotó se responde 429 indicando cuándo se reinicia.
+- Después de la llamada se registra el uso real reportado por el proveedor
+  (usage metadata) en el ledger `token_usage` y se suma a los totales de
+  `token_usage_rollups` (un total por ámbito y período, actualizado con un
+  upsert atómico para que varios workers vean el mismo consumo). La
+  escritura se hace en lote desde un thread cada TOKEN_USAGE_FLUSH_SECONDS,
+  por lo que los totales pueden ir hasta ese tiempo atrasados.
+- `flask rollup-token-usage` recalcula los totales a partir del ledger y
+  elimina los registros más antiguos que TOKEN_LEDGER_RETENTION_DAYS.
+
+Los períodos son días y meses calendario en UTC. Una llamada puede exceder
+la cuota en sus propios tokens (el costo se conoce al terminar); la
+siguiente ya se rechaza. Los administradores no tienen cuota, pero su uso
+se registra igual.
+"""
+
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, func, or_
+
+from .. import db
+from ..exceptions import QuotaExceededError
+from ..models import TokenUsage, TokenUsageRollup
+from .buffered_writer import BufferedWriter
+
+SCOPES = (TokenUsageRollup.SCOPE_USER, TokenUsageRollup.SCOPE_COURSE, TokenUsageRollup.SCOPE_INSTITUTION)
+PERIODS = (TokenUsageRollup.PERIOD_DAY, TokenUsageRollup.PERIOD_MONTH)
+
+SCOPE_LABELS = {
+    TokenUsageRollup.SCOPE_USER: "tu cuota {period}",
+    TokenUsageRollup.SCOPE_COURSE: "la cuota {period} del curso",
+    TokenUsageRollup.SCOPE_INSTITUTION: "la cuota {period} de la institución",
+}
+PERIOD_LABELS = {
+    TokenUsageRollup.PERIOD_DAY: "diaria",
+    TokenUsageRollup.PERIOD_MONTH: "mensual",
+}
+
+
+
+def quota_limits() -> dict:
+    """Límites configurados: {(ámbito, período): tokens}, solo los distintos de 0."""
+    limits = {}
+    for scope in SCOPES:
+        for period, suffix in ((TokenUsageRollup.PERIOD_DAY, 'DAILY'), (TokenUsageRollup.PERIOD_MONTH, 'MONTHLY')):
+            limit = current_app.config.get(f'TOKEN_QUOTA_{scope.upper()}_{suffix}', 0)
+            if limit:
+                limits[(scope, period)] = limit
+    return limits
+
+
+def period_start(period: str, now: datetime) -> date:
+    """Inicio del día o del mes que contiene `now`."""
+    if period == TokenUsageRollup.PERIOD_DAY:
+        return now.date()
+    return now.date().replace(day=1)
+
+
+def period_reset(period: str, start: date) -> datetime:
+    """Momento en que se reinicia el período que comienza en `start`."""
+    if period == TokenUsageRollup.PERIOD_DAY:
+        return datetime.combine(start + timedelta(days=1), datetime.min.time())
+
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return datetime.combine(next_month, datetime.min.time())
+
+
+def _scope_ids(user_id: int, course) -> dict:
+    return {
+        TokenUsageRollup.SCOPE_USER: user_id,
+        TokenUsageRollup.SCOPE_COURSE: course.id,
+        TokenUsageRollup.SCOPE_INSTITUTION: course.institution_id,
+    }
+
+
+def _current_totals(scope_ids: dict, now: datetime, keys) -> dict:
+    """Tokens consumidos en los períodos actuales: {(ámbito, período): tokens} (una consulta)."""
+    conditions = [
+        and_(
+            TokenUsageRollup.scope == scope,
+            TokenUsageRollup.scope_id == scope_ids[scope],
+            TokenUsageRollup.period == period,
+            TokenUsageRollup.period_start == period_start(period, now)
+        )
+        for scope, period in keys
+    ]
+
+    rows = db.session.query(
+        TokenUsageRollup.scope,
+        TokenUsageRollup.period,
+        TokenUsageRollup.total_tokens
+    ).filter(or_(*conditions)).all()
+
+    return {(row.scope, row.period): row.total_tokens for row in rows}
+
+
+def check_token_quota(user, course) -> None:
+    """
+    Verifica que el usuario, el curso y su institución tengan cuota disponible.
+
+    Args:
+        user: Usuario que envía el mensaje
+        course: Curso del chat
+
+    Raises:
+        QuotaExceededError: Si algún ámbito agotó su cuota del día o del mes
+    """
+    limits = quota_limits()
+    if not limits or user.is_admin():
+        return
+
+    now = datetime.utcnow()
+    totals = _current_totals(_scope_ids(user.id, course), now, limits)
+
+    # Si hay varias cuotas agotadas se informa la que se reinicia más tarde
+    exceeded = None
+    for (scope, period), limit in limits.items():
+        used = totals.get((scope, period), 0)
+        if used < limit:
+            continue
+
+        reset_at = period_reset(period, period_start(period, now))
+        if exceeded is None or reset_at > exceeded["reset_at"]:
+            exceeded = {"scope": scope, "period": period, "limit": limit, "used": used, "reset_at": reset_at}
+
+    if exceeded is None:
+        return
+
+    reset_at = exceeded.pop("reset_at")
+    raise QuotaExceededError(
+        f"Se agotó {SCOPE_LABELS[exceeded['scope']].format(period=PERIOD_LABELS[exceeded['period']])} del chatbot. "
+        f"Se reinicia el {reset_at.strftime('%d-%m-%Y a las %H:%M')} (UTC)",
+        reset_at=reset_at,
+        retry_after=int((reset_at - now).total_seconds()) + 1,
+        details=exceeded
+    )
+
+
+def _upsert_rollup(connection, key: dict, increments: dict) -> None:
+    """Suma el uso a un total (lo crea si no existe) de forma atómica entre workers."""
+    table = TokenUsageRollup.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        statement = insert(table).values(**key, **increments)
+        statement = statement.on_conflict_do_update(
+            index_elements=['scope', 'scope_id', 'period', 'period_start'],
+            set_={column: table.c[column] + statement.excluded[column] for column in increments}
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+
+        statement = insert(table).values(**key, **increments)
+        statement = statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in increments}
+        )
+    else:
+        updated = connection.execute(
+            table.update()
+            .where(*(table.c[column] == value for column, value in key.items()))
+            .values({column: table.c[column] + value for column, value in increments.items()})
+        )
+        if updated.rowcount:
+            return
+        statement = table.insert().values(**key, **increments)
+
+    connection.execute(statement)
+
+
+def record_token_usage(user_id: int, course, model: str, usage: dict) -> None:
+    """
+    Registra los tokens consumidos por una llamada al LLM.
+
+    El registro queda en un buffer del proceso que un thread escribe en lote
+    cada TOKEN_USAGE_FLUSH_SECONDS, fuera del request (con 0 se escribe de
+    inmediato). Así el request no necesita una segunda conexión a la base de
+    datos mientras espera al LLM.
+
+    Args:
+        user_id: ID del usuario al que se cobra la llamada
+        course: Curso del chat
+        model: Modelo que respondió
+        usage: Uso de tokens reportado por el proveedor
+    """
+    if not usage or not usage.get("total_tokens"):
+        return
+
+    entry = {
+        "user_id": user_id,
+        "course_id": course.id,
+        "institution_id": course.institution_id,
+        "model": model,
+        "prompt_tokens": usage.get("prompt_tokens", 0) or 0,
+        "output_tokens": usage.get("output_tokens", 0) or 0,
+        "total_tokens": usage["total_tokens"],
+        "created_at": datetime.utcnow(),
+    }
+
+    _usage_writer.add(entry)
+
+
+def flush_token_usage() -> int:
+    """Escribe de inmediato los registros de uso pendientes (ej: antes de terminar un script)."""
+    return _usage_writer.flush()
+
+
+def _write_usage(entries: list) -> None:
+    """Inserta los registros en el ledger y suma sus totales en una transacción propia."""
+    totals = {}
+    for entry in entries:
+        created_at = entry["created_at"]
+        for scope, scope_id in (
+            (TokenUsageRollup.SCOPE_USER, entry["user_id"]),
+            (TokenUsageRollup.SCOPE_COURSE, entry["course_id"]),
+            (TokenUsageRollup.SCOPE_INSTITUTION, entry["institution_id"]),
+        ):
+            for period in PERIODS:
+                key = (scope, scope_id, period, period_start(period, created_at))
+                increments = totals.setdefault(key, dict.fromkeys(
+                    ("requests", "prompt_tokens", "output_tokens", "total_tokens"), 0
+                ))
+                increments["requests"] += 1
+                increments["prompt_tokens"] += entry["prompt_tokens"]
+                increments["output_tokens"] += entry["output_tokens"]
+                increments["total_tokens"] += entry["total_tokens"]
+
+    with db.engine.begin() as connection:
+        connection.execute(TokenUsage.__table__.insert(), entries)
+        for (scope, scope_id, period, start), increments in totals.items():
+            _upsert_rollup(connection, {
+                "scope": scope,
+                "scope_id": scope_id,
+                "period": period,
+                "period_start": start,
+            }, increments)
+
+
+# Registros de uso pendientes de escribir (ver record_token_usage)
+_usage_writer = BufferedWriter(
+    'token-usage',
+    _write_usage,
+    flush_seconds_key='TOKEN_USAGE_FLUSH_SECONDS',
+    max_entries_key='TOKEN_USAGE_BUFFER_MAX'
+)
+
+
+def token_quota_status(user, course) -> dict:
+    """
+    Consumo y límites actuales del usuario, el curso y su institución.
+
+    Returns:
+        dict: {ámbito: {período: {used, limit, remaining, reset_at}}}
+    """
+    now = datetime.utcnow()
+    limits = quota_limits()
+    keys = [(scope, period) for scope in SCOPES for period in PERIODS]
+    totals = _current_totals(_scope_ids(user.id, course), now, keys)
+
+    status = {}
+    for scope, period in keys:
+        limit = limits.get((scope, period))
+        used = totals.get((scope, period), 0)
+        status.setdefault(scope, {})[period] = {
+            "used": used,
+            "limit": limit,
+            "remaining": max(limit - used, 0) if limit else None,
+            "reset_at": period_reset(period, period_start(period, now)).isoformat()
+        }
+
+    status["exempt"] = user.is_admin()
+    return status
+
+
+def rollup_token_usage(retention_days: int = None) -> dict:
+    """
+    Recalcula los totales de los períodos cerrados desde el ledger y elimina los registros antiguos.
+
+    Solo se recalculan los días y meses ya terminados que el ledger cubre
+    completos (desde el primer registro); el día y el mes en curso se siguen
+    sumando en línea. Hace commit.
+
+    Args:
+        retention_days: Días de ledger a conservar (por defecto TOKEN_LEDGER_RETENTION_DAYS)
+
+    Returns:
+        dict: Cantidad de totales recalculados y de registros eliminados
+    """
+    if retention_days is None:
+        retention_days = current_app.config.get('TOKEN_LEDGER_RETENTION_DAYS', 90)
+
+    now = datetime.utcnow()
+    oldest = db.session.query(func.min(TokenUsage.created_at)).scalar()
+    rebuilt = 0
+
+    if oldest is not None:
+        # Primer día y primer mes completos en el ledger, y el primero aún abierto
+        bounds = {
+            TokenUsageRollup.PERIOD_DAY: (oldest.date(), period_start(TokenUsageRollup.PERIOD_DAY, now)),
+            TokenUsageRollup.PERIOD_MONTH: (
+                oldest.date() if oldest.day == 1 else period_reset(TokenUsageRollup.PERIOD_MONTH, oldest.date()).date(),
+                period_start(TokenUsageRollup.PERIOD_MONTH, now)
+            ),
+        }
+        first_day = min(first for first, _ in bounds.values())
+        scope_columns = {
+            TokenUsageRollup.SCOPE_USER: TokenUsage.user_id,
+            TokenUsageRollup.SCOPE_COURSE: TokenUsage.course_id,
+            TokenUsageRollup.SCOPE_INSTITUTION: TokenUsage.institution_id,
+        }
+
+        # Totales por ámbito y día (una consulta agrupada por ámbito); los meses se suman en Python
+        totals = {period: {} for period in PERIODS}
+        for scope, column in scope_columns.items():
+            day = func.date(TokenUsage.created_at)
+            grouped = db.session.query(
+                column,
+                day,
+                func.count(TokenUsage.id),
+                func.coalesce(func.sum(TokenUsage.prompt_tokens), 0),
+                func.coalesce(func.sum(TokenUsage.output_tokens), 0),
+                func.coalesce(func.sum(TokenUsage.total_tokens), 0)
+            ).filter(
+                TokenUsage.created_at >= datetime.combine(first_day, datetime.min.time()),
+                TokenUsage.created_at < datetime.combine(bounds[TokenUsageRollup.PERIOD_DAY][1], datetime.min.time())
+            ).group_by(column, day).all()
+
+            for scope_id, day_value, *values in grouped:
+                day_value = day_value if isinstance(day_value, date) else date.fromisoformat(str(day_value))
+                for period in PERIODS:
+                    start = period_start(period, datetime.combine(day_value, datetime.min.time()))
+                    first, current = bounds[period]
+                    if not first <= start < current:
+                        continue
+                    previous = totals[period].get((scope, scope_id, start), (0, 0, 0, 0))
+                    totals[period][(scope, scope_id, start)] = tuple(a + b for a, b in zip(previous, values))
+
+        for period, period_totals in totals.items():
+            first, current = bounds[period]
+            existing = TokenUsageRollup.query.filter(
+                TokenUsageRollup.period == period,
+                TokenUsageRollup.period_start >= first,
+                TokenUsageRollup.period_start < current
+            ).all()
+            existing_by_key = {(row.scope, row.scope_id, row.period_start): row for row in existing}
+
+            for key, (requests, prompt_tokens, output_tokens, total_tokens) in period_totals.items():
+                row = existing_by_key.pop(key, None)
+                if row is None:
+                    row = TokenUsageRollup(scope=key[0], scope_id=key[1], period=period, period_start=key[2])
+                    db.session.add(row)
+                row.requests = requests
+                row.prompt_tokens = prompt_tokens
+                row.output_tokens = output_tokens
+                row.total_tokens = total_tokens
+                rebuilt += 1
+
+            # Totales sin respaldo en el ledger
+            for row in existing_by_key.values():
+                db.session.delete(row)
+
+    # Se borran días completos: si quedara parte del primer día, la próxima
+    # ejecución lo recalcularía (y sus meses) con el ledger incompleto
+    cutoff = datetime.combine((now - timedelta(days=retention_days)).date(), datetime.min.time())
+    deleted = TokenUsage.query.filter(TokenUsage.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+
+    return {"rollups": rebuilt, "ledger_deleted": deleted}
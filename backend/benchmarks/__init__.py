@@ -0,0 +1,6 @@
+"""
+Benchmarks del backend.
+
+Se ejecutan como módulos desde la carpeta backend, por ejemplo:
+    python -m benchmarks.chat_load --help
+"""
@@ -0,0 +1,446 @@
+"""
+MÓDULO: PRUEBA DE CARGA DEL CHAT
+=================================
+
+Puebla una base de datos de prueba a la escala indicada (instituciones,
+cursos, archivos parseados y estudiantes) y envía requests concurrentes a
+POST /api/courses/<id>/chat y GET /api/courses/<id>/chat/context.
+
+Las llamadas al LLM usan el proveedor local 'fake' (sin red), con latencia
+y velocidad configurables, de modo que lo medido es el costo propio del
+backend: armado del prompt, recuperación de fragmentos, consultas SQL y
+serialización.
+
+Reporte:
+- Latencia p50/p95/p99 y throughput por endpoint
+- Consultas SQL por request
+- Distribución del tamaño del prompt enviado al LLM (sistema + último mensaje)
+
+Uso (desde la carpeta backend):
+    python -m benchmarks.chat_load
+    python -m benchmarks.chat_load --institutions 5 --courses 6 --files 8 --requests 2000 --concurrency 32
+    python -m benchmarks.chat_load --max-p95-ms 150 --max-queries 15   # exit 1 si se excede
+
+Por defecto usa una base SQLite temporal; con --database-url se puede
+apuntar a una base MySQL vacía creada para el benchmark.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import QueryCounter, distribution
+
+# Vocabulario con el que se generan los materiales y las preguntas
+TOPICS = {
+    "Matemáticas": ["ecuación", "función", "derivada", "integral", "fracción", "geometría",
+                    "probabilidad", "estadística", "logaritmo", "polinomio", "vector", "matriz"],
+    "Biología": ["célula", "fotosíntesis", "mitosis", "ecosistema", "proteína", "genética",
+                 "evolución", "bacteria", "enzima", "cromosoma", "respiración", "tejido"],
+    "Historia": ["revolución", "independencia", "república", "constitución", "guerra", "tratado",
+                 "imperio", "colonia", "democracia", "dictadura", "reforma", "ciudadanía"],
+    "Lenguaje": ["ensayo", "argumento", "narrador", "metáfora", "poema", "novela",
+                 "párrafo", "tesis", "conector", "género", "lector", "sintaxis"],
+}
+
+FILLER = ["el", "la", "de", "en", "que", "se", "los", "un", "una", "para", "con", "por",
+          "como", "muy", "también", "proceso", "ejemplo", "unidad", "clase", "prueba"]
+
+QUESTION_TEMPLATES = [
+    "¿Qué es {0}?",
+    "Explícame la relación entre {0} y {1}",
+    "Resume la unidad sobre {0}",
+    "¿Cuándo es la prueba de {0}?",
+    "Dame un ejemplo de {0} con {1}",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de los endpoints del chat")
+
+    scale = parser.add_argument_group("escala de la base de prueba")
+    scale.add_argument("--institutions", type=int, default=2)
+    scale.add_argument("--courses", type=int, default=4, help="Cursos por institución")
+    scale.add_argument("--files", type=int, default=5, help="Archivos parseados por curso")
+    scale.add_argument("--file-kb", type=int, default=40, help="Tamaño del texto de cada archivo (KB)")
+    scale.add_argument("--students", type=int, default=5, help="Estudiantes por curso")
+    scale.add_argument("--database-url", default=None,
+                       help="Base de datos a usar (por defecto SQLite temporal; debe estar vacía)")
+
+    load = parser.add_argument_group("carga")
+    load.add_argument("--requests", type=int, default=500, help="Requests medidos")
+    load.add_argument("--concurrency", type=int, default=8, help="Threads enviando requests")
+    load.add_argument("--context-ratio", type=float, default=0.2,
+                      help="Fracción de requests a /chat/context (el resto va a /chat)")
+    load.add_argument("--warmup", type=int, default=None,
+                      help="Requests de calentamiento sin medir (por defecto, uno por curso)")
+    load.add_argument("--seed", type=int, default=42)
+    load.add_argument("--answer-cache", action="store_true",
+                      help="Habilitar la caché de respuestas (por defecto se desactiva para medir el armado del prompt)")
+
+    llm = parser.add_argument_group("LLM simulado")
+    llm.add_argument("--llm-latency-ms", type=float, default=0, help="Latencia hasta el primer token")
+    llm.add_argument("--llm-tokens-per-second", type=float, default=1_000_000)
+    llm.add_argument("--llm-output-tokens", type=int, default=200)
+
+    budgets = parser.add_argument_group("presupuestos (exit 1 si se exceden)")
+    budgets.add_argument("--max-p95-ms", type=float, default=None, help="p95 máximo de /chat")
+    budgets.add_argument("--max-queries", type=float, default=None, help="Consultas SQL p95 máximas por request")
+    budgets.add_argument("--max-error-rate", type=float, default=0.0)
+
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar el reporte en un archivo JSON")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, workdir: str) -> None:
+    """Configura la app por variables de entorno (se leen al importar app.config)."""
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_FAKE_LATENCY_JITTER_MS"] = "0"
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+    os.environ["LLM_FAKE_OUTPUT_TOKENS"] = str(args.llm_output_tokens)
+    os.environ["LLM_FAKE_SEED"] = str(args.seed)
+    os.environ["ANSWER_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+    os.environ["PARSE_QUEUE_MODE"] = "worker"  # Los archivos se cargan ya parseados
+    os.environ["PARSER_POOL_SIZE"] = "0"
+    # La cuota se verifica en cada request, pero con un límite que no se alcanza
+    os.environ["TOKEN_QUOTA_USER_DAILY"] = str(10 ** 12)
+    os.environ["TOKEN_QUOTA_USER_MONTHLY"] = str(10 ** 12)
+
+
+def generate_text(rng: random.Random, words: list, size_bytes: int) -> str:
+    """Genera párrafos pseudoaleatorios con el vocabulario de un tema."""
+    paragraphs = []
+    length = 0
+    while length < size_bytes:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            sentence = [rng.choice(words if rng.random() < 0.3 else FILLER) for _ in range(rng.randint(8, 16))]
+            sentences.append(" ".join(sentence).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def seed_benchmark_data(args, rng: random.Random) -> list:
+    """
+    Puebla la base con la escala pedida.
+
+    Returns:
+        list: [(course_id, tema, [access_token, ...]), ...]
+    """
+    from flask_jwt_extended import create_access_token
+
+    from app import db
+    from app.models import Course, CourseFile, Grade, Institution, User, UserCourse
+    from app.utils.course_stats import refresh_course_parse_stats
+    from app.utils.parser_pool import OUTCOME_OK, current_parser_version
+    from app.utils.retrieval import index_course_file
+
+    db.create_all()
+    if Course.query.first() is not None:
+        raise SystemExit("La base de datos del benchmark debe estar vacía")
+
+    grade = Grade(name="4to Medio", order=12)
+    admin = User(rut="bench-admin", username="bench-admin", email="admin@bench.cl", region="RM",
+                 comuna="Santiago", password_hash="!", role="admin")
+    db.session.add_all([grade, admin])
+    db.session.flush()
+
+    topic_names = list(TOPICS)
+    parser_version = current_parser_version()
+    courses = []
+    user_counter = 0
+
+    for inst_index in range(args.institutions):
+        institution = Institution(nombre=f"Institución Benchmark {inst_index + 1}")
+        db.session.add(institution)
+        db.session.flush()
+
+        for course_index in range(args.courses):
+            topic = topic_names[(inst_index * args.courses + course_index) % len(topic_names)]
+            course = Course(
+                nombre=f"{topic} {inst_index + 1}-{course_index + 1}",
+                prompt=f"Eres el asistente del curso de {topic}. Responde de forma breve y clara.",
+                institution_id=institution.id,
+                grade_id=grade.id
+            )
+            db.session.add(course)
+            db.session.flush()
+
+            for file_index in range(args.files):
+                text = generate_text(rng, TOPICS[topic], args.file_kb * 1024)
+                course_file = CourseFile(
+                    course_id=course.id,
+                    filename=f"unidad_{file_index + 1}.txt",
+                    filepath=f"bench/{course.id}/unidad_{file_index + 1}.txt",
+                    filesize=len(text.encode("utf-8")),
+                    mimetype="text/plain",
+                    uploaded_by=admin.id,
+                    parse_outcome=OUTCOME_OK,
+                    parser_version=parser_version
+                )
+                course_file.parsed_content = text
+                db.session.add(course_file)
+                db.session.flush()
+                index_course_file(course_file)
+
+            refresh_course_parse_stats(course.id)
+
+            tokens = []
+            for _ in range(args.students):
+                user_counter += 1
+                student = User(
+                    rut=f"bench-{user_counter}",
+                    username=f"bench-student-{user_counter}",
+                    email=f"student{user_counter}@bench.cl",
+                    region="RM",
+                    comuna="Santiago",
+                    password_hash="!",
+                    role="student",
+                    institution_id=institution.id,
+                    grade_id=grade.id
+                )
+                db.session.add(student)
+                db.session.flush()
+                db.session.add(UserCourse(user_id=student.id, course_id=course.id, year=2025,
+                                          role_in_course="student"))
+                tokens.append(create_access_token(identity=str(student.id)))
+
+            courses.append((course.id, topic, tokens))
+
+        db.session.commit()
+
+    return courses
+
+
+def build_plan(courses: list, count: int, context_ratio: float, rng: random.Random) -> list:
+    """Lista de requests a enviar: (endpoint, course_id, token, pregunta)."""
+    plan = []
+    for _ in range(count):
+        course_id, topic, tokens = rng.choice(courses)
+        if rng.random() < context_ratio:
+            plan.append(("context", course_id, rng.choice(tokens), None))
+        else:
+            words = rng.sample(TOPICS[topic], 2)
+            plan.append(("chat", course_id, rng.choice(tokens), rng.choice(QUESTION_TEMPLATES).format(*words)))
+    return plan
+
+
+class RecordingProvider:
+    """Envuelve el proveedor de LLM para registrar el tamaño del prompt de cada request."""
+
+    def __init__(self, provider):
+        self._provider = provider
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._provider, name)
+
+    def reset(self) -> None:
+        self._local.prompt_chars = None
+
+    @property
+    def prompt_chars(self):
+        return getattr(self._local, 'prompt_chars', None)
+
+    def chat(self, system_instruction, history, message, **kwargs):
+        self._local.prompt_chars = len(system_instruction or "") + len(message or "")
+        return self._provider.chat(system_instruction, history, message, **kwargs)
+
+    def stream_chat(self, system_instruction, history, message, **kwargs):
+        self._local.prompt_chars = len(system_instruction or "") + len(message or "")
+        return self._provider.stream_chat(system_instruction, history, message, **kwargs)
+
+
+def run_load(app, plan: list, concurrency: int, counter: QueryCounter, recorder: RecordingProvider) -> tuple:
+    """
+    Envía los requests del plan con `concurrency` threads.
+
+    Returns:
+        tuple: (resultados, segundos totales)
+    """
+    local = threading.local()
+
+    def send(item):
+        endpoint, course_id, token, question = item
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+
+        headers = {"Authorization": f"Bearer {token}"}
+        counter.reset()
+        recorder.reset()
+        started = time.perf_counter()
+
+        if endpoint == "chat":
+            response = client.post(
+                f"/api/courses/{course_id}/chat",
+                json={"messages": [{"role": "user", "content": question}]},
+                headers=headers
+            )
+        else:
+            response = client.get(f"/api/courses/{course_id}/chat/context", headers=headers)
+
+        return {
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "queries": counter.count,
+            "prompt_chars": recorder.prompt_chars,
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+        results = list(executor.map(send, plan))
+    return results, time.perf_counter() - started
+
+
+def build_report(args, results: list, elapsed: float) -> dict:
+    report = {
+        "config": {
+            "institutions": args.institutions,
+            "courses_per_institution": args.courses,
+            "files_per_course": args.files,
+            "file_kb": args.file_kb,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0,
+        "endpoints": {},
+    }
+
+    for endpoint in ("chat", "context"):
+        subset = [r for r in results if r["endpoint"] == endpoint]
+        if not subset:
+            continue
+
+        errors = [r for r in subset if r["status"] != 200]
+        entry = {
+            "requests": len(subset),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(subset), 4),
+            "latency_ms": {k: round(v, 2) if isinstance(v, float) else v
+                           for k, v in distribution([r["latency_ms"] for r in subset]).items()},
+            "queries_per_request": distribution([r["queries"] for r in subset]),
+        }
+        prompt_sizes = [r["prompt_chars"] for r in subset if r["prompt_chars"] is not None]
+        if prompt_sizes:
+            entry["prompt_chars"] = distribution(prompt_sizes)
+            entry["prompt_tokens_estimate"] = distribution([size // 4 for size in prompt_sizes])
+        if errors:
+            entry["error_statuses"] = sorted({r["status"] for r in errors})
+
+        report["endpoints"][endpoint] = entry
+
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"\nRequests: {sum(e['requests'] for e in report['endpoints'].values())} "
+          f"en {report['elapsed_s']} s ({report['throughput_rps']} req/s, "
+          f"concurrencia {report['config']['concurrency']})")
+
+    for endpoint, entry in report["endpoints"].items():
+        latency = entry["latency_ms"]
+        queries = entry["queries_per_request"]
+        print(f"\n[{endpoint}] {entry['requests']} requests, {entry['errors']} errores")
+        print(f"  latencia ms   p50={latency['p50']:.1f}  p95={latency['p95']:.1f}  "
+              f"p99={latency['p99']:.1f}  max={latency['max']:.1f}")
+        print(f"  consultas SQL p50={queries['p50']}  p95={queries['p95']}  max={queries['max']}")
+        if "prompt_chars" in entry:
+            prompt = entry["prompt_chars"]
+            print(f"  prompt chars  p50={prompt['p50']}  p95={prompt['p95']}  max={prompt['max']}")
+
+
+def check_budgets(args, report: dict) -> list:
+    """Retorna la lista de presupuestos excedidos."""
+    failures = []
+
+    for endpoint, entry in report["endpoints"].items():
+        if entry["error_rate"] > args.max_error_rate:
+            failures.append(f"{endpoint}: tasa de errores {entry['error_rate']} > {args.max_error_rate}")
+        if args.max_queries is not None and entry["queries_per_request"]["p95"] > args.max_queries:
+            failures.append(
+                f"{endpoint}: p95 de consultas {entry['queries_per_request']['p95']} > {args.max_queries:g}"
+            )
+
+    chat = report["endpoints"].get("chat")
+    if args.max_p95_ms is not None and chat and chat["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"chat: p95 {chat['latency_ms']['p95']} ms > {args.max_p95_ms:g} ms")
+
+    return failures
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="acachat-bench-") as workdir:
+        configure_environment(args, workdir)
+
+        # La configuración se lee al importar la app
+        from app import create_app, db, limiter
+        from app.utils.llm_telemetry import flush_llm_telemetry
+        from app.utils.token_quota import flush_token_usage
+
+        app = create_app("development")
+        app.logger.setLevel("WARNING")
+        limiter.enabled = False
+
+        with app.app_context():
+            print("Poblando base de datos de prueba...")
+            seed_started = time.perf_counter()
+            courses = seed_benchmark_data(args, rng)
+            print(f"  {len(courses)} cursos, {len(courses) * args.files} archivos "
+                  f"en {time.perf_counter() - seed_started:.1f} s")
+
+            counter = QueryCounter(db.engine)
+            recorder = RecordingProvider(app.extensions["llm_provider"])
+            app.extensions["llm_provider"] = recorder
+
+        warmup = args.warmup if args.warmup is not None else len(courses)
+        if warmup:
+            warmup_plan = [("chat", course_id, tokens[0], "¿De qué trata el curso?")
+                           for course_id, _topic, tokens in courses][:warmup]
+            run_load(app, warmup_plan, args.concurrency, counter, recorder)
+
+        plan = build_plan(courses, args.requests, args.context_ratio, rng)
+        results, elapsed = run_load(app, plan, args.concurrency, counter, recorder)
+
+        report = build_report(args, results, elapsed)
+        print_report(report)
+
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        failures = check_budgets(args, report)
+        with app.app_context():
+            flush_token_usage()
+            flush_llm_telemetry()
+            counter.close()
+            db.session.remove()
+            db.engine.dispose()
+
+    if failures:
+        print("\nPresupuestos excedidos:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
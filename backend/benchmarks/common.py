@@ -0,0 +1,80 @@
+"""
+MÓDULO: UTILIDADES COMPARTIDAS DE LOS BENCHMARKS
+=================================================
+
+Conteo de consultas SQL por thread y estadísticas de percentiles.
+"""
+
+import math
+import threading
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Cuenta las sentencias SQL ejecutadas por cada thread.
+
+    Como el test client de Flask atiende el request en el mismo thread que lo
+    envía, el conteo del thread equivale a las consultas del request.
+
+    Uso:
+        counter = QueryCounter(db.engine)
+        counter.reset()
+        client.get(...)
+        queries = counter.count
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None:
+            statements.append(statement)
+
+    def reset(self, capture: bool = False) -> None:
+        """Reinicia el conteo del thread actual (capture=True guarda también las sentencias)."""
+        self._local.count = 0
+        self._local.statements = [] if capture else None
+
+    @property
+    def count(self) -> int:
+        """Sentencias ejecutadas por el thread actual desde el último reset()."""
+        return getattr(self._local, 'count', 0)
+
+    @property
+    def statements(self) -> list:
+        """Sentencias capturadas por el thread actual (si se usó capture=True)."""
+        return getattr(self._local, 'statements', None) or []
+
+    def close(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Percentil por el método del rango más cercano (values no necesita estar ordenado)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def distribution(values: list) -> dict:
+    """Resumen de una distribución: mínimo, media, p50, p95, p99 y máximo."""
+    if not values:
+        return {"count": 0}
+
+    return {
+        "count": len(values),
+        "min": min(values),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
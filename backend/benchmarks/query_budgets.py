@@ -0,0 +1,602 @@
+"""
+MÓDULO: PRESUPUESTO DE CONSULTAS SQL POR ENDPOINT
+==================================================
+
+Verifica que cada endpoint de los blueprints auth, courses, enrollments,
+files, grades, institutions y chat ejecute a lo más una cantidad fija de
+sentencias SQL (su presupuesto), para detectar consultas N+1 antes de que
+lleguen a producción.
+
+Cada escala se ejecuta en un proceso aparte, con una base SQLite temporal
+poblada de forma proporcional a la escala (cursos, estudiantes, archivos,
+conversaciones). Los listados se piden con per_page=100, de modo que las
+filas serializadas crecen con la escala y el presupuesto no: un endpoint
+que consulta por fila excede su presupuesto en la escala grande, o ejecuta
+más sentencias que en la chica, y el comando termina con exit 1 mostrando
+las sentencias del request agrupadas (las repetidas primero).
+
+La base de prueba valida las claves foráneas (PRAGMA foreign_keys, como
+MySQL) y los casos que eliminan filas tienen filas dependientes (uso de
+tokens, telemetría, conversación, un blob referenciado una sola vez): un
+borrado en el orden incorrecto responde 500 y falla por su status.
+
+Las consultas se cuentan con QueryCounter (evento before_cursor_execute)
+en el thread del request. Para que el conteo no dependa del tiempo se
+desactivan las cachés con TTL o revisión periódica (autorización, listado
+de instituciones, respuestas); las escrituras en lote de uso de tokens y
+telemetría ocurren en su propio thread y no se cuentan.
+
+Uso (desde la carpeta backend):
+    python -m benchmarks.query_budgets
+    python -m benchmarks.query_budgets --scales 1,6 --only courses,enrollments
+    python -m benchmarks.query_budgets --verbose      # sentencias de todos los endpoints
+
+Al agregar un endpoint, agregar su caso en CASES. Si un cambio necesita
+legítimamente una consulta más, subir el presupuesto del caso en el mismo
+commit.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter, namedtuple
+
+from sqlalchemy import event
+
+from .common import QueryCounter
+
+BLUEPRINTS = ("auth", "courses", "enrollments", "files", "grades", "institutions", "chat")
+
+# role: None (sin token), 'admin', 'teacher', 'student' o 'refresh' (refresh token del estudiante)
+# path: se completa con los IDs del seed (ver seed_budget_data)
+# json / data: cuerpo del request; data es una función que arma el multipart en cada ejecución
+Case = namedtuple("Case", ["blueprint", "name", "method", "path", "role", "status", "budget", "json", "data"])
+Case.__new__.__defaults__ = (None, None)
+
+CASES = [
+    # auth
+    Case("auth", "health", "GET", "/api/auth/health", None, 200, 1),
+    Case("auth", "register", "POST", "/api/auth/register", None, 201, 8, json={
+        "rut": "11.111.111-1", "username": "budget-register", "email": "register@budget.cl",
+        "region": "RM", "comuna": "Santiago", "password": "Budget1234",
+        "institution_id": "{institution}", "grade_id": "{grade}",
+    }),
+    Case("auth", "login", "POST", "/api/auth/login", None, 200, 2,
+         json={"email": "login@budget.cl", "password": "Budget1234"}),
+    Case("auth", "refresh", "POST", "/api/auth/refresh", "refresh", 200, 0),
+    Case("auth", "profile", "GET", "/api/auth/profile", "student", 200, 4),
+    Case("auth", "update_profile", "PATCH", "/api/auth/profile", "student", 200, 8,
+         json={"username": "budget-student-renamed"}),
+    Case("auth", "list_users", "GET", "/api/auth/users?per_page=100", "admin", 200, 3),
+    Case("auth", "get_user", "GET", "/api/auth/users/{student}", "admin", 200, 4),
+    Case("auth", "update_user", "PUT", "/api/auth/users/{update_user}", "admin", 200, 7,
+         json={"comuna": "Valparaíso"}),
+    Case("auth", "delete_user", "DELETE", "/api/auth/users/{delete_user}", "admin", 200, 16),
+    Case("auth", "update_user_role", "PUT", "/api/auth/users/{role_user}/role", "admin", 200, 6,
+         json={"role": "teacher"}),
+
+    # courses
+    Case("courses", "list_courses_admin", "GET", "/api/courses?per_page=100", "admin", 200, 3),
+    Case("courses", "list_courses_student", "GET", "/api/courses?per_page=100", "student", 200, 4),
+    Case("courses", "my_courses", "GET", "/api/courses/my-courses", "teacher", 200, 2),
+    Case("courses", "create_course", "POST", "/api/courses", "admin", 201, 9, json={
+        "nombre": "Curso nuevo", "prompt": "Responde breve.",
+        "institution_id": "{institution}", "grade_id": "{grade}",
+    }),
+    Case("courses", "get_course", "GET", "/api/courses/{course}", "student", 200, 5),
+    Case("courses", "update_course", "PUT", "/api/courses/{course}", "teacher", 200, 9,
+         json={"prompt": "Responde con ejemplos."}),
+    Case("courses", "delete_course", "DELETE", "/api/courses/{delete_course}", "admin", 200, 4),
+
+    # enrollments
+    Case("enrollments", "list_all_enrollments", "GET", "/api/enrollments?per_page=100", "admin", 200, 3),
+    Case("enrollments", "enroll_student", "POST", "/api/enrollments", "student", 201, 12,
+         json={"course_id": "{other_course}", "year": 2025}),
+    Case("enrollments", "assign_teacher", "POST", "/api/enrollments/assign-teacher", "admin", 201, 13,
+         json={"user_id": "{spare_teacher}", "course_id": "{course}", "year": 2025}),
+    Case("enrollments", "bulk_enroll", "POST", "/api/enrollments/bulk", "admin", 201, 8,
+         json={"course_id": "{course}", "year": 2025, "user_ids": "{bulk_students}"}),
+    Case("enrollments", "get_course_enrollments", "GET", "/api/enrollments/course/{course}", "teacher", 200, 4),
+    Case("enrollments", "delete_enrollment", "DELETE", "/api/enrollments/{delete_enrollment}", "admin", 200, 8),
+
+    # files
+    Case("files", "list_course_files", "GET", "/api/courses/{course}/files", "student", 200, 4),
+    Case("files", "upload_course_file", "POST", "/api/courses/{course}/files", "teacher", 201, 17,
+         data=lambda: {"file": (io.BytesIO(b"Material de repaso de la unidad."), "repaso.txt")}),
+    Case("files", "download_file", "GET", "/api/files/{download_file}/download", "student", 200, 3),
+    Case("files", "get_file_parse_status", "GET", "/api/files/{file}/parse-status", "student", 200, 4),
+    Case("files", "delete_course_file", "DELETE", "/api/files/{delete_file}", "admin", 200, 19),
+
+    # grades
+    Case("grades", "list_grades", "GET", "/api/grades", None, 200, 2),
+    Case("grades", "create_grade", "POST", "/api/grades", "admin", 201, 4,
+         json={"name": "Grado nuevo", "order": 90}),
+    Case("grades", "get_grade", "GET", "/api/grades/{grade}", None, 200, 1),
+    Case("grades", "update_grade", "PUT", "/api/grades/{spare_grade}", "admin", 200, 6,
+         json={"name": "Grado renombrado"}),
+    Case("grades", "delete_grade", "DELETE", "/api/grades/{delete_grade}", "admin", 200, 5),
+
+    # institutions
+    Case("institutions", "list_institutions", "GET", "/api/institutions?per_page=100", None, 200, 2),
+    Case("institutions", "create_institution", "POST", "/api/institutions", "admin", 201, 5,
+         json={"nombre": "Institución nueva"}),
+    Case("institutions", "get_institution", "GET", "/api/institutions/{institution}", None, 200, 2),
+    Case("institutions", "update_institution", "PUT", "/api/institutions/{institution}", "admin", 200, 7,
+         json={"nombre": "Institución renombrada"}),
+
+    # chat
+    Case("chat", "chat", "POST", "/api/courses/{course}/chat", "student", 200, 11,
+         json={"messages": [{"role": "user", "content": "¿Qué es una derivada?"}]}),
+    Case("chat", "chat_stream", "POST", "/api/courses/{course}/chat/stream", "student", 200, 5,
+         json={"messages": [{"role": "user", "content": "¿Qué es una integral?"}]}),
+    Case("chat", "chat_context", "GET", "/api/courses/{course}/chat/context", "student", 200, 4),
+    Case("chat", "answer_cache_stats", "GET", "/api/courses/{course}/chat/cache", "teacher", 200, 2),
+    Case("chat", "clear_answer_cache", "DELETE", "/api/courses/{course}/chat/cache", "teacher", 200, 4),
+    Case("chat", "chat_quota", "GET", "/api/courses/{course}/chat/quota", "student", 200, 4),
+    Case("chat", "chat_metrics", "GET", "/api/chat/metrics", "admin", 200, 1),
+    Case("chat", "chat_telemetry", "GET", "/api/chat/telemetry?group_by=course", "admin", 200, 4),
+    Case("chat", "create_conversation", "POST", "/api/courses/{course}/conversations", "student", 201, 6,
+         json={"title": "Repaso"}),
+    Case("chat", "list_conversations", "GET", "/api/courses/{course}/conversations", "student", 200, 3),
+    Case("chat", "get_conversation", "GET", "/api/conversations/{conversation}", "student", 200, 4),
+    Case("chat", "send_conversation_message", "POST", "/api/conversations/{conversation}/messages",
+         "student", 200, 14, json={"content": "¿Y cómo se calcula?"}),
+    Case("chat", "stream_conversation_message", "POST", "/api/conversations/{conversation}/messages/stream",
+         "student", 200, 15, json={"content": "Dame otro ejemplo"}),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Presupuesto de consultas SQL por endpoint")
+    parser.add_argument("--scales", default="1,4",
+                        help="Escalas de la base de prueba separadas por coma (default: 1,4)")
+    parser.add_argument("--only", default=None,
+                        help=f"Blueprints a verificar separados por coma ({', '.join(BLUEPRINTS)})")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar las sentencias de todos los endpoints")
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar el reporte en un archivo JSON")
+    # Uso interno: ejecutar una escala en este proceso y escribir los resultados
+    parser.add_argument("--run-scale", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def selected_cases(only: str = None) -> list:
+    if not only:
+        return CASES
+    blueprints = {name.strip() for name in only.split(",") if name.strip()}
+    unknown = blueprints - set(BLUEPRINTS)
+    if unknown:
+        raise SystemExit(f"Blueprints desconocidos: {', '.join(sorted(unknown))}")
+    return [case for case in CASES if case.blueprint in blueprints]
+
+
+def configure_environment(workdir: str) -> None:
+    """Configura la app por variables de entorno (se leen al importar app.config)."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'budgets.db')}"
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = "0"
+    os.environ["LLM_FAKE_LATENCY_JITTER_MS"] = "0"
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = "1000000"
+    os.environ["PARSE_QUEUE_MODE"] = "worker"  # Subir un archivo solo encola el parseo
+    os.environ["PARSER_POOL_SIZE"] = "0"
+    # Cachés cuyo contenido depende del tiempo: el conteo debe ser reproducible
+    os.environ["AUTH_CACHE_ENABLED"] = "false"
+    os.environ["INSTITUTIONS_CACHE_ENABLED"] = "false"
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ["TOKEN_QUOTA_USER_DAILY"] = str(10 ** 12)
+    os.environ["TOKEN_QUOTA_USER_MONTHLY"] = str(10 ** 12)
+
+
+def seed_budget_data(scale: int, upload_folder: str) -> dict:
+    """
+    Puebla la base de prueba; las cantidades crecen con la escala.
+
+    Returns:
+        dict: IDs usados en los paths y cuerpos de CASES, y los tokens por rol
+    """
+    from flask_jwt_extended import create_access_token, create_refresh_token
+
+    from app import db
+    from app.models import (
+        Conversation, ConversationTurn, Course, CourseFile, FileBlob, Grade, Institution, LLMCall,
+        TokenUsage, User, UserCourse
+    )
+    from app.utils.course_stats import recompute_course_counts, refresh_course_parse_stats
+    from app.utils.parser_pool import OUTCOME_OK, current_parser_version
+    from app.utils.retrieval import index_course_file
+
+    db.create_all()
+    counter = {"users": 0}
+
+    def add_user(role: str, **fields) -> User:
+        counter["users"] += 1
+        number = counter["users"]
+        user = User(
+            rut=f"budget-{number}", username=f"budget-{role}-{number}", email=f"{role}{number}@budget.cl",
+            region="RM", comuna="Santiago", password_hash="!", role=role, **fields
+        )
+        db.session.add(user)
+        return user
+
+    grades = [Grade(name=f"Grado {index + 1}", order=index + 1) for index in range(2 + scale)]
+    spare_grade = Grade(name="Grado sin uso", order=80)
+    delete_grade = Grade(name="Grado a eliminar", order=81)
+    db.session.add_all(grades + [spare_grade, delete_grade])
+
+    institutions = [Institution(nombre=f"Institución {index + 1}") for index in range(2 * scale)]
+    db.session.add_all(institutions)
+    db.session.flush()
+
+    admin = add_user("admin")
+    teacher = add_user("teacher", institution_id=institutions[0].id)
+    spare_teacher = add_user("teacher", institution_id=institutions[0].id)
+    student = add_user("student", institution_id=institutions[0].id, grade_id=grades[0].id)
+    login_user = add_user("student", institution_id=institutions[0].id)
+    login_user.email = "login@budget.cl"
+    login_user.set_password("Budget1234")
+    update_user = add_user("student", institution_id=institutions[0].id)
+    role_user = add_user("student", institution_id=institutions[0].id)
+    delete_user = add_user("student", institution_id=institutions[0].id)
+    bulk_students = [add_user("student", institution_id=institutions[0].id) for _ in range(3)]
+    db.session.flush()
+
+    parser_version = current_parser_version()
+    courses = []
+    for index, institution in enumerate(institutions):
+        for course_index in range(2):
+            course = Course(
+                nombre=f"Curso {index + 1}-{course_index + 1}",
+                prompt="Eres el asistente del curso. " * 40,
+                institution_id=institution.id,
+                grade_id=grades[(index + course_index) % len(grades)].id
+            )
+            db.session.add(course)
+            courses.append(course)
+    db.session.flush()
+
+    course, other_course, delete_course = courses[0], courses[1], courses[-1]
+
+    # Profesor y estudiante principales en todos los cursos salvo other_course
+    # (ahí se inscribe el estudiante durante la verificación)
+    for target in courses:
+        db.session.add(UserCourse(user_id=teacher.id, course_id=target.id, year=2025, role_in_course="teacher"))
+        if target is not other_course:
+            db.session.add(UserCourse(user_id=student.id, course_id=target.id, year=2025, role_in_course="student"))
+
+    for user in (delete_user, role_user, update_user):
+        db.session.add(UserCourse(user_id=user.id, course_id=course.id, year=2025, role_in_course="student"))
+
+    uploaders = [teacher]
+    for _ in range(scale):
+        co_teacher = add_user("teacher", institution_id=institutions[0].id)
+        db.session.flush()
+        db.session.add(UserCourse(user_id=co_teacher.id, course_id=course.id, year=2025, role_in_course="teacher"))
+        uploaders.append(co_teacher)
+
+    # Repartidos entre instituciones y grados: una relación cargada por fila se nota en el conteo
+    for index in range(5 * scale):
+        classmate = add_user("student", institution_id=institutions[index % len(institutions)].id,
+                             grade_id=grades[index % len(grades)].id)
+        db.session.flush()
+        db.session.add(UserCourse(user_id=classmate.id, course_id=course.id, year=2025, role_in_course="student"))
+
+    delete_enrollment = UserCourse(user_id=delete_user.id, course_id=other_course.id, year=2025,
+                                   role_in_course="student")
+    db.session.add(delete_enrollment)
+
+    # Historial del usuario a eliminar: todo lo que lo referencia debe borrarse o desvincularse
+    delete_conversation = Conversation(user_id=delete_user.id, course_id=course.id, title="Conversación a eliminar")
+    db.session.add(delete_conversation)
+    db.session.flush()
+    for position in range(2):
+        db.session.add(ConversationTurn(
+            conversation_id=delete_conversation.id,
+            position=position,
+            role="user" if position % 2 == 0 else "model",
+            content="Mensaje a eliminar.",
+            token_count=4
+        ))
+    delete_conversation.turn_count = 2
+    db.session.add(TokenUsage(
+        user_id=delete_user.id, course_id=course.id, institution_id=course.institution_id,
+        model="fake-llm", prompt_tokens=100, output_tokens=20, total_tokens=120
+    ))
+    db.session.add(LLMCall(
+        user_id=delete_user.id, course_id=course.id, institution_id=course.institution_id,
+        model="fake-llm", operation=LLMCall.OPERATION_CHAT, prompt_tokens=100, output_tokens=20,
+        ttft_ms=50, latency_ms=50
+    ))
+
+    # Archivos del curso principal (parseados e indexados para el chat). El
+    # último, que se elimina, es el único que referencia su blob
+    files = []
+    files_count = 3 * scale + 2
+    for index in range(files_count):
+        text = f"Unidad {index + 1}. La derivada mide el cambio; la integral acumula áreas. " * 30
+        relative_path = f"courses/{course.id}/unidad_{index + 1}.txt"
+        blob = None
+        if index == files_count - 1:
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            relative_path = f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.txt"
+            blob = FileBlob(sha256=digest, filepath=relative_path, filesize=len(text.encode("utf-8")), ref_count=1)
+            db.session.add(blob)
+            db.session.flush()
+        course_file = CourseFile(
+            course_id=course.id,
+            filename=f"unidad_{index + 1}.txt",
+            filepath=relative_path,
+            filesize=len(text.encode("utf-8")),
+            mimetype="text/plain",
+            uploaded_by=uploaders[index % len(uploaders)].id,
+            blob_id=blob.id if blob else None,
+            parse_outcome=OUTCOME_OK,
+            parser_version=parser_version
+        )
+        course_file.parsed_content = text
+        db.session.add(course_file)
+        db.session.flush()
+        index_course_file(course_file)
+        files.append(course_file)
+
+        file_path = os.path.join(upload_folder, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    refresh_course_parse_stats(course.id)
+
+    # Conversaciones del estudiante en el curso principal
+    conversations = []
+    for index in range(2 * scale):
+        conversation = Conversation(user_id=student.id, course_id=course.id, title=f"Conversación {index + 1}")
+        db.session.add(conversation)
+        db.session.flush()
+        for position in range(4 * scale):
+            db.session.add(ConversationTurn(
+                conversation_id=conversation.id,
+                position=position,
+                role="user" if position % 2 == 0 else "model",
+                content=f"Mensaje {position + 1} sobre derivadas.",
+                token_count=8
+            ))
+        conversation.turn_count = 4 * scale
+        conversations.append(conversation)
+
+    recompute_course_counts()
+    db.session.commit()
+
+    return {
+        "ids": {
+            "institution": institutions[0].id,
+            "grade": grades[0].id,
+            "spare_grade": spare_grade.id,
+            "delete_grade": delete_grade.id,
+            "course": course.id,
+            "other_course": other_course.id,
+            "delete_course": delete_course.id,
+            "student": student.id,
+            "spare_teacher": spare_teacher.id,
+            "update_user": update_user.id,
+            "role_user": role_user.id,
+            "delete_user": delete_user.id,
+            "bulk_students": [user.id for user in bulk_students],
+            "delete_enrollment": delete_enrollment.id,
+            "file": files[0].id,
+            "download_file": files[1].id,
+            "delete_file": files[-1].id,
+            "conversation": conversations[0].id,
+        },
+        "tokens": {
+            "admin": create_access_token(identity=str(admin.id)),
+            "teacher": create_access_token(identity=str(teacher.id)),
+            "student": create_access_token(identity=str(student.id)),
+            "refresh": create_refresh_token(identity=str(student.id)),
+        },
+    }
+
+
+def fill(value, ids: dict):
+    """Reemplaza los marcadores "{nombre}" por los IDs del seed."""
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+        return ids[value[1:-1]]
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record) -> None:
+    """SQLite no valida las claves foráneas por defecto; MySQL sí."""
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+def run_scale(scale: int, cases: list) -> dict:
+    """Puebla una base a la escala indicada y mide cada caso (en este proceso)."""
+    with tempfile.TemporaryDirectory(prefix="acachat-budgets-") as workdir:
+        configure_environment(workdir)
+
+        # La configuración se lee al importar la app
+        from app import create_app, db, limiter
+        from app.utils.llm_telemetry import flush_llm_telemetry
+        from app.utils.token_quota import flush_token_usage
+
+        app = create_app("development")
+        app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+        app.logger.setLevel("ERROR")
+        limiter.enabled = False
+
+        with app.app_context():
+            event.listen(db.engine, "connect", enable_sqlite_foreign_keys)
+            db.engine.dispose()
+            seed = seed_budget_data(scale, app.config["UPLOAD_FOLDER"])
+            counter = QueryCounter(db.engine)
+
+        client = app.test_client()
+        results = {}
+        for case in cases:
+            headers = {}
+            if case.role:
+                headers["Authorization"] = f"Bearer {seed['tokens'][case.role]}"
+
+            kwargs = {"headers": headers}
+            if case.json is not None:
+                kwargs["json"] = fill(case.json, seed["ids"])
+            if case.data is not None:
+                kwargs["data"] = case.data()
+                kwargs["content_type"] = "multipart/form-data"
+
+            counter.reset(capture=True)
+            response = client.open(fill(case.path, seed["ids"]), method=case.method, **kwargs)
+            response.get_data()  # Las respuestas en streaming consultan al recorrerse
+            response.close()
+
+            results[f"{case.blueprint}.{case.name}"] = {
+                "status": response.status_code,
+                "queries": counter.count,
+                "statements": counter.statements,
+            }
+
+        with app.app_context():
+            flush_token_usage()
+            flush_llm_telemetry()
+            counter.close()
+            db.session.remove()
+            db.engine.dispose()
+
+    return results
+
+
+def run_scale_subprocess(scale: int, only: str = None) -> dict:
+    """Ejecuta una escala en un proceso nuevo (cachés y configuración limpias)."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="acachat-budgets-out-") as outdir:
+        output = os.path.join(outdir, f"scale-{scale}.json")
+        command = [sys.executable, "-m", "benchmarks.query_budgets", "--run-scale", str(scale), "--output", output]
+        if only:
+            command += ["--only", only]
+
+        completed = subprocess.run(command, cwd=backend_dir)
+        if completed.returncode != 0:
+            raise SystemExit(f"Falló la ejecución de la escala {scale} (exit {completed.returncode})")
+
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def format_statements(statements: list, limit: int = 25) -> list:
+    """Sentencias agrupadas por texto, las más repetidas primero (señal de N+1)."""
+    grouped = Counter(" ".join(statement.split()) for statement in statements)
+    lines = []
+    for statement, count in grouped.most_common(limit):
+        text = statement if len(statement) <= 220 else statement[:217] + "..."
+        lines.append(f"      {count:>3}x  {text}")
+    if len(grouped) > limit:
+        lines.append(f"      ... {len(grouped) - limit} sentencias distintas más")
+    return lines
+
+
+def check_budgets(cases: list, scales: list, results: dict) -> list:
+    """
+    Compara los resultados de cada escala con los presupuestos.
+
+    Returns:
+        list: [(caso, escala, motivo), ...] de los casos que fallan
+    """
+    failures = []
+    for case in cases:
+        key = f"{case.blueprint}.{case.name}"
+        for scale in scales:
+            result = results[scale][key]
+            if result["status"] != case.status:
+                failures.append((key, scale, f"status {result['status']} (se esperaba {case.status})"))
+            elif result["queries"] > case.budget:
+                failures.append((key, scale, f"{result['queries']} consultas > presupuesto {case.budget}"))
+
+        counts = [results[scale][key]["queries"] for scale in scales]
+        if len(set(counts)) > 1:
+            if all(results[scale][key]["status"] == case.status for scale in scales):
+                failures.append((key, scales[-1], "las consultas cambian con la escala: " +
+                                 ", ".join(f"escala {scale}={count}" for scale, count in zip(scales, counts))))
+    return failures
+
+
+def print_report(cases: list, scales: list, results: dict, failures: list, verbose: bool) -> None:
+    failed_keys = {key for key, _scale, _reason in failures}
+    header = "  ".join(f"esc.{scale:>2}" for scale in scales)
+    print(f"\n{'endpoint':<42} {'presup.':>7}  {header}")
+
+    current_blueprint = None
+    for case in cases:
+        key = f"{case.blueprint}.{case.name}"
+        if case.blueprint != current_blueprint:
+            current_blueprint = case.blueprint
+            print(f"[{case.blueprint}]")
+        counts = "  ".join(f"{results[scale][key]['queries']:>6}" for scale in scales)
+        mark = "  <-- FALLA" if key in failed_keys else ""
+        print(f"  {case.method:<6} {case.name:<33} {case.budget:>7}  {counts}{mark}")
+
+        if verbose and key not in failed_keys:
+            print("\n".join(format_statements(results[scales[-1]][key]["statements"])))
+
+    if failures:
+        print("\nPresupuestos excedidos:")
+        for key, scale, reason in failures:
+            print(f"\n  - {key} (escala {scale}): {reason}")
+            print("\n".join(format_statements(results[scale][key]["statements"])))
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    cases = selected_cases(args.only)
+
+    if args.run_scale is not None:
+        results = run_scale(args.run_scale, cases)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False)
+        return 0
+
+    scales = sorted({int(scale) for scale in args.scales.split(",") if scale.strip()})
+    if not scales or scales[0] < 1:
+        raise SystemExit("Las escalas deben ser enteros positivos")
+
+    results = {}
+    for scale in scales:
+        print(f"Midiendo {len(cases)} endpoints a escala {scale}...")
+        results[scale] = run_scale_subprocess(scale, args.only)
+
+    failures = check_budgets(cases, scales, results)
+    print_report(cases, scales, results, failures, args.verbose)
+
+    if args.json_path:
+        report = {
+            "scales": scales,
+            "endpoints": {
+                f"{case.blueprint}.{case.name}": {
+                    "budget": case.budget,
+                    "queries": {str(scale): results[scale][f"{case.blueprint}.{case.name}"]["queries"]
+                                for scale in scales},
+                }
+                for case in cases
+            },
+            "failures": [{"endpoint": key, "scale": scale, "reason": reason} for key, scale, reason in failures],
+        }
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if failures:
+        return 1
+
+    print(f"\nTodos los endpoints dentro de su presupuesto ({len(cases)} endpoints, escalas {args.scales}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
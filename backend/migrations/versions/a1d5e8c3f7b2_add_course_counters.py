@@ -0,0 +1,61 @@
+"""Add files, students and teachers counters to courses
+
+Revision ID: a1d5e8c3f7b2
+Revises: f3a8d1c6e2b4
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d5e8c3f7b2'
+down_revision = 'f3a8d1c6e2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('files_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('students_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('teachers_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Calcular los contadores de los cursos existentes
+    courses = sa.table(
+        'courses',
+        sa.column('id', sa.Integer),
+        sa.column('files_count', sa.Integer),
+        sa.column('students_count', sa.Integer),
+        sa.column('teachers_count', sa.Integer)
+    )
+    course_files = sa.table(
+        'course_files',
+        sa.column('id', sa.Integer),
+        sa.column('course_id', sa.Integer)
+    )
+    user_courses = sa.table(
+        'user_courses',
+        sa.column('course_id', sa.Integer),
+        sa.column('role_in_course', sa.String)
+    )
+
+    def enrollments_count(role):
+        return sa.select(sa.func.count()).where(
+            user_courses.c.course_id == courses.c.id,
+            user_courses.c.role_in_course == role
+        ).scalar_subquery()
+
+    op.execute(courses.update().values(
+        files_count=sa.select(sa.func.count()).where(course_files.c.course_id == courses.c.id).scalar_subquery(),
+        students_count=enrollments_count('student'),
+        teachers_count=enrollments_count('teacher')
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('teachers_count')
+        batch_op.drop_column('students_count')
+        batch_op.drop_column('files_count')
@@ -0,0 +1,37 @@
+"""Add content_version to courses and course_context_snapshots table
+
+Revision ID: a2b3b9d57867
+Revises: b1ce94dfd9ff
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2b3b9d57867'
+down_revision = 'b1ce94dfd9ff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_version', sa.Integer(), nullable=False, server_default='1'))
+
+    op.create_table('course_context_snapshots',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('content_version', sa.Integer(), nullable=False),
+    sa.Column('prompt_template', sa.Text(length=16777215), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+
+
+def downgrade():
+    op.drop_table('course_context_snapshots')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('content_version')
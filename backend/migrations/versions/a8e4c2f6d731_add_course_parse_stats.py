@@ -0,0 +1,58 @@
+"""Add aggregated parsed content stats to courses
+
+Revision ID: a8e4c2f6d731
+Revises: f3a9c1d7e524
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e4c2f6d731'
+down_revision = 'f3a9c1d7e524'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parsed_files_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('parsed_char_count', sa.BigInteger(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('parsed_token_estimate', sa.BigInteger(), nullable=False, server_default='0'))
+
+    # Calcular los totales de los archivos ya parseados
+    courses = sa.table(
+        'courses',
+        sa.column('id', sa.Integer),
+        sa.column('parsed_files_count', sa.Integer),
+        sa.column('parsed_char_count', sa.BigInteger),
+        sa.column('parsed_token_estimate', sa.BigInteger)
+    )
+    course_files = sa.table(
+        'course_files',
+        sa.column('course_id', sa.Integer),
+        sa.column('parsed_text_id', sa.Integer),
+        sa.column('char_count', sa.Integer),
+        sa.column('token_estimate', sa.Integer)
+    )
+
+    def parsed_files_total(expression):
+        return sa.select(expression).where(
+            course_files.c.course_id == courses.c.id,
+            course_files.c.parsed_text_id.isnot(None)
+        ).scalar_subquery()
+
+    op.execute(courses.update().values(
+        parsed_files_count=parsed_files_total(sa.func.count()),
+        parsed_char_count=parsed_files_total(sa.func.coalesce(sa.func.sum(course_files.c.char_count), 0)),
+        parsed_token_estimate=parsed_files_total(sa.func.coalesce(sa.func.sum(course_files.c.token_estimate), 0))
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('parsed_token_estimate')
+        batch_op.drop_column('parsed_char_count')
+        batch_op.drop_column('parsed_files_count')
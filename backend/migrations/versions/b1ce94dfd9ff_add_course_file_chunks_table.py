@@ -0,0 +1,44 @@
+"""Add course_file_chunks table for BM25 retrieval
+
+Revision ID: b1ce94dfd9ff
+Revises: 6b6d8f2c24b2
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1ce94dfd9ff'
+down_revision = '6b6d8f2c24b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_file_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_file_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('token_count', sa.Integer(), nullable=False),
+    sa.Column('terms', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['course_file_id'], ['course_files.id'], ),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('course_file_chunks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_course_file_chunks_course_file_id'), ['course_file_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_course_file_chunks_course_id'), ['course_id'], unique=False)
+
+    # Los fragmentos de archivos existentes se generan con: flask reindex-files
+
+
+def downgrade():
+    with op.batch_alter_table('course_file_chunks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_course_file_chunks_course_id'))
+        batch_op.drop_index(batch_op.f('ix_course_file_chunks_course_file_id'))
+
+    op.drop_table('course_file_chunks')
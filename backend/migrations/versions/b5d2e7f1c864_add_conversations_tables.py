@@ -0,0 +1,63 @@
+"""Add conversations and conversation_turns tables
+
+Revision ID: b5d2e7f1c864
+Revises: a8e4c2f6d731
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2e7f1c864'
+down_revision = 'a8e4c2f6d731'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('conversations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=True),
+    sa.Column('summary', sa.Text(), nullable=True),
+    sa.Column('summarized_turns', sa.Integer(), nullable=False),
+    sa.Column('turn_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_conversations_course_id'), ['course_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_conversations_user_id'), ['user_id'], unique=False)
+
+    op.create_table('conversation_turns',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(length=10), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('token_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('conversation_id', 'position', name='unique_conversation_turn_position')
+    )
+    with op.batch_alter_table('conversation_turns', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_conversation_turns_conversation_id'), ['conversation_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('conversation_turns', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversation_turns_conversation_id'))
+
+    op.drop_table('conversation_turns')
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversations_user_id'))
+        batch_op.drop_index(batch_op.f('ix_conversations_course_id'))
+
+    op.drop_table('conversations')
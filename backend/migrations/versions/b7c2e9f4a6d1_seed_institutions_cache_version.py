@@ -0,0 +1,36 @@
+"""Seed the institutions cache version counter
+
+Revision ID: b7c2e9f4a6d1
+Revises: a1d5e8c3f7b2
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2e9f4a6d1'
+down_revision = 'a1d5e8c3f7b2'
+branch_labels = None
+depends_on = None
+
+
+cache_versions = sa.table(
+    'cache_versions',
+    sa.column('name', sa.String),
+    sa.column('version', sa.BigInteger),
+    sa.column('updated_at', sa.DateTime)
+)
+
+
+def upgrade():
+    op.bulk_insert(cache_versions, [
+        {'name': 'institutions', 'version': 0, 'updated_at': datetime.utcnow()},
+    ])
+
+
+def downgrade():
+    op.execute(cache_versions.delete().where(cache_versions.c.name == 'institutions'))
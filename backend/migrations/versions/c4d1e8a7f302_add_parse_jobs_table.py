@@ -0,0 +1,41 @@
+"""Add parse_jobs table
+
+Revision ID: c4d1e8a7f302
+Revises: a2b3b9d57867
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d1e8a7f302'
+down_revision = 'a2b3b9d57867'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('parse_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_file_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_file_id'], ['course_files.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('course_file_id')
+    )
+    with op.batch_alter_table('parse_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_parse_jobs_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('parse_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_parse_jobs_status'))
+
+    op.drop_table('parse_jobs')
@@ -0,0 +1,64 @@
+"""Add token_usage ledger and token_usage_rollups tables
+
+Revision ID: c8e1f4a9d276
+Revises: b5d2e7f1c864
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e1f4a9d276'
+down_revision = 'b5d2e7f1c864'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('token_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('institution_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(length=80), nullable=True),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('output_tokens', sa.Integer(), nullable=False),
+    sa.Column('total_tokens', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['institution_id'], ['institutions.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('token_usage', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_usage_course_id'), ['course_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_token_usage_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_token_usage_institution_id'), ['institution_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_token_usage_user_id'), ['user_id'], unique=False)
+
+    op.create_table('token_usage_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('scope_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('requests', sa.Integer(), nullable=False),
+    sa.Column('prompt_tokens', sa.BigInteger(), nullable=False),
+    sa.Column('output_tokens', sa.BigInteger(), nullable=False),
+    sa.Column('total_tokens', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('scope', 'scope_id', 'period', 'period_start', name='unique_token_usage_rollup')
+    )
+
+
+def downgrade():
+    op.drop_table('token_usage_rollups')
+    with op.batch_alter_table('token_usage', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_usage_user_id'))
+        batch_op.drop_index(batch_op.f('ix_token_usage_institution_id'))
+        batch_op.drop_index(batch_op.f('ix_token_usage_created_at'))
+        batch_op.drop_index(batch_op.f('ix_token_usage_course_id'))
+
+    op.drop_table('token_usage')
@@ -0,0 +1,44 @@
+"""Cascade deletes from users to the token_usage ledger
+
+Revision ID: d2f7a9c4e1b6
+Revises: c4e8a2d6f1b9
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e1b6'
+down_revision = 'c4e8a2d6f1b9'
+branch_labels = None
+depends_on = None
+
+
+# La clave foránea original no tiene nombre explícito: en MySQL se lee del
+# esquema y en SQLite (batch) se le asigna uno con esta convención
+naming_convention = {
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+}
+
+
+def _user_fk_name():
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys('token_usage'):
+        if foreign_key['constrained_columns'] == ['user_id']:
+            return foreign_key['name'] or 'fk_token_usage_user_id_users'
+    return None
+
+
+def upgrade():
+    name = _user_fk_name()
+    with op.batch_alter_table('token_usage', schema=None, naming_convention=naming_convention) as batch_op:
+        if name:
+            batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key('fk_token_usage_user_id', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('token_usage', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_token_usage_user_id', type_='foreignkey')
+        batch_op.create_foreign_key('fk_token_usage_user_id', 'users', ['user_id'], ['id'])
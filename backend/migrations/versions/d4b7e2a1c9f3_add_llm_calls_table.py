@@ -0,0 +1,52 @@
+"""Add llm_calls telemetry table
+
+Revision ID: d4b7e2a1c9f3
+Revises: c8e1f4a9d276
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b7e2a1c9f3'
+down_revision = 'c8e1f4a9d276'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('llm_calls',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('institution_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(length=80), nullable=True),
+    sa.Column('operation', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('output_tokens', sa.Integer(), nullable=False),
+    sa.Column('cached_tokens', sa.Integer(), nullable=False),
+    sa.Column('queue_ms', sa.Integer(), nullable=True),
+    sa.Column('ttft_ms', sa.Integer(), nullable=True),
+    sa.Column('latency_ms', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['institution_id'], ['institutions.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('llm_calls', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llm_calls_course_id'), ['course_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_llm_calls_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_llm_calls_institution_id'), ['institution_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('llm_calls', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_calls_institution_id'))
+        batch_op.drop_index(batch_op.f('ix_llm_calls_created_at'))
+        batch_op.drop_index(batch_op.f('ix_llm_calls_course_id'))
+
+    op.drop_table('llm_calls')
@@ -0,0 +1,30 @@
+"""Add parse outcome columns to course_files
+
+Revision ID: d7a3f9c2b145
+Revises: c4d1e8a7f302
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f9c2b145'
+down_revision = 'c4d1e8a7f302'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parse_outcome', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('parse_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('parse_duration_ms', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.drop_column('parse_duration_ms')
+        batch_op.drop_column('parse_error')
+        batch_op.drop_column('parse_outcome')
@@ -0,0 +1,38 @@
+"""Add per-course model routing settings and llm_calls.route
+
+Revision ID: e2c9a7f4b1d8
+Revises: d4b7e2a1c9f3
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c9a7f4b1d8'
+down_revision = 'd4b7e2a1c9f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('model_routing', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('routing_max_context_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('routing_max_history_messages', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('routing_max_question_tokens', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('llm_calls', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('route', sa.String(length=10), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('llm_calls', schema=None) as batch_op:
+        batch_op.drop_column('route')
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('routing_max_question_tokens')
+        batch_op.drop_column('routing_max_history_messages')
+        batch_op.drop_column('routing_max_context_tokens')
+        batch_op.drop_column('model_routing')
@@ -0,0 +1,45 @@
+"""Add file_blobs table and blob reference on course_files
+
+Revision ID: e2f6b8d4a913
+Revises: d7a3f9c2b145
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f6b8d4a913'
+down_revision = 'd7a3f9c2b145'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('file_blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('filepath', sa.String(length=500), nullable=False),
+    sa.Column('filesize', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sha256')
+    )
+
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('parser_version', sa.String(length=50), nullable=True))
+        batch_op.create_index(batch_op.f('ix_course_files_blob_id'), ['blob_id'], unique=False)
+        batch_op.create_foreign_key('fk_course_files_blob_id', 'file_blobs', ['blob_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_course_files_blob_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_course_files_blob_id'))
+        batch_op.drop_column('parser_version')
+        batch_op.drop_column('blob_id')
+
+    op.drop_table('file_blobs')
@@ -0,0 +1,35 @@
+"""Add cache_versions table for cross-worker cache invalidation
+
+Revision ID: f3a8d1c6e2b4
+Revises: e2c9a7f4b1d8
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d1c6e2b4'
+down_revision = 'e2c9a7f4b1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_versions = op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    op.bulk_insert(cache_versions, [
+        {'name': 'auth', 'version': 0, 'updated_at': datetime.utcnow()},
+    ])
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,119 @@
+"""Move course_files.parsed_content to compressed parsed_texts table
+
+Revision ID: f3a9c1d7e524
+Revises: e2f6b8d4a913
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from datetime import datetime
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c1d7e524'
+down_revision = 'e2f6b8d4a913'
+branch_labels = None
+depends_on = None
+
+# Filas procesadas por lote al mover el texto
+BATCH_SIZE = 200
+
+course_files = sa.table(
+    'course_files',
+    sa.column('id', sa.Integer),
+    sa.column('parsed_content', sa.Text),
+    sa.column('parsed_text_id', sa.Integer),
+    sa.column('char_count', sa.Integer),
+    sa.column('token_estimate', sa.Integer)
+)
+
+# Tabla con clave primaria declarada para obtener el id insertado
+parsed_texts = sa.Table(
+    'parsed_texts',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('compression', sa.String(10)),
+    sa.Column('content', sa.LargeBinary),
+    sa.Column('char_count', sa.Integer),
+    sa.Column('created_at', sa.DateTime)
+)
+
+
+def _batches(conn, query_builder):
+    """Recorre course_files por lotes de BATCH_SIZE ordenados por id (keyset)."""
+    last_id = 0
+    while True:
+        rows = conn.execute(query_builder(last_id).order_by(course_files.c.id).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.create_table('parsed_texts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('compression', sa.String(length=10), nullable=False),
+    sa.Column('content', sa.LargeBinary(length=4294967295), nullable=False),
+    sa.Column('char_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parsed_text_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('char_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('token_estimate', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_course_files_parsed_text_id'), ['parsed_text_id'], unique=False)
+        batch_op.create_foreign_key('fk_course_files_parsed_text_id', 'parsed_texts', ['parsed_text_id'], ['id'])
+
+    # Mover el texto existente a parsed_texts, comprimido, por lotes
+    conn = op.get_bind()
+    for rows in _batches(conn, lambda last_id: sa.select(
+        course_files.c.id, course_files.c.parsed_content
+    ).where(course_files.c.id > last_id, course_files.c.parsed_content.isnot(None))):
+        for row in rows:
+            text = row.parsed_content
+            result = conn.execute(parsed_texts.insert().values(
+                compression='zlib',
+                content=zlib.compress(text.encode('utf-8'), 6),
+                char_count=len(text),
+                created_at=datetime.utcnow()
+            ))
+            conn.execute(course_files.update().where(course_files.c.id == row.id).values(
+                parsed_text_id=result.inserted_primary_key[0],
+                char_count=len(text),
+                token_estimate=len(text) // 4
+            ))
+
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.drop_column('parsed_content')
+
+
+def downgrade():
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parsed_content', sa.Text(), nullable=True))
+
+    # Restaurar el texto descomprimido en course_files, por lotes
+    conn = op.get_bind()
+    for rows in _batches(conn, lambda last_id: sa.select(
+        course_files.c.id, parsed_texts.c.content
+    ).select_from(
+        course_files.join(parsed_texts, parsed_texts.c.id == course_files.c.parsed_text_id)
+    ).where(course_files.c.id > last_id)):
+        for row in rows:
+            conn.execute(course_files.update().where(course_files.c.id == row.id).values(
+                parsed_content=zlib.decompress(row.content).decode('utf-8')
+            ))
+
+    with op.batch_alter_table('course_files', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_course_files_parsed_text_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_course_files_parsed_text_id'))
+        batch_op.drop_column('token_estimate')
+        batch_op.drop_column('char_count')
+        batch_op.drop_column('parsed_text_id')
+
+    op.drop_table('parsed_texts')
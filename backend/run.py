@@ -2,7 +2,10 @@ import os
 
 from app import create_app
 
-app = create_app()
+# Los procesos del pool de parseo (contexto 'spawn') importan este archivo
+# como __mp_main__: no deben crear otra app (ver utils/parser_pool.py)
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     # Permite redefinir host/puerto mediante variables de entorno sin editar código
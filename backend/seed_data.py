@@ -10,6 +10,8 @@ import unicodedata
 
 from app import create_app, db
 from app.models import User, Institution, Course, UserCourse, Grade, CourseFile
+from app.utils.retrieval import index_course_file
+from app.utils.course_stats import recompute_course_counts, refresh_course_parse_stats
 
 COURSE_TEMPLATES = [
     {
@@ -505,6 +507,8 @@ def seed_database(app=None):
                     )
 
                     db.session.add(course_file)
+                    index_course_file(course_file)
+                    refresh_course_parse_stats(course.id)
                     files_created += 1
                     print(f'  Archivo ficticio creado: {sample["filename"]} para {course.nombre}')
 
@@ -514,6 +518,10 @@ def seed_database(app=None):
         else:
             print("   ℹ️ No se agregaron nuevos archivos (ya existen).")
 
+        # Las inscripciones y archivos se crearon directamente: recalcular los contadores
+        recompute_course_counts()
+        db.session.commit()
+
 
         # RESUMEN FINAL
         print("\n" + "=" * 60)